@@ -0,0 +1,156 @@
+import argparse
+from dataclasses import asdict, dataclass
+from pathlib import Path
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from fake_api import FakeTechnitium
+
+MANAGE_PY = Path(__file__).resolve().parent.parent / "manage.py"
+# Committed baseline: max_requests and max_seconds of each scenario/size/run, measured with --latency 0.
+THRESHOLDS_PATH = Path(__file__).resolve().parent / "thresholds.json"
+ZONE = "bench.example.com"
+REVERSE_ZONE = "10.in-addr.arpa"
+SCOPE = "bench"
+
+# manage.py arguments of each scenario. Each scenario runs twice against the same fake server: once against an
+# empty server and once more with nothing left to change.
+SCENARIOS: dict[str, list[str]] = {
+    "per-record": [],
+    "reconcile": ["--reconcile"],
+    "batched": ["--reconcile", "--bulk-import", "--scope-update"]
+}
+
+@dataclass
+class Result:
+    """Measurements of a single manage.py run."""
+    scenario: str
+    size: int
+    run: str
+    seconds: float
+    requests: int
+    peak_rss_mb: float
+    exit_code: int
+    endpoints: dict[str, int]
+
+def generate_values(size: int) -> dict:
+    """Values file with size A records (with PTR records) and size DHCP reservations."""
+    records = [{
+        "name": f"host-{i}",
+        "type": "A",
+        "ipAddress": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+        "overwrite": True,
+        "ptr": True,
+        "createPtrZone": False
+    } for i in range(size)]
+    assignments = [{
+        "hardwareAddress": "-".join(f"{b:02X}" for b in (0x02, 0, *(i.to_bytes(4, "big")))),
+        "ipAddress": f"10.{128 + i // 65536 % 128}.{i // 256 % 256}.{i % 256}",
+        "hostName": f"client-{i}",
+        "comments": f"Benchmark client {i}"
+    } for i in range(size)]
+    return {
+        "api": {"hostname": "http://127.0.0.1:5380"},
+        "zones": [{"zone": ZONE, "records": records}],
+        "dhcp_scopes": [{"name": SCOPE, "assignments": assignments}]
+    }
+
+def run_manage(fake: FakeTechnitium, values_path: Path, manage_args: list[str], log_path: Path) -> tuple[float, int, float]:
+    """Runs manage.py against the fake server.
+
+    Returns:
+        tuple[float, int, float]: Wall time in seconds, exit code and peak RSS in MB of the manage.py process.
+    """
+    command = [sys.executable, str(MANAGE_PY), "--var-file", str(values_path), "--api-host", fake.url, "--log-level", "WARNING", *manage_args]
+    with open(log_path, 'a') as log_io:
+        started = time.monotonic()
+        # manage.py reads the token from stdin whenever stdin is not a terminal.
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=log_io, stderr=log_io)
+        process.stdin.write(b"benchmark")
+        process.stdin.close()
+        # wait4 reports the resource usage of this child alone, unlike RUSAGE_CHILDREN.
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.monotonic() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux.
+    return seconds, process.returncode, usage.ru_maxrss / 1024
+
+def run_scenario(scenario: str, size: int, values_path: Path, latency: float, extra_args: list[str], log_path: Path) -> list[Result]:
+    results: list[Result] = []
+    with FakeTechnitium(latency, zones=[ZONE, REVERSE_ZONE], scopes=[SCOPE]) as fake:
+        for run in ("initial", "no-op"):
+            fake.reset_counts()
+            seconds, exit_code, peak_rss_mb = run_manage(fake, values_path, [*SCENARIOS[scenario], *extra_args], log_path)
+            results.append(Result(scenario, size, run, seconds, fake.request_count, peak_rss_mb, exit_code, dict(sorted(fake.requests.items()))))
+            logging.info(f"{scenario} {size} {run}: {seconds:.2f}s, {fake.request_count} requests, {peak_rss_mb:.1f} MB peak RSS, exit code {exit_code}")
+    return results
+
+def print_report(results: list[Result]):
+    print(f"{"scenario":<12} {"size":>6} {"run":<8} {"seconds":>9} {"requests":>9} {"peak MB":>8} {"exit":>4}")
+    for result in results:
+        print(f"{result.scenario:<12} {result.size:>6} {result.run:<8} {result.seconds:>9.2f} {result.requests:>9} {result.peak_rss_mb:>8.1f} {result.exit_code:>4}")
+
+def check_thresholds(results: list[Result], thresholds: dict[str, dict], check_seconds: bool = True) -> list[str]:
+    """Compares results against the max_requests and max_seconds of their scenario/size/run key.
+
+    Results without a threshold are not checked.
+
+    Returns:
+        list[str]: A message for every threshold exceeded.
+    """
+    exceeded: list[str] = []
+    for result in results:
+        key = f"{result.scenario}/{result.size}/{result.run}"
+        threshold = thresholds.get(key, None)
+        if threshold is None:
+            continue
+        if "max_requests" in threshold and result.requests > threshold["max_requests"]:
+            exceeded.append(f"{key}: {result.requests} requests, more than the {threshold["max_requests"]} allowed")
+        if check_seconds and "max_seconds" in threshold and result.seconds > threshold["max_seconds"]:
+            exceeded.append(f"{key}: {result.seconds:.2f}s, slower than the {threshold["max_seconds"]:.2f}s allowed")
+    return exceeded
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks manage.py against an in-process fake Technitium API.")
+    parser.add_argument('--sizes', help='Comma separated numbers of records and reservations to generate. Defaults to 100,1000,10000.', default="100,1000,10000")
+    parser.add_argument('--scenarios', help=f'Comma separated scenarios to run: {", ".join(SCENARIOS)}. Defaults to all.', default=",".join(SCENARIOS))
+    parser.add_argument('--latency', help='Milliseconds every fake API request is delayed by. Defaults to 0.', type=float, default=0.0)
+    parser.add_argument('--json', help='Path of a json file to write the results to, for comparing runs in CI.', required=False)
+    parser.add_argument('--thresholds', help=f'json file with the max_requests and max_seconds of each scenario/size/run. Exits non-zero when a result exceeds its threshold. Seconds are only checked with --latency 0. Defaults to {THRESHOLDS_PATH.name} next to this script, an empty value skips the check.', default=str(THRESHOLDS_PATH))
+    parser.add_argument('--log-level', help='The log level. Defaults to INFO.', default="INFO", choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'])
+    parser.add_argument('manage_args', help='Additional manage.py arguments for every scenario, after --. Example: -- --concurrency 8', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level))
+    extra_args = args.manage_args[1:] if args.manage_args[:1] == ["--"] else args.manage_args
+
+    results: list[Result] = []
+    with tempfile.TemporaryDirectory(prefix="technitium-bench-") as work_dir:
+        log_path = Path(work_dir) / "manage.log"
+        for size in (int(size) for size in args.sizes.split(",")):
+            values_path = Path(work_dir) / f"values-{size}.yml"
+            # json is valid yaml, and much faster to write for large files.
+            values_path.write_text(json.dumps(generate_values(size)))
+            for scenario in args.scenarios.split(","):
+                results.extend(run_scenario(scenario, size, values_path, args.latency / 1000, extra_args, log_path))
+        failed = [result for result in results if result.exit_code != 0]
+        if failed:
+            logging.error(f"{len(failed)} runs failed. manage.py output:\n{log_path.read_text()[-5000:]}")
+
+    print_report(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps([asdict(result) for result in results], indent=2) + "\n")
+    exceeded: list[str] = []
+    if args.thresholds:
+        thresholds = json.loads(Path(args.thresholds).read_text())
+        exceeded = check_thresholds(results, thresholds, check_seconds=args.latency == 0)
+        for message in exceeded:
+            logging.error(f"Threshold exceeded: {message}")
+    if failed or exceeded:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
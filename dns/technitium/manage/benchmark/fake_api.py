@@ -0,0 +1,265 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import json
+import threading
+import time
+
+# Fields holding the record data of each record type, as used by zones/records/add and the rData of zones/records/get.
+RDATA_FIELDS: dict[str, str] = {
+    "A": "ipAddress",
+    "AAAA": "ipAddress",
+    "CNAME": "cname",
+    "NS": "nameServer",
+    "PTR": "ptrName"
+}
+
+class ApiError(Exception):
+    """Reported to the client as a status: error response, the way Technitium reports errors with a 200 response."""
+
+def _flag(params: dict[str, str], name: str) -> bool:
+    return params.get(name, "false").casefold() == "true"
+
+def _mac(hardware_address: str) -> str:
+    """Technitium accepts colon or dash separated MAC addresses and stores them upper case and dash separated."""
+    return hardware_address.strip().replace(":", "-").upper()
+
+class FakeTechnitium:
+    """In-memory Technitium DNS server API implementing the endpoints used by manage.py.
+
+    Request parameters are parsed as the Technitium API documentation describes them, not the way technitiumlib
+    formats them, so the benchmark catches a client sending a wrong wire format.
+
+    Zones and DHCP scopes live in dictionaries, so every call is cheap and the cost measured by a benchmark
+    is the cost of manage.py plus the configured latency.
+
+    Args:
+        latency (float): (Optional) Seconds every request is delayed by before it is handled, to simulate a remote server.
+        zones (list[str]): (Optional) Primary zones that exist before the first request.
+        scopes (list[str]): (Optional) DHCP scopes that exist before the first request.
+    """
+    def __init__(self, latency: float = 0.0, zones: list[str] | None = None, scopes: list[str] | None = None):
+        self.latency: float = latency
+        # zone name -> record key (name, type, rdata) -> zones/records/get entry
+        self.zones: dict[str, dict[tuple[str, str, str], dict]] = {zone.casefold(): {} for zone in zones or []}
+        # scope name -> MAC address -> reservedLeases entry
+        self.scopes: dict[str, dict[str, dict]] = {scope: {} for scope in scopes or []}
+        self.requests: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+        self.handlers = {
+            "zones/list": self.zones_list,
+            "zones/create": self.zones_create,
+            "zones/options/get": self.zones_options_get,
+            "zones/records/get": self.zones_records_get,
+            "zones/records/add": self.zones_records_add,
+            "zones/records/delete": self.zones_records_delete,
+            "zones/import": self.zones_import,
+            "dhcp/scopes/list": self.dhcp_scopes_list,
+            "dhcp/scopes/get": self.dhcp_scopes_get,
+            "dhcp/scopes/set": self.dhcp_scopes_set,
+            "dhcp/scopes/addReservedLease": self.dhcp_scopes_add_reserved_lease,
+            "dhcp/scopes/removeReservedLease": self.dhcp_scopes_remove_reserved_lease
+        }
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_count(self) -> int:
+        with self._lock:
+            return sum(self.requests.values())
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests.clear()
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeTechnitium":
+        """Starts serving on a background thread. Port 0 picks a free port, see url."""
+        fake = self
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 keeps connections alive, as the real server does.
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, without this every response waits on a delayed ACK.
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                self.handle_api()
+
+            def do_POST(self):
+                self.handle_api()
+
+            def handle_api(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length", 0) or 0)
+                body = self.rfile.read(length).decode("utf-8") if length else ""
+                params = {key: values[-1] for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+                # Technitium reads parameters from the query string or a form body.
+                if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+                    params.update({key: values[-1] for key, values in parse_qs(body, keep_blank_values=True).items()})
+                response = json.dumps(fake.handle(url.path.removeprefix("/api/"), params, body)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def handle(self, endpoint: str, params: dict[str, str], body: str = "") -> dict:
+        """Handles a single API call and returns the response json."""
+        if self.latency > 0:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            handler = self.handlers.get(endpoint)
+            try:
+                if handler is None:
+                    raise ApiError(f"Unknown endpoint {endpoint}")
+                return {"status": "ok", "response": handler(params, body) or {}}
+            except ApiError as e:
+                return {"status": "error", "errorMessage": str(e)}
+
+    def _zone(self, name: str) -> dict[tuple[str, str, str], dict]:
+        zone = self.zones.get(name.casefold().rstrip("."))
+        if zone is None:
+            raise ApiError(f"No such zone was found: {name}")
+        return zone
+
+    def _scope(self, name: str) -> dict[str, dict]:
+        scope = self.scopes.get(name)
+        if scope is None:
+            raise ApiError(f"DHCP scope does not exists: {name}")
+        return scope
+
+    def _add_record(self, zone: dict, name: str, record_type: str, value: str, comments: str, overwrite: bool):
+        name = name.casefold().rstrip(".")
+        value = value.rstrip(".") if record_type not in {"A", "AAAA"} else value
+        key = (name, record_type, value.casefold())
+        if overwrite:
+            for existing in [k for k in zone if k[:2] == key[:2]]:
+                del zone[existing]
+        elif key in zone:
+            raise ApiError("Cannot add record: record already exists.")
+        zone[key] = {"name": name, "type": record_type, "ttl": 3600, "rData": {RDATA_FIELDS[record_type]: value}, "comments": comments}
+
+    def zones_list(self, params: dict, body: str) -> dict:
+        zones = [{"name": name, "type": "Primary", "disabled": False} for name in sorted(self.zones)]
+        if "pageNumber" not in params:
+            return {"zones": zones}
+        page_number = int(params["pageNumber"])
+        zones_per_page = int(params.get("zonesPerPage", 10))
+        return {
+            "pageNumber": page_number,
+            "totalPages": max((len(zones) + zones_per_page - 1) // zones_per_page, 1),
+            "totalZones": len(zones),
+            "zones": zones[(page_number - 1) * zones_per_page:page_number * zones_per_page]
+        }
+
+    def zones_create(self, params: dict, body: str) -> dict:
+        name = params["zone"].casefold()
+        if name in self.zones:
+            raise ApiError(f"Zone already exists: {name}")
+        self.zones[name] = {}
+        return {"domain": name}
+
+    def zones_options_get(self, params: dict, body: str) -> dict:
+        self._zone(params["zone"])
+        return {"name": params["zone"], "type": "Primary", "disabled": False}
+
+    def zones_records_get(self, params: dict, body: str) -> dict:
+        zone = self._zone(params["zone"])
+        return {"zone": {"name": params["zone"], "type": "Primary"}, "records": list(zone.values())}
+
+    def zones_records_add(self, params: dict, body: str) -> dict:
+        zone = self._zone(params["zone"])
+        record_type = params["type"].upper()
+        self._add_record(zone, params["domain"], record_type, params[RDATA_FIELDS[record_type]], params.get("comments", ""), _flag(params, "overwrite"))
+        return {}
+
+    def zones_records_delete(self, params: dict, body: str) -> dict:
+        zone = self._zone(params["zone"])
+        record_type = params["type"].upper()
+        key = (params["domain"].casefold().rstrip("."), record_type, params[RDATA_FIELDS[record_type]].rstrip(".").casefold())
+        if zone.pop(key, None) is None:
+            raise ApiError("Cannot delete record: no such record exists.")
+        return {}
+
+    def zones_import(self, params: dict, body: str) -> dict:
+        """Imports the one record per line zone files rendered by render_zone_file."""
+        zone = self._zone(params["zone"])
+        origin = params["zone"].casefold()
+        records = []
+        for line in body.splitlines():
+            if line.startswith("$ORIGIN"):
+                origin = line.split()[1].rstrip(".").casefold()
+                continue
+            data, _, comments = line.partition(";")
+            fields = data.split()
+            if len(fields) < 4:
+                continue
+            name = fields[0] if fields[0].endswith(".") else f"{fields[0]}.{origin}"
+            records.append((name, fields[2].upper(), fields[3], comments.strip()))
+        overwrite = _flag(params, "overwrite")
+        if overwrite:
+            rrsets = {(name.casefold().rstrip("."), record_type) for name, record_type, _, _ in records}
+            for key in [k for k in zone if k[:2] in rrsets]:
+                del zone[key]
+        for name, record_type, value, comments in records:
+            key = (name.casefold().rstrip("."), record_type, value.rstrip(".").casefold())
+            if key not in zone:
+                self._add_record(zone, name, record_type, value, comments, False)
+        return {}
+
+    def dhcp_scopes_list(self, params: dict, body: str) -> dict:
+        return {"scopes": [{"name": name, "enabled": True} for name in self.scopes]}
+
+    def dhcp_scopes_get(self, params: dict, body: str) -> dict:
+        scope = self._scope(params["name"])
+        return {"name": params["name"], "reservedLeases": list(scope.values())}
+
+    def dhcp_scopes_set(self, params: dict, body: str) -> dict:
+        scope = self._scope(params["name"])
+        if "reservedLeases" in params:
+            # Documented format: hostName|hardwareAddress|address|comments, repeated for every lease.
+            fields = params["reservedLeases"].split("|") if params["reservedLeases"] else []
+            if len(fields) % 4:
+                raise ApiError("Invalid reservedLeases: expected hostName|hardwareAddress|address|comments entries.")
+            scope.clear()
+            for i in range(0, len(fields), 4):
+                host_name, hardware_address, address, comments = fields[i:i + 4]
+                scope[_mac(hardware_address)] = {"hostName": host_name, "hardwareAddress": _mac(hardware_address), "address": address, "comments": comments}
+        return {}
+
+    def dhcp_scopes_add_reserved_lease(self, params: dict, body: str) -> dict:
+        scope = self._scope(params["name"])
+        hardware_address = _mac(params["hardwareAddress"])
+        if hardware_address in scope:
+            raise ApiError("Reserved lease already exists.")
+        scope[hardware_address] = {"hostName": params.get("hostName", ""), "hardwareAddress": hardware_address, "address": params["ipAddress"], "comments": params.get("comments", "")}
+        return {}
+
+    def dhcp_scopes_remove_reserved_lease(self, params: dict, body: str) -> dict:
+        scope = self._scope(params["name"])
+        if scope.pop(_mac(params["hardwareAddress"]), None) is None:
+            raise ApiError("Reserved lease does not exists.")
+        return {}
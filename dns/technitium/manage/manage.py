@@ -1,30 +1,40 @@
 import argparse
-import json
 import logging
 import os
-import requests
 import sys
 import yaml
+from technitiumlib import ApiHost, ApplyOptions, FileWatcher, HostRun, HostState, RateLimiter, RetryPolicy, Snapshot, StateFile, TechnitiumApi, DEFAULT_CONNECT_TIMEOUT, DEFAULT_MAX_RETRIES, DEFAULT_POOL_SIZE, DEFAULT_RATE_BURST, DEFAULT_READ_TIMEOUT, DEFAULT_RETRY_BACKOFF, apply_batches, apply_to_hosts, batch_values, check_conflicts, drift_report, get_api_hosts, iter_values, load_snapshot, load_values, plan_report, scan_values, snapshot_path, write_metrics
 
 parser = argparse.ArgumentParser(description='Manages DHCP and DNS entries')
 parser.add_argument('-f','--var-file', help='Values file', required=True)
 parser.add_argument('-t','--api-token', help='The API token for logging in to the Technitium API.', required=False)
-parser.add_argument('-a','--api-host', help='The endpoint of Technitium API. If set, overrides api.hostname value in the values file.', required=False)
+parser.add_argument('-a','--api-host', help='The endpoint of Technitium API. If set, overrides the api.hostname and api.hosts values in the values file.', required=False)
 loglevel_choices=list(dict.fromkeys([logging.getLevelName(l) for l in logging.getLevelNamesMapping().values()]))
 parser.add_argument('--log-level', help='The log level. Defaults to INFO.', required=False, default="INFO", choices=loglevel_choices)
-args = parser.parse_args()
-
-VAR_FILE: str = args.var_file
-
-with open(VAR_FILE, 'r') as var_file:
-    VALUES = yaml.safe_load(var_file)
-
-class ApiStatusError(Exception):
-        """Exception raised a status type of "error" is returned from the Technitium API."""
-        def __init__(self, message="Status type of error was found in the response."):
-            super().__init__(message)
-
-def get_api_token()-> str:
+parser.add_argument('--pool-size', help=f'Maximum number of keep-alive connections kept open to the Technitium API. Defaults to {DEFAULT_POOL_SIZE}.', type=int, required=False, default=DEFAULT_POOL_SIZE)
+parser.add_argument('--connect-timeout', help=f'Seconds to wait for a connection to the Technitium API. Defaults to {DEFAULT_CONNECT_TIMEOUT}.', type=float, required=False, default=DEFAULT_CONNECT_TIMEOUT)
+parser.add_argument('--read-timeout', help=f'Seconds to wait for a response from the Technitium API. Defaults to {DEFAULT_READ_TIMEOUT}.', type=float, required=False, default=DEFAULT_READ_TIMEOUT)
+parser.add_argument('--max-retries', help=f'Retries of a Technitium API call that failed with a connection error, timeout or 5xx/429 response. Calls that are not safe to repeat are only retried when the server never received them. Defaults to {DEFAULT_MAX_RETRIES}.', type=int, required=False, default=DEFAULT_MAX_RETRIES)
+parser.add_argument('--retry-backoff', help=f'Upper bound in seconds of the first retry delay, doubled on every retry and randomized with full jitter. Defaults to {DEFAULT_RETRY_BACKOFF}.', type=float, required=False, default=DEFAULT_RETRY_BACKOFF)
+parser.add_argument('--rate-limit', help='Maximum requests per second sent to each Technitium API host. Defaults to 0 (unlimited).', type=float, required=False, default=0)
+parser.add_argument('--rate-burst', help=f'Requests that can be sent at once before --rate-limit applies. Defaults to {DEFAULT_RATE_BURST}.', type=int, required=False, default=DEFAULT_RATE_BURST)
+parser.add_argument('--metrics-json', help='Path of a json file to write the request count, bytes and p50/p95/p99 latency of every Technitium API endpoint to at the end of the run.', required=False)
+parser.add_argument('--metrics-prom', help='Path of a Prometheus textfile collector file (*.prom) to write the same request metrics to at the end of the run.', required=False)
+parser.add_argument('--reconcile', help='Diff each zone against its current records and only send the adds, updates and deletes that are needed. Managed records no longer in the values file are removed.', action='store_true')
+parser.add_argument('--bulk-import', help='Send the records of each zone in a single zone file import request instead of one request per record. Records the import API cannot handle are still added one at a time.', action='store_true')
+parser.add_argument('--scope-update', help='Apply the reservations of each DHCP scope with a single dhcp/scopes/set request instead of removing and adding each reservation. Unmanaged reservations are kept.', action='store_true')
+parser.add_argument('-c', '--concurrency', help='Number of zones, record names, scopes or MAC addresses processed in parallel. Changes to a single record name or MAC address are always applied in order. Defaults to 1.', type=int, required=False, default=1)
+parser.add_argument('--state-file', help='Path of a local state file holding a content hash of every zone record and DHCP reservation last applied to each API host. When set, only entries whose hash changed are applied.', required=False)
+parser.add_argument('--verify', help='With --state-file, ignores the recorded hashes and applies the full values file against the server, then rewrites the state.', action='store_true')
+parser.add_argument('-w', '--watch', help='After applying the values file, keep running and re-apply the zones and scopes that change whenever the values file is saved.', action='store_true')
+parser.add_argument('--watch-debounce', help='Seconds to wait for further changes to the values file before re-applying in --watch mode. Defaults to 0.5.', type=float, required=False, default=0.5)
+parser.add_argument('--batch-size', help='Stream the values file instead of loading it, and apply it in batches of this many records and DHCP assignments so the whole file is never held in memory. records and assignments must be the last key of each zone and dhcp_scopes entry. Can\'t be combined with --reconcile, --scope-update, --state-file, --watch or --drift, which need the whole values file.', type=int, required=False, default=0)
+parser.add_argument('--plan', help='Dry run: read the servers but send no changes, then print every add (+), replacement (~) and delete (-) the apply would make, the number of API calls it would take and an estimated time from the measured round trip time.', action='store_true')
+parser.add_argument('--snapshot-dir', help='Directory to keep a snapshot of every zone, record and DHCP reservation of each API host in. A snapshot is taken before anything is applied.', required=False)
+parser.add_argument('--snapshot-ttl', help='Seconds a snapshot in --snapshot-dir is reused for instead of reading the server again. Defaults to 0 (always read the server).', type=float, required=False, default=0)
+parser.add_argument('--drift', help='Only report the differences between the values file and a snapshot of each API host, without applying anything. Hosts with a snapshot younger than --snapshot-ttl are not contacted. Exits with status 2 when any host drifted.', action='store_true')
+
+def get_api_token(args: argparse.Namespace)-> str:
     """Gets the api token from various sources.
        
        Order of precedence is:
@@ -47,7 +57,7 @@ def get_api_token()-> str:
 
     return api_token
 
-def get_api_host()-> str:
+def get_api_host(args: argparse.Namespace, values: dict)-> str:
     """Gets the api host from various sources.
        
        Order of precedence is:
@@ -59,9 +69,9 @@ def get_api_host()-> str:
     if "TECHNITIUM_API_HOST" in os.environ:
         api_host = os.getenv("TECHNITIUM_API_HOST")
     
-    if "api" in VALUES:
-        if "hostname" in VALUES["api"]:
-            api_host = VALUES["api"]["hostname"]
+    if "api" in values:
+        if "hostname" in values["api"]:
+            api_host = values["api"]["hostname"]
 
     if args.api_host:
         api_host = args.api_host
@@ -71,398 +81,188 @@ def get_api_host()-> str:
 
     return api_host
 
-type JSON = dict[str, "JSON"] | list["JSON"] | str | int | float | bool | None
-
-def detect_api_status_error(response: JSON):
-    """Raises an ApiStatusError if a status type of "error" is found in the response json. The API returns a status code of 200 in some cases, requiring this extra step.
-
-    Args:
-        response (JSON): API response to detect errors in
-    """
-    if "status" in response:
-        if response["status"].casefold() == "error".casefold():
-            raise ApiStatusError(response["errorMessage"])
-
-def get_dhcp_scope(name: str, api_host: str, api_token: str) -> JSON:
-    """Gets a DHCP scope from the Technitium API
-
-    Args:
-        name (str): DHCP Scope Name
-        api_host (str): API endpoint (example: http://localhost:5380)
-        api_token (str): Token used to authenticate against the api_host.
-
-    Raises:
-        RuntimeError: When API returns an error from the request.
-
-    Returns:
-        str: JSON response data for the requested DHCP scope.
-    """
-    url = f"{api_host}/api/dhcp/scopes/get"
-    params = {'token': api_token, 'name': name}
-    logging.info(f"Get scope {name} from {url}")
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    data = response.json()
-
-    logging.debug(json.dumps(data, indent=4))
-
-    # API returns 200 response code even when no scope is found
-    detect_api_status_error(data)
-    
-    return data
-
-def validate_scopes(scopes: dict[str, dict], api_host: str, api_token: str):
-    """Iterates through scopes and validates every scope exists.
-
-    Args:
-        scopes (dict[str, dict]): Dictionary of scopes and their values to check for.
-        api_host (str): API endpoint (example: http://localhost:5380)
-        api_token (str): Token used to authenticate against the api_host.
-    """
-    for scope in scopes:
-        try:
-            logging.info(f"Checking for dhcp scope: {scope["name"]}")
-            dhcp_scope = get_dhcp_scope(scope["name"], api_host, api_token)            
-        except ApiStatusError as r:
-            logging.exception(f"API Response contained an error for dhcp scope '{scope["name"]}':", file=sys.stderr)
-            raise(r)
-        except requests.exceptions.HTTPError as httperr:
-            logging.exception(f"Unexpected HTTPError for dhcp scope '{scope["name"]}':", file=sys.stderr)
-            raise(httperr)
-        except Exception as e:
-            logging.exception(f"Unexpected Error for dhcp scope '{scope["name"]}':", file=sys.stderr)
-            raise(e)
-
-def get_dhcp_reservation(scope_name: str, hardware_address: str, api_host: str, api_token: str) -> JSON:
-    """Gets an existing DHCP reservation for a hardware MAC address
-
-    Args:
-        scope_name (str): The scope containing a reservation for the hardware_address
-        hardware_address (str): MAC address of the DHCP reservation
-        api_host (str): API endpoint (example: http://localhost:5380)
-        api_token (str): Token used to authenticate against the api_host.
-    """
-    url = f"{api_host}/api/dhcp/scopes/get"
-    params = { "token": api_token, "name": scope_name }
-    logging.info(f"Get DHCP reservation (MAC={hardware_address}; scope={scope_name}) from {url}")
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    data = response.json()
-
-    logging.debug(json.dumps(data, indent=4))
-
-    # API returns 200 response code even when no scope is found
-    detect_api_status_error(data)
-    if "response" in data:
-        if "reservedLeases" in data["response"]:
-            leases = data["response"]["reservedLeases"]
-            for lease in leases:
-                if lease["hardwareAddress"].casefold() == hardware_address.casefold():
-                    return lease
-    return None
-
-def delete_dhcp_reservation(scope_name: str, hardware_address: str, api_host: str, api_token: str) -> JSON:
-    """Deletes an existing DHCP reservation for a hardware MAC address in a specific scope
-
-    Args:
-        scope_name (str): The scope containing a reservation for the hardware_address 
-        hardware_address (str): MAC address of the DHCP reservation to delete
-        api_host (str): API endpoint (example: http://localhost:5380)
-        api_token (str): Token used to authenticate against the api_host.
-    """
-    url = f"{api_host}/api/dhcp/scopes/removeReservedLease"
-    params = { 
-        "token": api_token,
-        "name": scope_name,
-        "hardwareAddress": hardware_address
-    }
-    logging.info(f"Delete DHCP reservation (MAC={hardware_address}; scope={scope_name}) at {url}")
-    response = requests.post(url, params=params)
-    response.raise_for_status()
-    data = response.json()
-    logging.debug(json.dumps(data, indent=4))
-
-    # API returns 200 response code even when no scope is found
-    detect_api_status_error(data)
-    
-    return data
-
-def add_dhcp_reservation(scope_name: str, hardware_address: str, ip_address: str, api_host: str, api_token: str, host_name: str = "", comments: str = "") -> JSON:
-    """Sets a DHCP scope for the assignment
-
-    Args:
-        scope_name (str): The scope name in which to make reserved lease
-        hardware_address (str): The MAC address of the client.
-        ip_address (str): The reserved IP address for the client.
-        api_host (str): API endpoint (example: http://localhost:5380).
-        api_token (str): Token used to authenticate against the api_host.
-        host_name (str): (Optional) The hostname of the client to override.
-        comments (str): (Optional) Comments for the reserved lease entry.
-    """
-    url = f"{api_host}/api/dhcp/scopes/addReservedLease"
-    params = {
-        "token": api_token, 
-        "name": scope_name,
-        "hardwareAddress": hardware_address,
-        "ipAddress": ip_address,
-        "hostName": host_name,
-        "comments": "managed by pyTechnitium"
-    }
-    if comments:
-        params["comments"] = f"{params["comments"]} -: {comments}"
-        
-    logging.info(f"Adding DHCP Reservation (MAC={hardware_address}; IP={ip_address}) ")
-    response = requests.post(url, params=params)
-    response.raise_for_status()
-    data = response.json()
-    logging.debug(json.dumps(data, indent=4))
-
-    # API returns 200 response code even when no scope is found
-    detect_api_status_error(data)
-    
-    return data
+def get_api_hosts_to_apply(args: argparse.Namespace, values: dict) -> list[ApiHost]:
+    """Gets the API hosts the values file is applied to.
 
-def set_dhcp_scope_reservations(dhcp_scopes: dict[str, dict], api_host: str, api_token: str):
-    """Configures DHCP leases based on the dictionary of scope assignments
-
-    Args:
-        dhcp_scopes (dict[str, dict]): List of dhcp scopes and their address reservations
-        api_host (str): API endpoint (example: http://localhost:5380)
-        api_token (str): Token used to authenticate against the api_host.
+       The --api-host argument selects a single host. Otherwise every entry of api.hosts in the values file is used
+       when set, falling back to the single host found by get_api_host.
     """
-    for scope in dhcp_scopes:
-        logging.info(f"Processing address reservations for scope: {scope["name"]}")
-        for assignment in scope.get("assignments", []):
-            exising_reservation = get_dhcp_reservation(scope["name"], assignment["hardwareAddress"], api_host, api_token)
-            if exising_reservation:
-                logging.info(f"Removing existing reservation for MAC {assignment["hardwareAddress"]}.")
-                delete_dhcp_reservation(scope["name"], assignment["hardwareAddress"], api_host, api_token)
-            add_dhcp_reservation(scope["name"], 
-                                assignment["hardwareAddress"], 
-                                assignment["ipAddress"],
-                                api_host,
-                                api_token,
-                                assignment.get("hostName", ""),
-                                assignment.get("comments", ""))
-            
-def get_dhcp_scope(name: str, api_host: str, api_token: str) -> JSON:
-    """Gets a DHCP scope from the Technitium API
+    if not args.api_host:
+        api_hosts = get_api_hosts(values.get("api", None) or {})
+        if api_hosts:
+            return api_hosts
+    return [ApiHost(get_api_host(args, values))]
 
-    Args:
-        name (str): DHCP Scope Name
-        api_host (str): API endpoint (example: http://localhost:5380)
-        api_token (str): Token used to authenticate against the api_host.
+def watch_values(args: argparse.Namespace, runs: list[HostRun], state: StateFile | None):
+    """Re-applies the values file to every API host each time it changes until interrupted
 
-    Raises:
-        RuntimeError: When API returns an error from the request.
-
-    Returns:
-        str: JSON response data for the requested DHCP scope.
-    """
-    url = f"{api_host}/api/dhcp/scopes/get"
-    params = {'token': api_token, 'name': name}
-    logging.info(f"Requesting scope {name} from {url}")
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    data = response.json()
-    logging.debug(json.dumps(data, indent=4))
-
-    # API returns 200 response code even when no scope is found
-    detect_api_status_error(data)
-    
-    return data
-
-def validate_scopes(scopes: dict[str, dict], api_host: str, api_token: str):
-    """Iterates through scopes and validates every scope exists.
+    The clients, their connection pools and cached remote state are kept between changes. Each change is diffed
+    against the content hashes of the last successful apply to each host, so only the zones and scopes that changed are sent.
 
     Args:
-        scopes (dict[str, dict]): Dictionary of scopes and their values to check for.
-        api_host (str): API endpoint (example: http://localhost:5380)
-        api_token (str): Token used to authenticate against the api_host.
+        args (argparse.Namespace): Parsed command line arguments.
+        runs (list[HostRun]): API hosts to apply to.
+        state (StateFile | None): State file to update after each apply, if any.
     """
-    for scope in scopes:
-        try:
-            logging.info(f"Checking for dhcp scope: {scope["name"]}")
-            dhcp_scope = get_dhcp_scope(scope["name"], api_host, api_token)
-        except ApiStatusError as r:
-            logging.info(f"API Response contained an error for dhcp scope '{scope["name"]}':", file=sys.stderr)
-            raise(r)
-        except requests.exceptions.HTTPError as httperr:
-            logging.info(f"Unexpected HTTPError for dhcp scope '{scope["name"]}':", file=sys.stderr)
-            raise(httperr)
-        except Exception as e:
-            logging.info(f"Unexpected Error for dhcp scope '{scope["name"]}':", file=sys.stderr)
-            raise(e)
-
-def get_dns_zone_options(zone: str, api_host: str, api_token: str) -> JSON:
-    """Gets Zone Options for an authoritative zone from the Technitium API
+    with FileWatcher(args.var_file, args.watch_debounce) as watcher:
+        logging.info(f"Watching {args.var_file} for changes.")
+        while True:
+            watcher.wait()
+            try:
+                values = load_values(args.var_file)
+            except (OSError, yaml.YAMLError) as e:
+                logging.error(f"Unable to load {args.var_file}, waiting for the next change: {e}")
+                continue
+            except Exception as e:
+                logging.exception(f"Unable to load {args.var_file}, waiting for the next change: {e}")
+                continue
+            try:
+                conflicts = check_conflicts(values)
+            except Exception as e:
+                logging.exception(f"Unable to check {args.var_file} for conflicts, waiting for the next change: {e}")
+                continue
+            if conflicts:
+                logging.error(f"{args.var_file} has conflicts, waiting for the next change.")
+                continue
+
+            logging.info(f"{args.var_file} changed.")
+            try:
+                results = apply_to_hosts(runs, values, state, full=False, track=True)
+            except Exception as e:
+                # A bad edit must not stop the watcher, nothing is recorded as applied and the next change is applied as usual.
+                logging.exception(f"Unable to apply {args.var_file}, waiting for the next change: {e}")
+                continue
+            write_metrics(runs, args.metrics_json, args.metrics_prom)
+            if any(result.errors for result in results):
+                logging.warning("Failed changes will be applied again on the next change.")
+
+def get_snapshot(args: argparse.Namespace, run: HostRun) -> Snapshot:
+    """Exports a snapshot of an API host, saving it to --snapshot-dir when set.
 
     Args:
-        zone (str): DNZ Zone Name
-        api_host (str): API endpoint (example: http://localhost:5380)
-        api_token (str): Token used to authenticate against the api_host.
-
-    Raises:
-        RuntimeError: When API returns an error from the request.
+        args (argparse.Namespace): Parsed command line arguments.
+        run (HostRun): API host to export.
 
     Returns:
-        str: JSON response data for the requested Zone options.
+        Snapshot: Zones, records and DHCP reservations of the host.
     """
+    snapshot = run.client.export_snapshot()
+    if args.snapshot_dir:
+        os.makedirs(args.snapshot_dir, exist_ok=True)
+        snapshot.save(snapshot_path(args.snapshot_dir, run.api_host.hostname))
+    return snapshot
 
-    url = f"{api_host}/api/zones/options/get"
-    params = {
-        "token": api_token, 
-        "zone": zone,
-        "includeAvailableCatalogZoneNames": "true",
-        "includeAvailableTsigKeyNames": "true"
-    }
-    logging.info(f"Requesting zone options for zone {zone} from {url}")
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    data = response.json()
-    logging.debug(json.dumps(data, indent=4))
-
-    # API returns 200 response code even when no scope is found
-    detect_api_status_error(data)
-    
-    return data
-
-def add_dns_zone_record(zone: str, name: str, record_type: str, api_host: str, api_token: str, ip_address: str | None = None, name_server: str | None = None, cname: str | None = None, overwrite: bool = False, ptr: bool = False, create_ptr_zone: bool = False) -> JSON:
-    """Gets Zone Options for an authoritative zone from the Technitium API
-
-    Args:
-        zone (str): DNS Zone Name
-        name (str): Name of the record to add.
-        record_type (str): Record type: A, AAAA, NS, CNAME, etc
-        api_host (str): API endpoint (example: http://localhost:5380)
-        api_token (str): Token used to authenticate against the api_host.
-        ip_address (str): (Conditional) Required for A or AAAA record types, otherwise should not be set.
-        cname (str): (Conditional) Required for CNAME record type, otherwise should not be set.
-        overwrite (bool): (Optional) Creates or updates existing record. false: Creates new records only.
-        ptr (bool): (Optional) Creates a reverse PTR record for the ipAddress. This option is used only for A and AAAA records.
-        create_ptr_zone (bool): (Optional) Creates a new Ptr Zone for the ip address if it doesn't exist. false: expects PTR zone to already exist if ptr=true.
-    Raises:
-        RuntimeError: When API returns an error from the request.
+def report_drift(snapshots: list[Snapshot], values: dict) -> bool:
+    """Prints the drift report of every snapshot against the values file.
 
     Returns:
-        str: JSON response data for the requested Zone options.
+        bool: True when any host drifted.
     """
+    drifted = False
+    for snapshot in snapshots:
+        report = drift_report(snapshot, values)
+        print("\n".join(report.lines()))
+        drifted = drifted or report.changes > 0
+    return drifted
 
-    url = f"{api_host}/api/zones/records/add"
-    params = {
-        "token": api_token, 
-        "zone": zone,
-        "domain": f"{name}.{zone}",
-        "type": record_type,
-        "overwrite": overwrite,
-        "ptr": ptr,
-        "createPtrZone": create_ptr_zone,
-        "comments": "managed by pyTechnitium"
-    }
-
-    if record_type.upper() in { "A", "AAAA" }:
-        if ip_address is None:
-            raise ValueError(f"ip_address must be set for record_type {record_type.upper()}")
-        params["ipAddress"] = ip_address
-    elif ip_address:
-        logging.warning(f"ip_address is set but is not valid for record type {record_type.upper()} and will be ignored")
-
-    if record_type.upper() == "CNAME":
-        if cname is None:
-            raise ValueError(f"cname must be set for record_type {record_type.upper()}")
-        params["cname"] = cname
-    elif cname:
-        logging.warning(f"cname is set but is not valid for record type {record_type.upper()} and will be ignored")
-
-    if record_type.upper() == "NS":
-        if name_server is None:
-            raise ValueError(f"name_server must be set for record_type {record_type.upper()}")
-        params["name_server"] = cname
-    elif name_server:
-        logging.warning(f"name_server is set but is not valid for record type {record_type.upper()} and will be ignored")
-
-    logging.info(f"Adding/Updating {name}.{zone} {record_type.upper()} record to {url}")
-    response = requests.post(url, params=params)
-    response.raise_for_status()
-    data = response.json()
-    logging.debug(json.dumps(data, indent=4))
-
-    if "status" in data:
-        if data["status"].casefold() == "error".casefold():
-            logging.info("detected error in response")
-            if data["errorMessage"].casefold() == "cannot add record: record already exists.".casefold():
-                logging.info("error expected")
-                if not overwrite:
-                    logging.info("overriding error")
-                    data["status"] = "ok"
-                    data["message"] = "Record not added. Record already exists."
-                    del data["errorMessage"]
-                    return data
-        
-    # API returns 200 response code even when there was an error
-    detect_api_status_error(data)
-    
-    return data
-
-def validate_dns_zones(zones: dict[str, dict], api_host: str, api_token: str):
-    """Iterates through zones and validates every zone exists.
+def main(argv: list[str] | None = None):
+    """Applies a values file to the Technitium API hosts given on the command line.
 
     Args:
-        zones (dict[str, dict]): Dictionary of zones and their values to check for.
-        api_host (str): API endpoint (example: http://localhost:5380)
-        api_token (str): Token used to authenticate against the api_host.
+        argv (list[str]): (Optional) Command line arguments. Defaults to sys.argv.
     """
-    for zone in zones:
-        try:
-            logging.info(f"Checking for dns zone: {zone["zone"]}")
-            zone_options = get_dns_zone_options(zone["zone"], api_host, api_token)
-        except ApiStatusError as r:
-            logging.exception(f"API Response contained an error for dns zone '{zone["zone"]}':", file=sys.stderr)
-            raise(r)
-        except requests.exceptions.HTTPError as httperr:
-            logging.exception(f"Unexpected HTTPError for dns zone '{zone["zone"]}':", file=sys.stderr)
-            raise(httperr)
-        except Exception as e:
-            logging.exception(f"Unexpected Error for dns zone '{zone["zone"]}':", file=sys.stderr)
-            raise(e)
-
-def set_dns_zone_records(dns_zones: dict[str, dict], api_host: str, api_token: str):
-    """Configures DHCP leases based on the dictionary of scope assignments
-
-    Args:
-        dns_zones (dict[str, dict]): List of dns zones and their records
-        api_host (str): API endpoint (example: http://localhost:5380)
-        api_token (str): Token used to authenticate against the api_host.
-    """
-    for zone in dns_zones:
-        logging.info(f"Processing DNS records for zone: {zone["zone"]}")
-        for record in zone.get("records", []):
-            add_dns_zone_record(zone["zone"],
-                                record["name"],
-                                record["type"],
-                                api_host,
-                                api_token,
-                                record.get("ipAddress", None),
-                                record.get("nameServer", None),
-                                record.get("cname", None),
-                                record.get("overwrite", False),
-                                record.get("ptr", False),
-                                record.get("createPtrZone", False))
-            
-def main():
+    args = parser.parse_args(argv)
     numeric_level = getattr(logging, args.log_level, None)
     logging.basicConfig(level=numeric_level)
-    API_TOKEN: str = get_api_token()
-    API_HOST: str = get_api_host()
-    logging.info(f"API_HOST: {API_HOST}")
-
-    if "zones" in VALUES:
-        validate_dns_zones(VALUES["zones"], API_HOST, API_TOKEN)
-        set_dns_zone_records(VALUES["zones"], API_HOST, API_TOKEN)
-
-    if "dhcp_scopes" in VALUES:
-        validate_scopes(VALUES["dhcp_scopes"], API_HOST, API_TOKEN)
-        set_dhcp_scope_reservations(VALUES["dhcp_scopes"], API_HOST, API_TOKEN)
-
-
-main()
\ No newline at end of file
+    if args.plan and (args.watch or args.drift):
+        parser.error("--plan can't be combined with --watch or --drift.")
+    if args.batch_size > 0:
+        whole_file_flags = {"--reconcile": args.reconcile, "--scope-update": args.scope_update, "--state-file": args.state_file, "--watch": args.watch, "--drift": args.drift}
+        if any(whole_file_flags.values()):
+            parser.error(f"--batch-size can't be combined with {", ".join(flag for flag, value in whole_file_flags.items() if value)}.")
+        try:
+            scan = scan_values(args.var_file)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            raise SystemExit(f"Unable to stream {args.var_file} with --batch-size: {e}")
+        conflicts = scan.conflicts
+        # Only the api values are needed up front, the zones and scopes are streamed when applying.
+        values = {"api": scan.api}
+    else:
+        values = load_values(args.var_file)
+        conflicts = check_conflicts(values)
+    if conflicts:
+        raise SystemExit(f"{len(conflicts)} conflicts found in {args.var_file}. Nothing was applied.")
+    api_hosts = get_api_hosts_to_apply(args, values)
+    logging.info(f"API hosts: {", ".join(api_host.hostname for api_host in api_hosts)}")
+    snapshots: dict[str, Snapshot] = {}
+    if args.snapshot_dir:
+        for api_host in api_hosts:
+            snapshot = load_snapshot(snapshot_path(args.snapshot_dir, api_host.hostname), api_host.hostname, args.snapshot_ttl)
+            if snapshot is not None:
+                snapshots[api_host.hostname] = snapshot
+    if args.drift:
+        # Drift is computed offline, hosts with a recent enough snapshot are never contacted.
+        api_hosts_to_read = [api_host for api_host in api_hosts if api_host.hostname not in snapshots]
+    else:
+        api_hosts_to_read = api_hosts
+
+    default_token: str | None = None
+    if any(not (api_host.api_token_env_var or api_host.api_token_file) for api_host in api_hosts_to_read):
+        default_token = get_api_token(args)
+
+    state = StateFile(args.state_file) if args.state_file else None
+    # Every parallel task needs its own connection, so the pool is never smaller than --concurrency.
+    pool_size = max(args.pool_size, args.concurrency)
+    options = ApplyOptions(args.reconcile, args.bulk_import, args.scope_update, args.concurrency)
+    runs: list[HostRun] = []
+    for api_host in api_hosts_to_read:
+        try:
+            api_token = api_host.get_api_token(default_token)
+        except (OSError, ValueError) as e:
+            raise SystemExit(f"Unable to get the API token for {api_host.hostname}: {e}")
+        # Each host gets its own rate limit, so a slow secondary doesn't hold back the primary.
+        client = TechnitiumApi(api_host.hostname, api_token, options, pool_size=pool_size,
+                               connect_timeout=args.connect_timeout, read_timeout=args.read_timeout,
+                               retry_policy=RetryPolicy(args.max_retries, args.retry_backoff), rate_limiter=RateLimiter(args.rate_limit, args.rate_burst), dry_run=args.plan)
+        runs.append(HostRun(api_host, client, state.get(api_host.hostname) if state is not None else HostState()))
+
+    try:
+        if args.drift or args.snapshot_dir:
+            for run in runs:
+                if run.api_host.hostname not in snapshots:
+                    snapshots[run.api_host.hostname] = get_snapshot(args, run)
+        if args.drift:
+            if report_drift([snapshots[api_host.hostname] for api_host in api_hosts], values):
+                raise SystemExit(2)
+            return
+        if args.batch_size > 0:
+            try:
+                results = apply_batches(runs, batch_values(iter_values(args.var_file), args.batch_size, scan.written))
+            except (OSError, ValueError, yaml.YAMLError) as e:
+                # The file was streamed once already by scan_values, so this only happens when it changed since.
+                raise SystemExit(f"Unable to stream {args.var_file} with --batch-size: {e}")
+        else:
+            # A plan changes nothing, so the state file is left as it is.
+            results = apply_to_hosts(runs, values, None if args.plan else state, full=state is None or args.verify, track=args.watch)
+        write_metrics(runs, args.metrics_json, args.metrics_prom)
+        if args.plan:
+            for run in runs:
+                print("\n".join(plan_report(run)))
+        if args.watch:
+            try:
+                watch_values(args, runs, state)
+            except KeyboardInterrupt:
+                logging.info("Stopped watching.")
+            return
+    finally:
+        for run in runs:
+            run.client.close()
+
+    failed = [result for result in results if result.errors]
+    if failed:
+        if state is not None:
+            logging.warning(f"State file {state.path} was not updated for {", ".join(result.hostname for result in failed)}. Changed entries will be applied again on the next run.")
+        raise SystemExit(f"{sum(len(result.errors) for result in failed)} items failed on {len(failed)} API hosts. See the log for details.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+from .api import (
+    ApiStatusError,
+    ApplyOptions,
+    TechnitiumApi,
+    DEFAULT_ZONES_PER_PAGE,
+    WRITABLE_ZONE_TYPES,
+    detect_api_status_error
+)
+from .bindings import (
+    bind_scope_zones,
+    scope_zone_records
+)
+from .client import (
+    JSON,
+    ClientStats,
+    TechnitiumClient,
+    IDEMPOTENT_ENDPOINTS,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_READ_TIMEOUT
+)
+from .config import (
+    ApiHost,
+    get_api_hosts
+)
+from .conflicts import (
+    Conflict,
+    ScopeRange,
+    find_conflicts,
+    find_item_conflicts,
+    scope_range
+)
+from .executor import (
+    ItemError,
+    Task,
+    group_by,
+    run_tasks
+)
+from .leases import (
+    DhcpLeaseIndex,
+    format_reserved_leases,
+    lease_from_assignment,
+    merge_reserved_leases,
+    normalize_mac,
+    parse_reserved_leases,
+    reservation_comments,
+    reserved_leases_equal
+)
+from .metrics import (
+    EndpointMetrics,
+    RequestMetrics,
+    QUANTILES,
+    render_prometheus,
+    write_metrics_json,
+    write_metrics_prometheus
+)
+from .plan import (
+    PlanEstimate,
+    PlannedCall,
+    estimate_plan
+)
+from .records import (
+    DnsRecord,
+    RecordDiff,
+    ReconcileSummary,
+    MANAGED_COMMENT,
+    diff_zone_records,
+    is_managed,
+    record_from_api,
+    record_from_values
+)
+from .retry import (
+    RateLimiter,
+    RetryPolicy,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_RATE_BURST,
+    DEFAULT_RETRY_BACKOFF,
+    DEFAULT_RETRY_MAX_BACKOFF
+)
+from .reverse import (
+    PTR_SOURCE_TYPES,
+    ReverseZonePlan,
+    default_reverse_zone,
+    find_reverse_zone,
+    plan_reverse_zones,
+    without_ptr
+)
+from .runner import (
+    HostResult,
+    HostRun,
+    ValuesScan,
+    apply_batches,
+    apply_to_host,
+    apply_to_hosts,
+    check_conflicts,
+    log_errors,
+    plan_report,
+    scan_values,
+    write_metrics
+)
+from .snapshot import (
+    DriftReport,
+    ScopeDrift,
+    Snapshot,
+    SNAPSHOT_RECORD_FIELDS,
+    SNAPSHOT_VERSION,
+    compact_record,
+    diff_scope_leases,
+    drift_report,
+    load_snapshot,
+    snapshot_path
+)
+from .state import (
+    ApplyPlan,
+    HostState,
+    StateFile,
+    content_hash,
+    full_plan,
+    hash_values,
+    incremental_plan
+)
+from .values import (
+    STREAMED_LISTS,
+    ValuesItem,
+    batch_values,
+    iter_values,
+    iter_values_dict,
+    load_values,
+    written_rrset
+)
+from .watch import (
+    FileWatcher
+)
+from .zonefile import (
+    IMPORTABLE_TYPES,
+    is_importable,
+    render_zone_file
+)
+
+__all__ = ["ApiStatusError", "ApplyOptions", "TechnitiumApi", "DEFAULT_ZONES_PER_PAGE", "WRITABLE_ZONE_TYPES", "detect_api_status_error", "bind_scope_zones", "scope_zone_records", "JSON", "ClientStats", "TechnitiumClient", "IDEMPOTENT_ENDPOINTS", "DEFAULT_CONNECT_TIMEOUT", "DEFAULT_POOL_SIZE", "DEFAULT_READ_TIMEOUT", "ApiHost", "get_api_hosts", "Conflict", "ScopeRange", "find_conflicts", "find_item_conflicts", "scope_range", "ItemError", "Task", "group_by", "run_tasks", "DhcpLeaseIndex", "format_reserved_leases", "parse_reserved_leases", "lease_from_assignment", "merge_reserved_leases", "normalize_mac", "reservation_comments", "reserved_leases_equal", "EndpointMetrics", "RequestMetrics", "QUANTILES", "render_prometheus", "write_metrics_json", "write_metrics_prometheus", "PlanEstimate", "PlannedCall", "estimate_plan", "DnsRecord", "RecordDiff", "ReconcileSummary", "MANAGED_COMMENT", "diff_zone_records", "is_managed", "record_from_api", "record_from_values", "RateLimiter", "RetryPolicy", "DEFAULT_MAX_RETRIES", "DEFAULT_RATE_BURST", "DEFAULT_RETRY_BACKOFF", "DEFAULT_RETRY_MAX_BACKOFF", "PTR_SOURCE_TYPES", "ReverseZonePlan", "default_reverse_zone", "find_reverse_zone", "plan_reverse_zones", "without_ptr", "HostResult", "HostRun", "ValuesScan", "apply_batches", "apply_to_host", "apply_to_hosts", "check_conflicts", "log_errors", "plan_report", "scan_values", "write_metrics", "DriftReport", "ScopeDrift", "Snapshot", "SNAPSHOT_RECORD_FIELDS", "SNAPSHOT_VERSION", "compact_record", "diff_scope_leases", "drift_report", "load_snapshot", "snapshot_path", "ApplyPlan", "HostState", "StateFile", "content_hash", "full_plan", "hash_values", "incremental_plan", "STREAMED_LISTS", "ValuesItem", "batch_values", "iter_values", "iter_values_dict", "load_values", "written_rrset", "FileWatcher", "IMPORTABLE_TYPES", "is_importable", "render_zone_file"]
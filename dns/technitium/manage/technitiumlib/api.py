@@ -0,0 +1,826 @@
+from dataclasses import dataclass
+from functools import partial
+import logging
+import requests
+import time
+from .client import JSON, TechnitiumClient, DEFAULT_CONNECT_TIMEOUT, DEFAULT_POOL_SIZE, DEFAULT_READ_TIMEOUT
+from .executor import ItemError, Task, group_by, run_tasks
+from .leases import DhcpLeaseIndex, format_reserved_leases, merge_reserved_leases, normalize_mac, reservation_comments, reserved_leases_equal
+from .records import DnsRecord, RecordDiff, ReconcileSummary, MANAGED_COMMENT, diff_zone_records, normalize_name, record_from_api
+from .retry import RateLimiter, RetryPolicy
+from .reverse import ReverseZonePlan, plan_reverse_zones, without_ptr
+from .snapshot import Snapshot, compact_record
+from .state import ApplyPlan
+from .zonefile import is_importable, render_zone_file
+
+class ApiStatusError(Exception):
+        """Exception raised a status type of "error" is returned from the Technitium API."""
+        def __init__(self, message="Status type of error was found in the response."):
+            super().__init__(message)
+
+# Zone types records can be added to and deleted from.
+WRITABLE_ZONE_TYPES: set[str] = {"Primary", "Forwarder"}
+# Zones requested per zones/list page when exporting a snapshot.
+DEFAULT_ZONES_PER_PAGE: int = 100
+
+def detect_api_status_error(response: JSON):
+    """Raises an ApiStatusError if a status type of "error" is found in the response json. The API returns a status code of 200 in some cases, requiring this extra step.
+
+    Args:
+        response (JSON): API response to detect errors in
+    """
+    if "status" in response:
+        if response["status"].casefold() == "error".casefold():
+            raise ApiStatusError(response["errorMessage"])
+
+@dataclass
+class ApplyOptions:
+    """How a TechnitiumApi applies the zones and scopes of a values file.
+
+    Args:
+        reconcile (bool): (Optional) Diff each zone against its current records and only send the changes that are needed. Managed records no longer in the values file are removed.
+        bulk_import (bool): (Optional) Send the records of each zone in a single zone file import request.
+        scope_update (bool): (Optional) Apply the reservations of each DHCP scope with a single dhcp/scopes/set request.
+        concurrency (int): (Optional) Number of zones, record names, scopes or MAC addresses processed in parallel.
+    """
+    reconcile: bool = False
+    bulk_import: bool = False
+    scope_update: bool = False
+    concurrency: int = 1
+
+class TechnitiumApi(TechnitiumClient):
+    """Client for the Technitium DNS and DHCP operations used to apply a values file.
+
+    Everything it needs is passed to the constructor and nothing is read from the command line, the environment
+    or the values file, so a long running service can keep one instance per API host and apply any number of
+    values files with it. Remote state cached between applies can be dropped with clear_cache.
+
+    Args:
+        api_host (str): API endpoint (example: http://localhost:5380)
+        api_token (str): Token used to authenticate against the api_host.
+        options (ApplyOptions): (Optional) How zones and scopes are applied. Defaults to ApplyOptions().
+        session (requests.Session): (Optional) Session to send requests with, see TechnitiumClient.
+        pool_size (int): (Optional) Maximum number of connections kept open to the api_host.
+        connect_timeout (float): (Optional) Seconds to wait for a connection to be established.
+        read_timeout (float): (Optional) Seconds to wait for the API to send a response.
+        retry_policy (RetryPolicy): (Optional) Retries of transient failures.
+        rate_limiter (RateLimiter): (Optional) Limits the request rate to the api_host.
+        dry_run (bool): (Optional) Plan an apply without changing anything, see TechnitiumClient.
+    """
+    def __init__(self, api_host: str, api_token: str, options: ApplyOptions | None = None, session: requests.Session | None = None, pool_size: int = DEFAULT_POOL_SIZE, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT, retry_policy: RetryPolicy | None = None, rate_limiter: RateLimiter | None = None, dry_run: bool = False):
+        super().__init__(api_host, api_token, pool_size, connect_timeout, read_timeout, retry_policy, rate_limiter, session, dry_run)
+        self.options: ApplyOptions = options if options is not None else ApplyOptions()
+
+    def get_dhcp_lease_index(self, scope_name: str) -> DhcpLeaseIndex:
+        """Gets the reserved lease index for a DHCP scope. The scope is requested from the API once per client and indexed by MAC and IP address.
+
+        Args:
+            scope_name (str): The DHCP scope to index
+
+        Returns:
+            DhcpLeaseIndex: Reserved leases of the scope, indexed by MAC and IP address.
+        """
+        lease_index = self.lease_indexes.get(scope_name)
+        if lease_index is None:
+            data = self.get_dhcp_scope(scope_name)
+            leases = data.get("response", {}).get("reservedLeases", None) or []
+            lease_index = DhcpLeaseIndex(scope_name, leases)
+            logging.info(f"Indexed {len(lease_index)} reserved leases for scope {scope_name}.")
+            # Another thread may have indexed the same scope in the meantime, keep whichever was stored first.
+            lease_index = self.lease_indexes.setdefault(scope_name, lease_index)
+        return lease_index
+
+    def get_dhcp_reservation(self, scope_name: str, hardware_address: str) -> JSON:
+        """Gets an existing DHCP reservation for a hardware MAC address
+
+        Args:
+            scope_name (str): The scope containing a reservation for the hardware_address
+            hardware_address (str): MAC address of the DHCP reservation
+        """
+        logging.debug(f"Get DHCP reservation (MAC={hardware_address}; scope={scope_name}) from lease index")
+        return self.get_dhcp_lease_index(scope_name).get_by_mac(hardware_address)
+
+    def delete_dhcp_reservation(self, scope_name: str, hardware_address: str) -> JSON:
+        """Deletes an existing DHCP reservation for a hardware MAC address in a specific scope
+
+        Args:
+            scope_name (str): The scope containing a reservation for the hardware_address 
+            hardware_address (str): MAC address of the DHCP reservation to delete
+        """
+        params = { 
+            "name": scope_name,
+            "hardwareAddress": hardware_address
+        }
+        logging.info(f"Delete DHCP reservation (MAC={hardware_address}; scope={scope_name}) at {self.url("dhcp/scopes/removeReservedLease")}")
+        data = self.post("dhcp/scopes/removeReservedLease", params)
+
+        # API returns 200 response code even when no scope is found
+        detect_api_status_error(data)
+        self.get_dhcp_lease_index(scope_name).remove(hardware_address)
+    
+        return data
+
+    def add_dhcp_reservation(self, scope_name: str, hardware_address: str, ip_address: str, host_name: str = "", comments: str = "") -> JSON:
+        """Sets a DHCP scope for the assignment
+
+        Args:
+            scope_name (str): The scope name in which to make reserved lease
+            hardware_address (str): The MAC address of the client.
+            ip_address (str): The reserved IP address for the client.
+            host_name (str): (Optional) The hostname of the client to override.
+            comments (str): (Optional) Comments for the reserved lease entry.
+        """
+        params = {
+            "name": scope_name,
+            "hardwareAddress": hardware_address,
+            "ipAddress": ip_address,
+            "hostName": host_name,
+            "comments": reservation_comments(comments)
+        }
+        
+        logging.info(f"Adding DHCP Reservation (MAC={hardware_address}; IP={ip_address}) ")
+        data = self.post("dhcp/scopes/addReservedLease", params)
+
+        # API returns 200 response code even when no scope is found
+        detect_api_status_error(data)
+        self.get_dhcp_lease_index(scope_name).add({
+            "hostName": host_name,
+            "hardwareAddress": hardware_address,
+            "address": ip_address,
+            "comments": params["comments"]
+        })
+    
+        return data
+
+    def set_dhcp_reservations(self, scope_name: str, assignments: list[dict]):
+        """Applies the assignments for a single MAC address in a scope, in the order they appear in the values file
+
+        Args:
+            scope_name (str): The scope name in which to make reserved leases
+            assignments (list[dict]): dhcp_scopes[].assignments[] entries sharing the same MAC address
+        """
+        for assignment in assignments:
+            exising_reservation = self.get_dhcp_reservation(scope_name, assignment["hardwareAddress"])
+            if exising_reservation:
+                logging.info(f"Removing existing reservation for MAC {assignment["hardwareAddress"]}.")
+                self.delete_dhcp_reservation(scope_name, assignment["hardwareAddress"])
+            self.add_dhcp_reservation(scope_name,
+                                      assignment["hardwareAddress"],
+                                      assignment["ipAddress"],
+                                      assignment.get("hostName", ""),
+                                      assignment.get("comments", ""))
+
+    def set_dhcp_scope_reservations(self, dhcp_scopes: dict[str, dict]) -> list[ItemError]:
+        """Configures DHCP leases based on the dictionary of scope assignments
+
+        Assignments are grouped by MAC address and the groups are applied in parallel, up to options.concurrency at a time.
+
+        Args:
+            dhcp_scopes (dict[str, dict]): List of dhcp scopes and their address reservations
+
+        Returns:
+            list[ItemError]: Errors for the MAC addresses that failed.
+        """
+        tasks: list[Task] = []
+        for scope in dhcp_scopes:
+            logging.info(f"Processing address reservations for scope: {scope["name"]}")
+            assignments = group_by(scope.get("assignments", []), lambda assignment: normalize_mac(assignment["hardwareAddress"]))
+            for hardware_address, mac_assignments in assignments.items():
+                tasks.append((f"MAC {hardware_address} in dhcp scope '{scope["name"]}'", partial(self.set_dhcp_reservations, scope["name"], mac_assignments)))
+        return run_tasks(tasks, self.options.concurrency)[1]
+
+    def set_dhcp_scope_reserved_leases(self, scope_name: str, leases: list[dict]) -> JSON:
+        """Replaces every reserved lease of a DHCP scope with a single request
+
+        Args:
+            scope_name (str): The scope to update
+            leases (list[dict]): The complete list of reserved leases for the scope.
+        """
+        params = {
+            "name": scope_name
+        }
+        # The lease list of a large scope is too long for the query string, so it is sent in the form body.
+        form = {
+            "reservedLeases": format_reserved_leases(leases)
+        }
+        logging.info(f"Setting {len(leases)} reserved leases for scope {scope_name} at {self.url("dhcp/scopes/set")}")
+        data = self.post("dhcp/scopes/set", params, form)
+
+        # API returns 200 response code even when no scope is found
+        detect_api_status_error(data)
+        # A dry run keeps the current leases, so the plan can list what the update changes.
+        if not self.dry_run:
+            self.lease_indexes[scope_name] = DhcpLeaseIndex(scope_name, leases)
+
+        return data
+
+    def update_dhcp_scope(self, scope: dict):
+        """Builds the desired reservedLeases list of a scope and applies it when it differs from the server
+
+        Args:
+            scope (dict): dhcp_scopes[] entry from the values file
+        """
+        logging.info(f"Processing address reservations for scope: {scope["name"]}")
+        lease_index = self.get_dhcp_lease_index(scope["name"])
+        leases = merge_reserved_leases(lease_index, scope.get("assignments", []))
+        if reserved_leases_equal(lease_index, leases):
+            logging.info(f"Reserved leases for scope {scope["name"]} are up to date.")
+            return
+        self.set_dhcp_scope_reserved_leases(scope["name"], leases)
+
+    def update_dhcp_scope_reservations(self, dhcp_scopes: dict[str, dict]) -> list[ItemError]:
+        """Configures DHCP leases with one read and at most one write per scope
+
+        The desired reservedLeases list of each scope is built from its assignments, merged with the leases that
+        are not managed by this tool, and applied with a single dhcp/scopes/set request when it differs from the server.
+        Scopes are processed in parallel, up to options.concurrency at a time.
+
+        Args:
+            dhcp_scopes (dict[str, dict]): List of dhcp scopes and their address reservations
+
+        Returns:
+            list[ItemError]: Errors for the scopes that failed.
+        """
+        tasks: list[Task] = [(f"dhcp scope '{scope["name"]}'", partial(self.update_dhcp_scope, scope)) for scope in dhcp_scopes]
+        return run_tasks(tasks, self.options.concurrency)[1]
+
+    def get_dhcp_scope(self, name: str) -> JSON:
+        """Gets a DHCP scope from the Technitium API
+
+        Args:
+            name (str): DHCP Scope Name
+
+        Raises:
+            RuntimeError: When API returns an error from the request.
+
+        Returns:
+            str: JSON response data for the requested DHCP scope.
+        """
+        params = {'name': name}
+        logging.info(f"Requesting scope {name} from {self.url("dhcp/scopes/get")}")
+        data = self.get("dhcp/scopes/get", params)
+
+        # API returns 200 response code even when no scope is found
+        detect_api_status_error(data)
+    
+        return data
+
+    def validate_scopes(self, scopes: dict[str, dict]) -> list[ItemError]:
+        """Validates every scope exists, checking up to options.concurrency scopes at a time.
+
+        Args:
+            scopes (dict[str, dict]): Dictionary of scopes and their values to check for.
+
+        Returns:
+            list[ItemError]: Errors for the scopes that could not be found or requested.
+        """
+        def validate_scope(scope: dict):
+            logging.info(f"Checking for dhcp scope: {scope["name"]}")
+            self.get_dhcp_lease_index(scope["name"])
+
+        tasks: list[Task] = [(f"dhcp scope '{scope["name"]}'", partial(validate_scope, scope)) for scope in scopes]
+        return run_tasks(tasks, self.options.concurrency)[1]
+
+    def get_dns_zone_index(self) -> dict[str, JSON]:
+        """Gets every zone on the server with a single zones/list request, indexed by lower case zone name. The list is requested once per client.
+
+        Args:
+
+        Returns:
+            dict[str, JSON]: zones/list entries (name, type, disabled, ...) indexed by zone name.
+        """
+        if self.zone_index is None:
+            logging.info(f"Requesting zones from {self.url("zones/list")}")
+            data = self.get("zones/list")
+
+            # API returns 200 response code even when there was an error
+            detect_api_status_error(data)
+            zones = data.get("response", {}).get("zones", None) or []
+            self.zone_index = {zone["name"].casefold(): zone for zone in zones}
+            logging.info(f"Indexed {len(self.zone_index)} zones.")
+        return self.zone_index
+
+    def get_dns_zone_options(self, zone: str, include_catalog_zone_names: bool = False, include_tsig_key_names: bool = False) -> JSON:
+        """Gets Zone Options for an authoritative zone from the Technitium API
+
+        Args:
+            zone (str): DNZ Zone Name
+            include_catalog_zone_names (bool): (Optional) Includes the catalog zone names available on the server. Expensive for the server to look up.
+            include_tsig_key_names (bool): (Optional) Includes the TSIG key names available on the server. Expensive for the server to look up.
+
+        Raises:
+            RuntimeError: When API returns an error from the request.
+
+        Returns:
+            str: JSON response data for the requested Zone options.
+        """
+
+        params = {
+            "zone": zone,
+            "includeAvailableCatalogZoneNames": include_catalog_zone_names,
+            "includeAvailableTsigKeyNames": include_tsig_key_names
+        }
+        logging.info(f"Requesting zone options for zone {zone} from {self.url("zones/options/get")}")
+        data = self.get("zones/options/get", params)
+
+        # API returns 200 response code even when no scope is found
+        detect_api_status_error(data)
+    
+        return data
+
+    def add_dns_zone_record(self, zone: str, name: str, record_type: str, ip_address: str | None = None, name_server: str | None = None, cname: str | None = None, overwrite: bool = False, ptr: bool = False, create_ptr_zone: bool = False) -> JSON:
+        """Gets Zone Options for an authoritative zone from the Technitium API
+
+        Args:
+            zone (str): DNS Zone Name
+            name (str): Name of the record to add.
+            record_type (str): Record type: A, AAAA, NS, CNAME, etc
+            ip_address (str): (Conditional) Required for A or AAAA record types, otherwise should not be set.
+            cname (str): (Conditional) Required for CNAME record type, otherwise should not be set.
+            overwrite (bool): (Optional) Creates or updates existing record. false: Creates new records only.
+            ptr (bool): (Optional) Creates a reverse PTR record for the ipAddress. This option is used only for A and AAAA records.
+            create_ptr_zone (bool): (Optional) Creates a new Ptr Zone for the ip address if it doesn't exist. false: expects PTR zone to already exist if ptr=true.
+        Raises:
+            RuntimeError: When API returns an error from the request.
+
+        Returns:
+            str: JSON response data for the requested Zone options.
+        """
+
+        params = {
+            "zone": zone,
+            "domain": f"{name}.{zone}",
+            "type": record_type,
+            "overwrite": overwrite,
+            "ptr": ptr,
+            "createPtrZone": create_ptr_zone,
+            "comments": MANAGED_COMMENT
+        }
+
+        if record_type.upper() in { "A", "AAAA" }:
+            if ip_address is None:
+                raise ValueError(f"ip_address must be set for record_type {record_type.upper()}")
+            params["ipAddress"] = ip_address
+        elif ip_address:
+            logging.warning(f"ip_address is set but is not valid for record type {record_type.upper()} and will be ignored")
+
+        if record_type.upper() == "CNAME":
+            if cname is None:
+                raise ValueError(f"cname must be set for record_type {record_type.upper()}")
+            params["cname"] = cname
+        elif cname:
+            logging.warning(f"cname is set but is not valid for record type {record_type.upper()} and will be ignored")
+
+        if record_type.upper() == "NS":
+            if name_server is None:
+                raise ValueError(f"name_server must be set for record_type {record_type.upper()}")
+            params["nameServer"] = name_server
+        elif name_server:
+            logging.warning(f"name_server is set but is not valid for record type {record_type.upper()} and will be ignored")
+
+        logging.info(f"Adding/Updating {name}.{zone} {record_type.upper()} record to {self.url("zones/records/add")}")
+        data = self.post("zones/records/add", params)
+
+        if "status" in data:
+            if data["status"].casefold() == "error".casefold():
+                logging.info("detected error in response")
+                if data["errorMessage"].casefold() == "cannot add record: record already exists.".casefold():
+                    logging.info("error expected")
+                    if not overwrite:
+                        logging.info("overriding error")
+                        data["status"] = "ok"
+                        data["message"] = "Record not added. Record already exists."
+                        del data["errorMessage"]
+                        return data
+        
+        # API returns 200 response code even when there was an error
+        detect_api_status_error(data)
+    
+        return data
+
+    def validate_dns_zones(self, zones: dict[str, dict]) -> list[ItemError]:
+        """Validates every zone exists and accepts record changes.
+
+        The zone list is requested once and every zone is checked against it in memory.
+
+        Args:
+            zones (dict[str, dict]): Dictionary of zones and their values to check for.
+
+        Returns:
+            list[ItemError]: Errors for the zones that could not be found or don't accept record changes.
+        """
+        if not zones:
+            return []
+        try:
+            zone_index = self.get_dns_zone_index()
+        except Exception as e:
+            logging.error(f"Failed requesting the zone list: {e}")
+            return [ItemError("dns zone list", e)]
+
+        errors: list[ItemError] = []
+        for zone in zones:
+            logging.info(f"Checking for dns zone: {zone["zone"]}")
+            server_zone = zone_index.get(zone["zone"].casefold(), None)
+            if server_zone is None:
+                errors.append(ItemError(f"dns zone '{zone["zone"]}'", ApiStatusError(f"Zone {zone["zone"]} was not found.")))
+            elif server_zone.get("type", None) not in WRITABLE_ZONE_TYPES:
+                errors.append(ItemError(f"dns zone '{zone["zone"]}'", ApiStatusError(f"Zone {zone["zone"]} is a {server_zone.get("type", None)} zone. Records can only be managed in {", ".join(sorted(WRITABLE_ZONE_TYPES))} zones.")))
+            elif server_zone.get("disabled", False):
+                logging.warning(f"Zone {zone["zone"]} is disabled.")
+        for error in errors:
+            logging.error(f"Failed processing {error}")
+        return errors
+
+    def get_dns_zone_records(self, zone: str) -> list[JSON]:
+        """Gets every record in an authoritative zone from the Technitium API with a single request
+
+        Args:
+            zone (str): DNS Zone Name
+
+        Returns:
+            list[JSON]: Records in the zone.
+        """
+        params = {
+            "zone": zone,
+            "domain": zone,
+            "listZone": "true"
+        }
+        logging.info(f"Requesting records for zone {zone} from {self.url("zones/records/get")}")
+        data = self.get("zones/records/get", params)
+
+        # API returns 200 response code even when no zone is found
+        detect_api_status_error(data)
+
+        return data.get("response", {}).get("records", [])
+
+    def delete_dns_zone_record(self, zone: str, record: DnsRecord) -> JSON:
+        """Deletes a record from an authoritative zone
+
+        Args:
+            zone (str): DNS Zone Name
+            record (DnsRecord): The record to delete.
+        """
+        params = {
+            "zone": zone,
+            "domain": record.name,
+            "type": record.type,
+            record.rdata_field: record.rdata
+        }
+        logging.info(f"Deleting {record.name} {record.type} {record.rdata} record at {self.url("zones/records/delete")}")
+        data = self.post("zones/records/delete", params)
+
+        # API returns 200 response code even when there was an error
+        detect_api_status_error(data)
+
+        return data
+
+    def add_dns_values_record(self, zone: str, record: dict) -> JSON:
+        """Adds a zones[].records[] entry from the values file to a zone."""
+        return self.add_dns_zone_record(zone,
+                                        record["name"],
+                                        record["type"],
+                                        record.get("ipAddress", None),
+                                        record.get("nameServer", None),
+                                        record.get("cname", None),
+                                        record.get("overwrite", False),
+                                        record.get("ptr", False),
+                                        record.get("createPtrZone", False))
+
+    def import_dns_zone_records(self, zone: str, records: list[dict], overwrite: bool = False) -> JSON:
+        """Imports records into an authoritative zone with a single zone file import request
+
+        Args:
+            zone (str): DNS Zone Name
+            records (list[dict]): zones[].records[] entries from the values file. All records must be importable.
+            overwrite (bool): (Optional) Overwrites existing record sets for the imported records. false: Adds the records to existing record sets.
+        """
+        params = {
+            "zone": zone,
+            "overwrite": overwrite,
+            "overwriteSoaSerial": False
+        }
+        zone_file = render_zone_file(zone, records)
+        logging.info(f"Importing {len(records)} records into zone {zone} at {self.url("zones/import")}")
+        logging.debug(zone_file)
+        data = self.post("zones/import", params, zone_file, "text/plain")
+
+        # API returns 200 response code even when there was an error
+        detect_api_status_error(data)
+
+        return data
+
+    def create_dns_zone(self, zone: str, zone_type: str = "Primary") -> JSON:
+        """Creates a DNS zone and adds it to the client's zone index
+
+        Args:
+            zone (str): DNS Zone Name
+            zone_type (str): (Optional) Type of zone to create.
+        """
+        params = {
+            "zone": zone,
+            "type": zone_type
+        }
+        logging.info(f"Creating {zone_type} zone {zone} at {self.url("zones/create")}")
+        data = self.post("zones/create", params)
+
+        # API returns 200 response code even when there was an error
+        detect_api_status_error(data)
+
+        self.get_dns_zone_index()[zone] = {"name": zone, "type": zone_type}
+        return data
+
+    def set_reverse_zone_records(self, reverse_zone: ReverseZonePlan):
+        """Creates a missing reverse zone once and imports all of its PTR records with a single request."""
+        if not reverse_zone.exists:
+            if not reverse_zone.create:
+                raise ApiStatusError(f"Reverse zone {reverse_zone.zone} does not exist and no record with ptr set has createPtrZone set.")
+            self.create_dns_zone(reverse_zone.zone)
+        self.import_dns_zone_records(reverse_zone.zone, reverse_zone.records, overwrite=True)
+
+    def set_ptr_records(self, zone_records: list[tuple[str, dict]]) -> list[ItemError]:
+        """Creates the reverse PTR records of every A and AAAA record with ptr set, before the records themselves are added.
+
+        The records are grouped by the reverse zone they belong in, so each missing reverse zone is created once and
+        each reverse zone takes a single import request instead of one server side PTR update per record.
+        Reverse zones are processed in parallel, up to options.concurrency at a time.
+
+        Args:
+            zone_records (list[tuple[str, dict]]): (zone name, zones[].records[] entry) pairs about to be added.
+
+        Returns:
+            list[ItemError]: Errors for the reverse zones that failed.
+        """
+        if not any(record.get("ptr", False) for _, record in zone_records):
+            return []
+        try:
+            reverse_zones = plan_reverse_zones(zone_records, self.get_dns_zone_index().keys())
+        except Exception as e:
+            logging.error(f"Failed planning reverse zones: {e}")
+            return [ItemError("dns reverse zones", e)]
+        logging.info(f"Setting PTR records in {len(reverse_zones)} reverse zones.")
+        tasks: list[Task] = [(f"dns reverse zone '{name}'", partial(self.set_reverse_zone_records, reverse_zone)) for name, reverse_zone in reverse_zones.items()]
+        return run_tasks(tasks, self.options.concurrency)[1]
+
+    def add_dns_values_records(self, zone: str, records: list[dict]):
+        """Adds zones[].records[] entries from the values file to a zone.
+
+        With options.bulk_import, importable records are sent in one zone file import per overwrite setting and
+        only the remaining records are added one at a time.
+        """
+        if self.options.bulk_import:
+            for overwrite in (True, False):
+                batch = [record for record in records if is_importable(record) and bool(record.get("overwrite", False)) == overwrite]
+                if batch:
+                    self.import_dns_zone_records(zone, batch, overwrite)
+            records = [record for record in records if not is_importable(record)]
+        for record in records:
+            self.add_dns_values_record(zone, record)
+
+    def set_dns_zone_records(self, dns_zones: dict[str, dict]) -> list[ItemError]:
+        """Configures DNS records based on the dictionary of zone records
+
+        Records are grouped by name and the groups are added in parallel, up to options.concurrency at a time.
+        With options.bulk_import each zone is a single group. PTR records are set per reverse zone first, see set_ptr_records.
+
+        Args:
+            dns_zones (dict[str, dict]): List of dns zones and their records
+
+        Returns:
+            list[ItemError]: Errors for the zones or record names that failed.
+        """
+        errors = self.set_ptr_records([(zone["zone"], record) for zone in dns_zones for record in zone.get("records", [])])
+        dns_zones = [{**zone, "records": without_ptr(zone.get("records", []))} for zone in dns_zones]
+
+        tasks: list[Task] = []
+        for zone in dns_zones:
+            logging.info(f"Processing DNS records for zone: {zone["zone"]}")
+            if self.options.bulk_import:
+                tasks.append((f"dns zone '{zone["zone"]}'", partial(self.add_dns_values_records, zone["zone"], zone.get("records", []))))
+                continue
+            records = group_by(zone.get("records", []), lambda record: record["name"].casefold())
+            for name, name_records in records.items():
+                tasks.append((f"dns record '{name}.{zone["zone"]}'", partial(self.add_dns_values_records, zone["zone"], name_records)))
+        return errors + run_tasks(tasks, self.options.concurrency)[1]
+
+    def diff_dns_zone(self, zone: dict) -> RecordDiff:
+        """Reads the current records of a zone with a single request and diffs them against the values file."""
+        logging.info(f"Reconciling DNS records for zone: {zone["zone"]}")
+        current_records = self.get_dns_zone_records(zone["zone"])
+        diff = diff_zone_records(zone["zone"], zone.get("records", []), current_records)
+        logging.info(f"Zone {zone["zone"]}: {len(diff.unchanged)} unchanged, {len(diff.create)} to create, {len(diff.update)} to update, {len(diff.delete)} to remove.")
+        return diff
+
+    def apply_dns_zone_diff(self, diff: RecordDiff):
+        """Applies the changes of a diff. Stale records are deleted first so a name can change record type, for example from A to CNAME."""
+        for record in diff.delete:
+            self.delete_dns_zone_record(diff.zone, record)
+        self.add_dns_values_records(diff.zone, diff.create + diff.update)
+
+    def reconcile_dns_zone_records(self, dns_zones: dict[str, dict]) -> tuple[ReconcileSummary, list[ItemError]]:
+        """Brings the records of each zone in line with the values file.
+
+        The current records of each zone are read with a single request and diffed against the values file by (name, type, rdata).
+        Only the adds, updates and deletes that are needed are sent, so a zone without changes costs one read and no writes.
+        Zones are read in parallel and the changes are applied per record name in parallel, up to options.concurrency at a time.
+
+        Args:
+            dns_zones (dict[str, dict]): List of dns zones and their records
+
+        Returns:
+            tuple[ReconcileSummary, list[ItemError]]: Count of records unchanged, created, updated and removed, and errors for the zones or record names that failed.
+        """
+        summary = ReconcileSummary()
+        read_tasks: list[Task] = [(f"dns zone '{zone["zone"]}'", partial(self.diff_dns_zone, zone)) for zone in dns_zones]
+        diffs, errors = run_tasks(read_tasks, self.options.concurrency)
+        errors.extend(self.set_ptr_records([(diff.zone, record) for diff in diffs for record in diff.create + diff.update]))
+
+        apply_tasks: list[Task] = []
+        for diff in diffs:
+            summary.add(diff)
+            diff.create = without_ptr(diff.create)
+            diff.update = without_ptr(diff.update)
+            if self.options.bulk_import:
+                apply_tasks.append((f"dns zone '{diff.zone}'", partial(self.apply_dns_zone_diff, diff)))
+                continue
+            for name, name_diff in diff.by_name().items():
+                apply_tasks.append((f"dns record '{name}'", partial(self.apply_dns_zone_diff, name_diff)))
+        errors.extend(run_tasks(apply_tasks, self.options.concurrency)[1])
+        return summary, errors
+
+    def remove_dns_zone_records(self, removed_records: dict[str, list[DnsRecord]]) -> list[ItemError]:
+        """Deletes records that were removed from the values file since they were last applied
+
+        The records of each zone are read first, and records that were already deleted outside of this tool, or
+        whose zone no longer exists, are skipped so a delete never fails on them.
+
+        Args:
+            removed_records (dict[str, list[DnsRecord]]): Records to delete, keyed by zone name.
+
+        Returns:
+            list[ItemError]: Errors for the zones that couldn't be read and the record names that failed.
+        """
+        def existing_records(zone: str, records: list[DnsRecord]) -> tuple[str, list[DnsRecord]]:
+            if normalize_name(zone) not in self.get_dns_zone_index():
+                logging.info(f"Zone {zone} no longer exists, skipping {len(records)} removed records.")
+                return zone, []
+            current = {dns_record.key for dns_record in map(record_from_api, self.get_dns_zone_records(zone)) if dns_record is not None}
+            existing = [record for record in records if record.key in current]
+            if len(existing) < len(records):
+                logging.info(f"Zone {zone}: {len(records) - len(existing)} removed records were already deleted.")
+            return zone, existing
+
+        read_tasks: list[Task] = [(f"dns zone '{zone}'", partial(existing_records, zone, records)) for zone, records in removed_records.items()]
+        zone_records, errors = run_tasks(read_tasks, self.options.concurrency)
+        tasks: list[Task] = []
+        for zone, records in zone_records:
+            for name, name_records in group_by(records, lambda record: record.name).items():
+                tasks.append((f"dns record '{name}'", partial(self.apply_dns_zone_diff, RecordDiff(zone, delete=name_records))))
+        return errors + run_tasks(tasks, self.options.concurrency)[1]
+
+    def remove_dhcp_reservations(self, removed_reservations: dict[str, list[str]]) -> list[ItemError]:
+        """Deletes reservations that were removed from the values file since they were last applied
+
+        Args:
+            removed_reservations (dict[str, list[str]]): MAC addresses to delete, keyed by scope name.
+
+        Returns:
+            list[ItemError]: Errors for the MAC addresses that failed.
+        """
+        def remove_reservation(scope_name: str, hardware_address: str):
+            if self.get_dhcp_reservation(scope_name, hardware_address):
+                self.delete_dhcp_reservation(scope_name, hardware_address)
+
+        tasks: list[Task] = []
+        for scope_name, hardware_addresses in removed_reservations.items():
+            for hardware_address in hardware_addresses:
+                tasks.append((f"MAC {hardware_address} in dhcp scope '{scope_name}'", partial(remove_reservation, scope_name, hardware_address)))
+        return run_tasks(tasks, self.options.concurrency)[1]
+
+    def apply_dns_zones(self, plan: ApplyPlan) -> list[ItemError]:
+        """Applies the zones of a plan in the mode selected by options.reconcile and options.bulk_import
+
+        Returns:
+            list[ItemError]: Errors for the zones or record names that failed.
+        """
+        if self.options.reconcile:
+            # Reading the zone records validates the zone exists.
+            summary, errors = self.reconcile_dns_zone_records(plan.zones)
+            logging.info(f"DNS records reconciled: {summary}.")
+            # Removed records of reconciled zones were already deleted by the diff.
+            reconciled = {zone["zone"] for zone in plan.zones}
+            removed_records = {zone: records for zone, records in plan.removed_records.items() if zone not in reconciled}
+            return errors + self.remove_dns_zone_records(removed_records)
+
+        errors = self.validate_dns_zones(plan.zones)
+        if errors:
+            return errors
+        return self.remove_dns_zone_records(plan.removed_records) + self.set_dns_zone_records(plan.zones)
+
+    def apply_dhcp_scopes(self, plan: ApplyPlan) -> list[ItemError]:
+        """Applies the scopes of a plan in the mode selected by options.scope_update
+
+        Returns:
+            list[ItemError]: Errors for the scopes or MAC addresses that failed.
+        """
+        errors = self.validate_scopes(plan.scopes)
+        if errors:
+            return errors
+        if self.options.scope_update:
+            # Managed leases missing from the values file are dropped from the scope by the update. Scopes removed
+            # from the values file entirely get no update, so their reservations are removed one by one.
+            scope_names = {scope["name"] for scope in plan.scopes}
+            removed = {name: hardware_addresses for name, hardware_addresses in plan.removed_reservations.items() if name not in scope_names}
+            return self.remove_dhcp_reservations(removed) + self.update_dhcp_scope_reservations(plan.scopes)
+        return self.remove_dhcp_reservations(plan.removed_reservations) + self.set_dhcp_scope_reservations(plan.scopes)
+
+    def apply_plan(self, plan: ApplyPlan) -> list[ItemError]:
+        """Applies the zones and scopes of a plan
+
+        Returns:
+            list[ItemError]: Errors for the items that failed.
+        """
+        errors: list[ItemError] = []
+        if plan.zones or plan.removed_records:
+            errors.extend(self.apply_dns_zones(plan))
+
+        if plan.scopes or plan.removed_reservations:
+            errors.extend(self.apply_dhcp_scopes(plan))
+        return errors
+
+    def list_dns_zones(self, zones_per_page: int = DEFAULT_ZONES_PER_PAGE) -> list[JSON]:
+        """Gets every zone on the server with paged zones/list requests.
+
+        The first page tells how many pages there are, the remaining pages are then requested in parallel, up to
+        options.concurrency at a time. Servers that don't page zones/list return every zone on the first page.
+
+        Args:
+            zones_per_page (int): (Optional) Zones requested per page.
+
+        Returns:
+            list[JSON]: zones/list entries (name, type, disabled, ...) of every zone.
+        """
+        def get_page(page_number: int) -> JSON:
+            logging.info(f"Requesting zones page {page_number} from {self.url("zones/list")}")
+            data = self.get("zones/list", {"pageNumber": page_number, "zonesPerPage": zones_per_page})
+
+            # API returns 200 response code even when there was an error
+            detect_api_status_error(data)
+            return data.get("response", {})
+
+        first_page = get_page(1)
+        tasks: list[Task] = [(f"zones page {page_number}", partial(get_page, page_number)) for page_number in range(2, (first_page.get("totalPages", None) or 1) + 1)]
+        pages, errors = run_tasks(tasks, self.options.concurrency)
+        if errors:
+            raise errors[0].error
+        return [zone for page in [first_page, *pages] for zone in page.get("zones", None) or []]
+
+    def list_dhcp_scopes(self) -> list[JSON]:
+        """Gets the name, addresses and state of every DHCP scope on the server
+
+        Returns:
+            list[JSON]: dhcp/scopes/list entries.
+        """
+        logging.info(f"Requesting dhcp scopes from {self.url("dhcp/scopes/list")}")
+        data = self.get("dhcp/scopes/list")
+
+        # API returns 200 response code even when there was an error
+        detect_api_status_error(data)
+        return data.get("response", {}).get("scopes", None) or []
+
+    def export_snapshot(self, zones_per_page: int = DEFAULT_ZONES_PER_PAGE) -> Snapshot:
+        """Reads every zone, record and DHCP reserved lease on the server into a Snapshot.
+
+        Zones are listed with paged requests, then the records of each zone and the reserved leases of each scope
+        are read with one request each, up to options.concurrency at a time. The zone index and lease indexes of
+        the client are refreshed from the same responses, so a following apply doesn't read them again.
+
+        Args:
+            zones_per_page (int): (Optional) Zones requested per zones/list page.
+
+        Raises:
+            Exception: The first error of any read, since a partial snapshot would report false drift.
+
+        Returns:
+            Snapshot: Zones, records and reserved leases of the server.
+        """
+        taken_at = time.time()
+        zones = {zone["name"].casefold(): zone for zone in self.list_dns_zones(zones_per_page)}
+        self.zone_index = zones
+
+        def get_records(zone: str) -> list[JSON]:
+            return [compact_record(record) for record in self.get_dns_zone_records(zone)]
+
+        def get_leases(scope_name: str) -> list[JSON]:
+            self.lease_indexes.pop(scope_name, None)
+            return list(self.get_dhcp_lease_index(scope_name))
+
+        zone_tasks: list[Task] = [(f"dns zone '{zone}'", partial(get_records, zone)) for zone in zones]
+        scope_names = [scope["name"] for scope in self.list_dhcp_scopes()]
+        scope_tasks: list[Task] = [(f"dhcp scope '{scope_name}'", partial(get_leases, scope_name)) for scope_name in scope_names]
+        results, errors = run_tasks(zone_tasks + scope_tasks, self.options.concurrency)
+        if errors:
+            raise errors[0].error
+
+        snapshot = Snapshot(self.api_host, taken_at, zones, dict(zip(zones, results[:len(zones)])), dict(zip(scope_names, results[len(zones):])))
+        logging.info(f"Exported {len(zones)} zones, {sum(len(records) for records in snapshot.records.values())} records and {len(scope_names)} dhcp scopes from {self.api_host}.")
+        return snapshot
@@ -0,0 +1,71 @@
+import ipaddress
+import logging
+from .records import normalize_name
+
+def scope_zone_records(scope: dict) -> list[dict]:
+    """Derives the zones[].records[] entries of a dhcp_scopes[] entry bound to a zone.
+
+    Every assignment with a hostName becomes an A (or AAAA) record named after the host in the scope's zone,
+    pointing at the reserved address. A host name already qualified with the zone is made relative to it.
+    The records ask for their PTR record unless the scope sets ptr: false.
+
+    Args:
+        scope (dict): dhcp_scopes[] entry with a zone value.
+
+    Returns:
+        list[dict]: Derived records, in the order of the assignments.
+    """
+    zone = normalize_name(scope["zone"])
+    records: list[dict] = []
+    for assignment in scope.get("assignments", None) or []:
+        host_name = normalize_name(str(assignment.get("hostName", None) or ""))
+        if not host_name:
+            continue
+        host_name = host_name.removesuffix(f".{zone}")
+        try:
+            address = ipaddress.ip_address(str(assignment["ipAddress"]).strip())
+        except ValueError:
+            # Left to the conflict check to report.
+            continue
+        records.append({
+            "name": host_name,
+            "type": "A" if address.version == 4 else "AAAA",
+            "ipAddress": str(address),
+            "overwrite": True,
+            "ptr": scope.get("ptr", True),
+            "createPtrZone": scope.get("createPtrZone", False)
+        })
+    return records
+
+def bind_scope_zones(values: dict, written: set[tuple[str, str, str]] | None = None) -> dict:
+    """Adds the records derived from every DHCP scope bound to a zone to the zones of the values file.
+
+    A bound zone missing from zones is added. Records written in the values file win over derived records
+    with the same name and type, so a host can still be given a different address in DNS.
+
+    Args:
+        values (dict): Loaded values file.
+        written (set[tuple[str, str, str]]): (Optional) (zone, name, type) of records written elsewhere in the values
+            file, when values only holds part of it.
+
+    Returns:
+        dict: The values file with the derived records. values itself is not modified.
+    """
+    bound_scopes = [scope for scope in values.get("dhcp_scopes", None) or [] if scope.get("zone", None)]
+    if not bound_scopes:
+        return values
+
+    zones = [{**zone, "records": list(zone.get("records", None) or [])} for zone in values.get("zones", None) or []]
+    zones_by_name = {normalize_name(zone["zone"]): zone for zone in zones}
+    for scope in bound_scopes:
+        zone = zones_by_name.get(normalize_name(scope["zone"]))
+        if zone is None:
+            zone = {"zone": scope["zone"], "records": []}
+            zones.append(zone)
+            zones_by_name[normalize_name(scope["zone"])] = zone
+        zone_written = {(normalize_name(record["name"]), record["type"].upper()) for record in zone["records"]}
+        zone_written.update((name, record_type) for written_zone, name, record_type in written or () if written_zone == normalize_name(scope["zone"]))
+        derived = [record for record in scope_zone_records(scope) if (record["name"], record["type"]) not in zone_written]
+        zone["records"].extend(derived)
+        logging.info(f"Derived {len(derived)} records in zone {scope["zone"]} from dhcp scope {scope["name"]}.")
+    return {**values, "zones": zones}
@@ -0,0 +1,205 @@
+from dataclasses import dataclass
+import json
+import logging
+import requests
+import threading
+import time
+from urllib.parse import urlencode
+from requests.adapters import HTTPAdapter
+from .leases import DhcpLeaseIndex
+from .metrics import RequestMetrics
+from .plan import PlannedCall
+from .retry import REJECTED_STATUSES, RETRY_STATUSES, RateLimiter, RetryPolicy, retry_after_seconds
+
+type JSON = dict[str, "JSON"] | list["JSON"] | str | int | float | bool | None
+
+DEFAULT_POOL_SIZE: int = 10
+DEFAULT_CONNECT_TIMEOUT: float = 5.0
+DEFAULT_READ_TIMEOUT: float = 30.0
+
+# Endpoints other than GET requests that are safe to send again after a failure that may have reached the server.
+# scopes/set replaces the whole scope, records/add either overwrites or reports the record already exists and
+# an import adds the same records to the same record sets.
+IDEMPOTENT_ENDPOINTS: set[str] = {"dhcp/scopes/set", "zones/records/add", "zones/import"}
+
+@dataclass
+class ClientStats:
+    """Request and connection counters for a single run of a TechnitiumClient."""
+    requests: int = 0
+    connections_opened: int = 0
+    retries: int = 0
+    throttle_seconds: float = 0.0
+
+    @property
+    def connection_reuses(self) -> int:
+        return max(self.requests - self.connections_opened, 0)
+
+class TechnitiumClient:
+    """HTTP client for the Technitium API.
+
+    Owns a pooled requests.Session so every call against the same API host reuses an open keep-alive
+    connection instead of paying a new TCP (and TLS) handshake per request. Requests are throttled by the
+    rate_limiter and transient failures are retried with the retry_policy. A dry_run client sends every GET request
+    but records the other requests in planned_calls instead of sending them.
+
+    Args:
+        api_host (str): API endpoint (example: http://localhost:5380)
+        api_token (str): Token used to authenticate against the api_host.
+        pool_size (int): (Optional) Maximum number of connections kept open to the api_host.
+        connect_timeout (float): (Optional) Seconds to wait for a connection to be established.
+        read_timeout (float): (Optional) Seconds to wait for the API to send a response.
+        retry_policy (RetryPolicy): (Optional) Retries of transient failures. Defaults to RetryPolicy().
+        rate_limiter (RateLimiter): (Optional) Limits the request rate to the api_host. Unlimited by default.
+        session (requests.Session): (Optional) Session to send requests with, for example one shared with other clients.
+            Used as is, pool_size only applies to the session created when none is given. A given session is not closed by close.
+        dry_run (bool): (Optional) Record write requests in planned_calls instead of sending them.
+    """
+    def __init__(self, api_host: str, api_token: str, pool_size: int = DEFAULT_POOL_SIZE, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT, retry_policy: RetryPolicy | None = None, rate_limiter: RateLimiter | None = None, session: requests.Session | None = None, dry_run: bool = False):
+        self.api_host: str = api_host.rstrip("/")
+        self.api_token: str = api_token
+        self.timeout: tuple[float, float] = (connect_timeout, read_timeout)
+        self.retry_policy: RetryPolicy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.rate_limiter: RateLimiter = rate_limiter if rate_limiter is not None else RateLimiter(0)
+        self.stats = ClientStats()
+        self.metrics = RequestMetrics()
+        self._stats_lock = threading.Lock()
+        # Remote state cached for the lifetime of this client, keyed by DHCP scope name.
+        self.lease_indexes: dict[str, DhcpLeaseIndex] = {}
+        # zones/list response indexed by zone name, once requested.
+        self.zone_index: dict[str, JSON] | None = None
+        self.dry_run: bool = dry_run
+        # Write requests not sent by a dry run, in the order they were made.
+        self.planned_calls: list[PlannedCall] = []
+
+        self._owns_session: bool = session is None
+        if session is None:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+            session = requests.Session()
+            session.headers.update({"Connection": "keep-alive"})
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session: requests.Session = session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Closes all pooled connections of the session created by this client."""
+        if self._owns_session:
+            self.session.close()
+
+    def clear_cache(self):
+        """Drops the remote state cached by this client, so the next apply reads it from the server again."""
+        self.lease_indexes = {}
+        self.zone_index = None
+
+    def url(self, endpoint: str) -> str:
+        """Returns the full url of an API endpoint (example: dhcp/scopes/get)."""
+        return f"{self.api_host}/api/{endpoint}"
+
+    def get(self, endpoint: str, params: dict | None = None, idempotent: bool | None = None) -> JSON:
+        """Sends a GET request to an API endpoint and returns the response json."""
+        return self.request("GET", endpoint, params, idempotent=idempotent)
+
+    def post(self, endpoint: str, params: dict | None = None, data: str | dict | None = None, content_type: str | None = None, idempotent: bool | None = None) -> JSON:
+        """Sends a POST request to an API endpoint and returns the response json."""
+        return self.request("POST", endpoint, params, data, content_type, idempotent)
+
+    def request(self, method: str, endpoint: str, params: dict | None = None, data: str | dict | None = None, content_type: str | None = None, idempotent: bool | None = None) -> JSON:
+        """Sends a request to an API endpoint over the pooled session.
+
+        Connection errors, timeouts and 5xx or 429 responses are retried with backoff when the call is idempotent.
+        Other calls are only retried when the request never reached the server: a connect timeout, or a 429 or 503 response.
+
+        Args:
+            method (str): HTTP method (GET, POST)
+            endpoint (str): API endpoint relative to /api/ (example: dhcp/scopes/get)
+            params (dict): (Optional) Query parameters. The api token is added automatically.
+            data (str | dict): (Optional) Request body. A dict is sent form encoded, for values too large for the query string.
+            content_type (str): (Optional) Content-Type of the request body.
+            idempotent (bool): (Optional) Whether the call is safe to send again. Defaults to true for GET requests and IDEMPOTENT_ENDPOINTS.
+
+        Raises:
+            requests.exceptions.HTTPError: When the API responds with an HTTP error status after all retries.
+            requests.exceptions.RequestException: When the request fails after all retries.
+
+        Returns:
+            JSON: Parsed response data.
+        """
+        if self.dry_run and method.upper() != "GET":
+            # Every write is a POST and callers only check the status of its response.
+            with self._stats_lock:
+                self.planned_calls.append(PlannedCall(endpoint, dict(params or {}), data))
+            logging.info(f"Dry run, not sending {method} {endpoint}")
+            return {"status": "ok", "response": {}}
+        request_params = {"token": self.api_token}
+        if params:
+            request_params.update(params)
+        if isinstance(data, dict):
+            data = urlencode(data)
+            content_type = "application/x-www-form-urlencoded"
+        headers = {"Content-Type": content_type} if content_type else None
+        body = data.encode("utf-8") if data is not None else None
+        if idempotent is None:
+            idempotent = method.upper() == "GET" or endpoint in IDEMPOTENT_ENDPOINTS
+        # Most calls send their data in the query string, so the URL counts towards the request size with the body.
+        bytes_sent = len(self.url(endpoint)) + 1 + len(urlencode(request_params)) + len(body or b"")
+
+        retry = 0
+        while True:
+            throttled = self.rate_limiter.acquire()
+            retry_after = None
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, self.url(endpoint), params=request_params, data=body, headers=headers, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.metrics.record(endpoint, time.perf_counter() - started, bytes_sent, failed=True)
+                self._record(throttled)
+                # A connect timeout means the request was never sent, so any call can be sent again.
+                if not self._can_retry(retry, idempotent or isinstance(e, requests.exceptions.ConnectTimeout)):
+                    raise
+                failure = type(e).__name__
+            else:
+                self.metrics.record(endpoint, time.perf_counter() - started, bytes_sent, len(response.content), not response.ok)
+                self._record(throttled, response)
+                if response.status_code not in RETRY_STATUSES or not self._can_retry(retry, idempotent or response.status_code in REJECTED_STATUSES):
+                    break
+                failure = f"HTTP {response.status_code}"
+                retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+            retry += 1
+            delay = self.retry_policy.delay(retry, retry_after)
+            logging.warning(f"{method} {endpoint} failed with {failure}, retry {retry} of {self.retry_policy.max_retries} in {delay:.2f}s.")
+            with self._stats_lock:
+                self.stats.retries += 1
+            time.sleep(delay)
+
+        response.raise_for_status()
+        data = response.json()
+        logging.debug(json.dumps(data, indent=4))
+        return data
+
+    def _can_retry(self, retry: int, safe: bool) -> bool:
+        return safe and retry < self.retry_policy.max_retries
+
+    def _record(self, throttled: float, response: requests.Response | None = None):
+        """Adds an attempt to the stats. Only attempts that got a response count as requests."""
+        with self._stats_lock:
+            self.stats.throttle_seconds += throttled
+            if response is not None:
+                self.stats.requests += 1
+                self.stats.connections_opened = self._connections_opened()
+
+    def _connections_opened(self) -> int:
+        """Total connections opened by the connection pools of the session."""
+        adapter = self.session.get_adapter(self.api_host)
+        if not isinstance(adapter, HTTPAdapter):
+            return 0
+        pools = adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def log_stats(self):
+        """Logs the request, connection reuse, retry and throttling counts of this client."""
+        logging.info(f"{self.stats.requests} requests sent to {self.api_host} over {self.stats.connections_opened} connections ({self.stats.connection_reuses} connection reuses), {self.stats.retries} retries, {self.stats.throttle_seconds:.2f}s throttled.")
@@ -0,0 +1,37 @@
+from dataclasses import dataclass
+from pathlib import Path
+import os
+
+@dataclass
+class ApiHost:
+    """A Technitium API host and where to find its API token.
+
+    A host without api_token_env_var or api_token_file uses the token given to the script (stdin, --api-token or TECHNITIUM_API_TOKEN).
+    """
+    hostname: str
+    api_token_env_var: str | None = None
+    api_token_file: str | None = None
+
+    def get_api_token(self, default_token: str | None = None) -> str:
+        if self.api_token_env_var:
+            if self.api_token_env_var in os.environ:
+                return os.getenv(self.api_token_env_var)
+            raise ValueError(f"Could not get value for variable '{self.api_token_env_var}' for API host {self.hostname}. Check this variable has been exported to your environment prior to running this script.")
+        if self.api_token_file:
+            return Path(self.api_token_file).expanduser().read_text().strip()
+        if default_token:
+            return default_token
+        raise ValueError(f"No API token found for API host {self.hostname}.")
+
+def get_api_hosts(api_section: dict) -> list[ApiHost]:
+    """Reads the api.hosts list of the values file.
+
+    Each entry is either a hostname string or a mapping with a hostname and an optional api_token_env_var or api_token_file.
+    """
+    hosts: list[ApiHost] = []
+    for host in api_section.get("hosts", None) or []:
+        if isinstance(host, str):
+            hosts.append(ApiHost(host))
+        else:
+            hosts.append(ApiHost(host["hostname"], host.get("api_token_env_var", None), host.get("api_token_file", None)))
+    return hosts
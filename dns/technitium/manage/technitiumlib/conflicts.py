@@ -0,0 +1,176 @@
+from dataclasses import dataclass, field
+import ipaddress
+import re
+from typing import Iterable
+from .leases import normalize_mac
+from .records import RDATA_FIELDS, normalize_name
+from .values import ValuesItem, iter_values_dict
+
+type IPAddress = ipaddress.IPv4Address | ipaddress.IPv6Address
+
+_MAC_PATTERN = re.compile(r"[0-9A-F]{2}(-[0-9A-F]{2}){5}")
+
+@dataclass
+class Conflict:
+    """A problem in the values file found before any request is sent, with the entries involved."""
+    kind: str
+    key: str
+    items: list[str] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        return f"{self.kind} {self.key}: {", ".join(self.items)}"
+
+@dataclass
+class ScopeRange:
+    """Addresses a DHCP scope can reserve, from its optional network and startingAddress/endingAddress values."""
+    network: ipaddress.IPv4Network | ipaddress.IPv6Network | None = None
+    start: IPAddress | None = None
+    end: IPAddress | None = None
+
+    def __contains__(self, address: IPAddress) -> bool:
+        if self.network is not None and address not in self.network:
+            return False
+        if self.start is not None and address < self.start:
+            return False
+        if self.end is not None and address > self.end:
+            return False
+        return True
+
+    def __str__(self) -> str:
+        bounds = [str(self.network)] if self.network is not None else []
+        if self.start is not None or self.end is not None:
+            bounds.append(f"{self.start or "*"}-{self.end or "*"}")
+        return " ".join(bounds)
+
+def _parse_address(value, version: int | None = None) -> IPAddress | None:
+    try:
+        address = ipaddress.ip_address(str(value).strip())
+    except ValueError:
+        return None
+    if version is not None and address.version != version:
+        return None
+    return address
+
+def scope_range(scope: dict) -> tuple[ScopeRange, list[Conflict]]:
+    """Reads the optional network, startingAddress and endingAddress of a dhcp_scopes[] entry."""
+    conflicts: list[Conflict] = []
+    scope_bounds = ScopeRange()
+    if scope.get("network", None):
+        try:
+            scope_bounds.network = ipaddress.ip_network(str(scope["network"]).strip(), strict=False)
+        except ValueError:
+            conflicts.append(Conflict("invalid network", str(scope["network"]), [f"dhcp scope '{scope["name"]}'"]))
+    for key in ("startingAddress", "endingAddress"):
+        if scope.get(key, None):
+            address = _parse_address(scope[key])
+            if address is None:
+                conflicts.append(Conflict(f"invalid {key}", str(scope[key]), [f"dhcp scope '{scope["name"]}'"]))
+            elif key == "startingAddress":
+                scope_bounds.start = address
+            else:
+                scope_bounds.end = address
+    return scope_bounds, conflicts
+
+def _duplicates(index: dict[str, list[str]], kind: str) -> list[Conflict]:
+    return [Conflict(kind, key, items) for key, items in index.items() if len(items) > 1]
+
+def find_conflicts(values: dict) -> list[Conflict]:
+    """Finds every address conflict in a values file without sending any request.
+
+    Every reservation ipAddress and hardwareAddress and every A/AAAA record target is indexed in a single pass.
+    Reported conflicts are:
+
+    - addresses and MAC addresses that are not valid
+    - a MAC address reserved more than once in the same scope
+    - an IP address reserved for more than one MAC address, in any scope
+    - a reservation outside of its scope's network or startingAddress-endingAddress range, when the scope sets them
+    - an IP address with more than one record asking for its PTR record (ptr: true), which would overwrite each other
+    - a zone, scope or record without its zone, name or type, or a record of a type this tool doesn't manage or
+      without its record data (ipAddress, cname, nameServer or ptrName)
+
+    Args:
+        values (dict): Loaded values file.
+
+    Returns:
+        list[Conflict]: Every conflict found, empty when the values file is consistent.
+    """
+    return find_item_conflicts(iter_values_dict(values))
+
+def find_item_conflicts(items: Iterable[ValuesItem]) -> list[Conflict]:
+    """Finds the conflicts of find_conflicts in values file entries streamed by iter_values.
+
+    Only the address and MAC address indexes are kept, not the entries themselves.
+
+    Args:
+        items (Iterable[ValuesItem]): Values file entries.
+
+    Returns:
+        list[Conflict]: Every conflict found, empty when the values file is consistent.
+    """
+    conflicts: list[Conflict] = []
+    reserved_macs: dict[str, list[str]] = {}
+    # IP address -> MAC address -> first reservation of the MAC for the address
+    reserved_ips: dict[str, dict[str, str]] = {}
+    ptr_ips: dict[str, list[str]] = {}
+    bounds = ScopeRange()
+
+    for values_item in items:
+        if values_item.kind == "zone":
+            if values_item.entry.get("zone", None) is None:
+                conflicts.append(Conflict("missing zone", "zones[]", [str(values_item.entry)]))
+        elif values_item.kind == "scope":
+            if values_item.entry.get("name", None) is None:
+                conflicts.append(Conflict("missing name", "dhcp_scopes[]", [str(values_item.entry)]))
+            bounds, scope_conflicts = scope_range(values_item.entry)
+            conflicts.extend(scope_conflicts)
+        elif values_item.kind == "assignment":
+            scope, assignment = values_item.entry, values_item.item
+            if not isinstance(assignment, dict):
+                conflicts.append(Conflict("invalid assignment", str(assignment), [f"dhcp scope '{scope.get("name")}'"]))
+                continue
+            item = f"dhcp scope '{scope.get("name")}' MAC {assignment.get("hardwareAddress")}"
+            hardware_address = normalize_mac(str(assignment.get("hardwareAddress", "")))
+            if not _MAC_PATTERN.fullmatch(hardware_address):
+                conflicts.append(Conflict("invalid hardwareAddress", str(assignment.get("hardwareAddress")), [item]))
+                continue
+            reserved_macs.setdefault(f"{scope.get("name")}|{hardware_address}", []).append(f"{item} ({assignment.get("ipAddress")})")
+            address = _parse_address(assignment.get("ipAddress"))
+            if address is None:
+                conflicts.append(Conflict("invalid ipAddress", str(assignment.get("ipAddress")), [item]))
+                continue
+            reserved_ips.setdefault(str(address), {}).setdefault(hardware_address, item)
+            if address not in bounds:
+                conflicts.append(Conflict("outside scope range", str(address), [f"{item} (scope {bounds})"]))
+        elif values_item.kind == "record":
+            zone, record = values_item.entry, values_item.item
+            if not isinstance(record, dict):
+                conflicts.append(Conflict("invalid record", str(record), [f"zone '{zone.get("zone")}'"]))
+                continue
+            missing = [key for key in ("name", "type") if record.get(key, None) in (None, "")]
+            # An empty name is the zone apex.
+            if record.get("name", None) == "":
+                missing.remove("name")
+            if missing:
+                conflicts.extend(Conflict(f"missing {key}", f"record in zone '{zone.get("zone")}'", [str(record)]) for key in missing)
+                continue
+            record_type = str(record["type"]).upper()
+            item = f"{record_type} record '{normalize_name(f"{record["name"]}.{zone.get("zone")}")}'"
+            if record_type not in RDATA_FIELDS:
+                conflicts.append(Conflict("unsupported record type", record_type or "(none)", [item]))
+                continue
+            if record.get(RDATA_FIELDS[record_type], None) is None:
+                conflicts.append(Conflict(f"missing {RDATA_FIELDS[record_type]}", record_type, [item]))
+                continue
+            if record_type not in {"A", "AAAA"}:
+                continue
+            address = _parse_address(record.get("ipAddress"), 4 if record_type == "A" else 6)
+            if address is None:
+                conflicts.append(Conflict("invalid ipAddress", str(record.get("ipAddress")), [item]))
+                continue
+            if record.get("ptr", False):
+                ptr_ips.setdefault(str(address), []).append(item)
+
+    conflicts.extend(Conflict(c.kind, c.key.split("|", 1)[1], c.items) for c in _duplicates(reserved_macs, "duplicate MAC address"))
+    conflicts.extend(_duplicates({ip: list(macs.values()) for ip, macs in reserved_ips.items()}, "duplicate reserved IP address"))
+    conflicts.extend(_duplicates(ptr_ips, "conflicting PTR records for"))
+    return conflicts
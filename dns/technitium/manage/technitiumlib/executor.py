@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Iterable
+import logging
+
+type Task = tuple[str, Callable[[], Any]]
+
+@dataclass
+class ItemError:
+    """An error raised while processing a single zone, record, scope or assignment."""
+    item: str
+    error: Exception
+
+    def __str__(self) -> str:
+        return f"{self.item}: {type(self.error).__name__}: {self.error}"
+
+def group_by[T](items: Iterable[T], key: Callable[[T], Hashable]) -> dict[Hashable, list[T]]:
+    """Groups items by key. Groups and the items within each group keep the order they were first seen in."""
+    groups: dict[Hashable, list[T]] = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    return groups
+
+def run_tasks(tasks: list[Task], concurrency: int = 1) -> tuple[list[Any], list[ItemError]]:
+    """Runs independent tasks on a bounded thread pool.
+
+    Each task is a (label, callable) pair. A failing task doesn't stop the others, its error is logged and
+    returned with the label of the item it was processing. Work that must keep its order, such as every change
+    to a single record name or MAC address, belongs in a single task.
+
+    Args:
+        tasks (list[Task]): (label, callable) pairs to run.
+        concurrency (int): (Optional) Maximum number of tasks running at once.
+
+    Returns:
+        tuple[list[Any], list[ItemError]]: Results of the tasks that succeeded, in the order the tasks were given, and the errors of the tasks that failed.
+    """
+    results: dict[int, Any] = {}
+    errors: list[ItemError] = []
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        futures = {pool.submit(task): (index, label) for index, (label, task) in enumerate(tasks)}
+        for future in as_completed(futures):
+            index, label = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                logging.error(f"Failed processing {label}: {e}")
+                logging.debug(f"Failed processing {label}", exc_info=e)
+                errors.append(ItemError(label, e))
+    return [results[index] for index in sorted(results)], errors
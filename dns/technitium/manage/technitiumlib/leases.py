@@ -0,0 +1,126 @@
+from typing import Iterable, Iterator
+import logging
+import threading
+from .records import MANAGED_COMMENT, is_managed
+
+def normalize_mac(hardware_address: str) -> str:
+    """Normalizes a MAC address to the upper case, dash separated format returned by the Technitium API (example: 85-DC-6C-AB-BE-31)."""
+    return hardware_address.strip().replace(":", "-").upper()
+
+class DhcpLeaseIndex:
+    """Reserved leases of a single DHCP scope, indexed by normalized MAC address and by IP address.
+
+    Built once from a dhcp/scopes/get response and updated in place as reservations are added or removed,
+    so lookups never need to re-fetch the scope. Safe to update from multiple threads.
+
+    Args:
+        scope_name (str): Name of the DHCP scope the leases belong to.
+        leases (list[dict]): reservedLeases from the dhcp/scopes/get response.
+    """
+    def __init__(self, scope_name: str, leases: list[dict] | None = None):
+        self.scope_name: str = scope_name
+        self._by_mac: dict[str, dict] = {}
+        self._by_ip: dict[str, dict] = {}
+        self._lock = threading.RLock()
+        for lease in leases or []:
+            self.add(lease)
+
+    def __len__(self) -> int:
+        return len(self._by_mac)
+
+    def __iter__(self) -> Iterator[dict]:
+        with self._lock:
+            return iter(list(self._by_mac.values()))
+
+    def get_by_mac(self, hardware_address: str) -> dict | None:
+        """Returns the reserved lease for a MAC address, if one exists."""
+        return self._by_mac.get(normalize_mac(hardware_address))
+
+    def get_by_ip(self, ip_address: str) -> dict | None:
+        """Returns the reserved lease for an IP address, if one exists."""
+        return self._by_ip.get(ip_address.strip())
+
+    def add(self, lease: dict):
+        """Adds or replaces a reserved lease. Any lease previously indexed under the same MAC address is replaced."""
+        with self._lock:
+            self.remove(lease["hardwareAddress"])
+            self._by_mac[normalize_mac(lease["hardwareAddress"])] = lease
+            if lease.get("address"):
+                self._by_ip[lease["address"].strip()] = lease
+
+    def remove(self, hardware_address: str) -> dict | None:
+        """Removes and returns the reserved lease for a MAC address, if one exists."""
+        with self._lock:
+            lease = self._by_mac.pop(normalize_mac(hardware_address), None)
+            if lease is not None and lease.get("address"):
+                if self._by_ip.get(lease["address"].strip()) is lease:
+                    del self._by_ip[lease["address"].strip()]
+            return lease
+
+def reservation_comments(comments: str | None = None) -> str:
+    """Comments for a reserved lease managed by this tool: the managed by pyTechnitium marker followed by any assignment comments."""
+    if comments:
+        return f"{MANAGED_COMMENT} -: {comments}"
+    return MANAGED_COMMENT
+
+def lease_from_assignment(assignment: dict) -> dict:
+    """Creates a reserved lease, in the format returned by dhcp/scopes/get, from a dhcp_scopes[].assignments[] entry of the values file.
+
+    The pipe separated reservedLeases format of dhcp/scopes/set can't hold pipes or line breaks, so both are collapsed
+    out of the host name and comments.
+    """
+    return {
+        "hostName": _flatten(assignment.get("hostName", "")),
+        "hardwareAddress": normalize_mac(assignment["hardwareAddress"]),
+        "address": assignment["ipAddress"].strip(),
+        "comments": _flatten(reservation_comments(assignment.get("comments", "")))
+    }
+
+def _flatten(value: str | None) -> str:
+    return " ".join(str(value or "").replace("|", " ").split())
+
+def _lease_key(lease: dict) -> tuple[str, str, str, str]:
+    return (normalize_mac(lease["hardwareAddress"]), lease.get("address") or "", lease.get("hostName") or "", lease.get("comments") or "")
+
+def merge_reserved_leases(lease_index: DhcpLeaseIndex, assignments: list[dict]) -> list[dict]:
+    """Builds the full reservedLeases list of a scope from its assignments in the values file.
+
+    Leases that are not managed by this tool are kept unless an assignment claims their MAC or IP address.
+    Managed leases that are no longer in the values file are dropped.
+
+    Args:
+        lease_index (DhcpLeaseIndex): Current reserved leases of the scope.
+        assignments (list[dict]): dhcp_scopes[].assignments[] entries from the values file.
+
+    Returns:
+        list[dict]: Desired reserved leases for the scope.
+    """
+    desired: dict[str, dict] = {}
+    for assignment in assignments:
+        lease = lease_from_assignment(assignment)
+        desired[lease["hardwareAddress"]] = lease
+    desired_addresses = {lease["address"] for lease in desired.values()}
+
+    merged: list[dict] = []
+    for lease in lease_index:
+        if is_managed(lease.get("comments", None)) or normalize_mac(lease["hardwareAddress"]) in desired:
+            continue
+        if lease.get("address") in desired_addresses:
+            logging.warning(f"Unmanaged reservation (MAC={lease["hardwareAddress"]}; IP={lease["address"]}) in scope {lease_index.scope_name} conflicts with an assignment and will be replaced.")
+            continue
+        merged.append(lease)
+    merged.extend(desired.values())
+    return merged
+
+def reserved_leases_equal(current: Iterable[dict], desired: Iterable[dict]) -> bool:
+    """True when two sets of reserved leases hold the same MAC, address, host name and comments."""
+    return {_lease_key(lease) for lease in current} == {_lease_key(lease) for lease in desired}
+
+def parse_reserved_leases(value: str) -> list[dict]:
+    """Parses a hostName|hardwareAddress|address|comments list, as sent to dhcp/scopes/set, into reserved leases."""
+    fields = value.split("|") if value else []
+    return [{"hostName": fields[i], "hardwareAddress": fields[i + 1], "address": fields[i + 2], "comments": fields[i + 3]} for i in range(0, len(fields) - 3, 4)]
+
+def format_reserved_leases(leases: list[dict]) -> str:
+    """Formats reserved leases as the pipe separated hostName|hardwareAddress|address|comments list used by dhcp/scopes/set."""
+    return "|".join(f"{_flatten(lease.get("hostName"))}|{lease["hardwareAddress"]}|{lease["address"]}|{_flatten(lease.get("comments"))}" for lease in leases)
@@ -0,0 +1,145 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+import json
+import logging
+import math
+import os
+import random
+import threading
+
+QUANTILES: tuple[float, ...] = (0.5, 0.95, 0.99)
+# Latencies kept per endpoint to compute the quantiles from. Once full, a uniform random sample of every request
+# is kept (reservoir sampling), so the metrics of a long running --watch process stay bounded.
+LATENCY_SAMPLES: int = 1024
+
+@dataclass
+class EndpointMetrics:
+    """Count, bytes and latencies of the requests sent to a single API endpoint.
+
+    latencies holds at most LATENCY_SAMPLES latencies sampled from every request, latency_sum and latency_max
+    cover every request.
+    """
+    count: int = 0
+    errors: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    latency_sum: float = 0.0
+    latency_max: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+
+    def add_latency(self, seconds: float):
+        """Adds the latency of the count-th request."""
+        self.latency_sum += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        if len(self.latencies) < LATENCY_SAMPLES:
+            self.latencies.append(seconds)
+            return
+        slot = random.randrange(self.count)
+        if slot < LATENCY_SAMPLES:
+            self.latencies[slot] = seconds
+
+    def quantile(self, q: float) -> float:
+        """Latency in seconds at quantile q (0-1) by nearest rank over the sampled latencies. 0 when no request was recorded."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(max(math.ceil(q * len(ordered)) - 1, 0), len(ordered) - 1)]
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency_seconds": {
+                **{f"p{round(q * 100)}": self.quantile(q) for q in QUANTILES},
+                "max": self.latency_max,
+                "sum": self.latency_sum
+            }
+        }
+
+class RequestMetrics:
+    """Thread-safe per endpoint request metrics of one API host.
+
+    Every attempt is recorded, so a retried call counts once per request sent.
+    """
+    def __init__(self):
+        self.endpoints: dict[str, EndpointMetrics] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, bytes_sent: int = 0, bytes_received: int = 0, failed: bool = False):
+        """Records a request to an endpoint.
+
+        Args:
+            endpoint (str): API endpoint relative to /api/ (example: dhcp/scopes/get)
+            seconds (float): Time from sending the request to receiving the whole response.
+            bytes_sent (int): (Optional) Size of the request URL, including the query string, and body.
+            bytes_received (int): (Optional) Size of the response body.
+            failed (bool): (Optional) The request got no response or an HTTP error status.
+        """
+        with self._lock:
+            metrics = self.endpoints.setdefault(endpoint, EndpointMetrics())
+            metrics.count += 1
+            metrics.errors += int(failed)
+            metrics.bytes_sent += bytes_sent
+            metrics.bytes_received += bytes_received
+            metrics.add_latency(seconds)
+
+    def latencies(self) -> list[float]:
+        """Sampled seconds taken by the requests recorded, to any endpoint."""
+        with self._lock:
+            return [seconds for metrics in self.endpoints.values() for seconds in metrics.latencies]
+
+    def to_dict(self) -> dict[str, dict]:
+        with self._lock:
+            return {endpoint: metrics.to_dict() for endpoint, metrics in sorted(self.endpoints.items())}
+
+def _atomic_write(path: Path | str, text: str):
+    """Replaces a file atomically so readers such as the node exporter never see a partial file."""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'w') as metrics_io:
+        metrics_io.write(text)
+    os.replace(tmp_path, path)
+
+def write_metrics_json(path: Path | str, host_metrics: dict[str, RequestMetrics]):
+    """Writes the metrics of each API host as json: {host: {endpoint: {count, errors, bytes_sent, bytes_received, latency_seconds}}}."""
+    data = {host: metrics.to_dict() for host, metrics in host_metrics.items()}
+    _atomic_write(path, json.dumps(data, indent=2, sort_keys=True) + "\n")
+    logging.info(f"Wrote request metrics to {path}")
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def render_prometheus(host_metrics: dict[str, RequestMetrics]) -> str:
+    """Renders the metrics of each API host in the Prometheus text exposition format, labelled by host and endpoint."""
+    families = {
+        "technitium_api_requests_total": ("counter", "Requests sent to the Technitium API.", lambda m: [("", m["count"])]),
+        "technitium_api_request_errors_total": ("counter", "Requests that got no response or an HTTP error status.", lambda m: [("", m["errors"])]),
+        "technitium_api_sent_bytes_total": ("counter", "Request URL and body bytes sent to the Technitium API.", lambda m: [("", m["bytes_sent"])]),
+        "technitium_api_received_bytes_total": ("counter", "Response body bytes received from the Technitium API.", lambda m: [("", m["bytes_received"])]),
+        "technitium_api_request_duration_seconds": ("summary", "Latency of Technitium API requests.", lambda m: [
+            *((f",quantile=\"{q}\"", m["latency_seconds"][f"p{round(q * 100)}"]) for q in QUANTILES),
+            ("_sum", m["latency_seconds"]["sum"]),
+            ("_count", m["count"])
+        ])
+    }
+    data = {host: metrics.to_dict() for host, metrics in host_metrics.items()}
+    lines: list[str] = []
+    for name, (metric_type, help_text, samples) in families.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for host, endpoints in data.items():
+            for endpoint, metrics in endpoints.items():
+                labels = f"host=\"{_label(host)}\",endpoint=\"{_label(endpoint)}\""
+                for suffix, value in samples(metrics):
+                    if suffix.startswith(","):
+                        lines.append(f"{name}{{{labels}{suffix}}} {value}")
+                    else:
+                        lines.append(f"{name}{suffix}{{{labels}}} {value}")
+    return "\n".join(lines) + "\n"
+
+def write_metrics_prometheus(path: Path | str, host_metrics: dict[str, RequestMetrics]):
+    """Writes the metrics of each API host as a Prometheus textfile collector file (*.prom)."""
+    _atomic_write(path, render_prometheus(host_metrics))
+    logging.info(f"Wrote Prometheus request metrics to {path}")
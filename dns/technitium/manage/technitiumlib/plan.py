@@ -0,0 +1,108 @@
+from dataclasses import dataclass, field
+from urllib.parse import parse_qs
+import math
+import statistics
+from .leases import DhcpLeaseIndex, normalize_mac, parse_reserved_leases, reserved_leases_equal
+
+# Fields holding the record data in zones/records/add and zones/records/delete parameters.
+_RDATA_PARAMS: tuple[str, ...] = ("ipAddress", "cname", "nameServer", "ptrName")
+
+def _flag(value) -> bool:
+    return str(value).casefold() == "true"
+
+def _lease_lines(scope_name: str, current: list[dict], leases: list[dict]) -> list[str]:
+    """One line per reserved lease added (+), changed (~) or removed (-) by replacing current with leases."""
+    current_by_mac = {normalize_mac(lease["hardwareAddress"]): lease for lease in current}
+    desired_macs: set[str] = set()
+    lines: list[str] = []
+    for lease in leases:
+        hardware_address = normalize_mac(lease["hardwareAddress"])
+        desired_macs.add(hardware_address)
+        if hardware_address not in current_by_mac:
+            lines.append(f"+ {scope_name}: {hardware_address} {lease["address"]} {lease.get("hostName", "")}".rstrip())
+        elif not reserved_leases_equal([current_by_mac[hardware_address]], [lease]):
+            lines.append(f"~ {scope_name}: {hardware_address} {lease["address"]} {lease.get("hostName", "")}".rstrip())
+    lines.extend(f"- {scope_name}: {hardware_address} {lease.get("address", "")}".rstrip() for hardware_address, lease in current_by_mac.items() if hardware_address not in desired_macs)
+    return lines
+
+@dataclass
+class PlannedCall:
+    """A write request a dry run client recorded instead of sending."""
+    endpoint: str
+    params: dict = field(default_factory=dict)
+    data: str | dict | None = None
+
+    def lines(self, lease_indexes: dict[str, DhcpLeaseIndex] | None = None) -> list[str]:
+        """The changes the request would make, one per line: + adds, ~ adds replacing the record set or replaces, - deletes.
+
+        Args:
+            lease_indexes (dict[str, DhcpLeaseIndex]): (Optional) Current reserved leases by scope name, to list
+                every lease a dhcp/scopes/set request adds, changes or removes.
+        """
+        params = self.params
+        match self.endpoint:
+            case "zones/records/add" | "zones/records/delete":
+                change = "-" if self.endpoint == "zones/records/delete" else "~" if _flag(params.get("overwrite", False)) else "+"
+                value = next((str(params[key]) for key in _RDATA_PARAMS if params.get(key, None) is not None), "")
+                return [f"{change} {params["zone"]}: {params["domain"]} {params["type"]} {value}"]
+            case "zones/import":
+                change = "~" if _flag(params.get("overwrite", False)) else "+"
+                records = [line.split(";", 1)[0].split() for line in str(self.data or "").splitlines() if line and not line.startswith("$")]
+                return [f"{change} {params["zone"]}: {" ".join(record)} (import)" for record in records if record]
+            case "zones/create":
+                return [f"+ zone {params["zone"]} ({params.get("type", "Primary")})"]
+            case "dhcp/scopes/addReservedLease":
+                return [f"+ {params["name"]}: {params["hardwareAddress"]} {params["ipAddress"]} {params.get("hostName", "")}".rstrip()]
+            case "dhcp/scopes/removeReservedLease":
+                return [f"- {params["name"]}: {params["hardwareAddress"]}"]
+            case "dhcp/scopes/set":
+                data = self.data if isinstance(self.data, dict) else {key: values[-1] for key, values in parse_qs(str(self.data or ""), keep_blank_values=True).items()}
+                leases = parse_reserved_leases(data.get("reservedLeases", ""))
+                current = (lease_indexes or {}).get(params["name"], None)
+                if current is None:
+                    return [f"~ {params["name"]}: replace with {len(leases)} reserved leases"]
+                return _lease_lines(params["name"], list(current), leases)
+            case _:
+                return [f"? {self.endpoint} {params}"]
+
+@dataclass
+class PlanEstimate:
+    """API calls an apply would take and how long they are estimated to take.
+
+    reads are the requests sent while planning, which the apply sends again, writes the requests that were
+    recorded instead of sent. seconds is None when no request was sent to measure the round trip time with.
+    """
+    reads: int
+    writes: int
+    rtt: float | None
+    concurrency: int = 1
+    rate_limit: float = 0
+
+    @property
+    def calls(self) -> int:
+        return self.reads + self.writes
+
+    @property
+    def seconds(self) -> float | None:
+        if self.rtt is None:
+            return None
+        # Independent items run concurrency at a time, but never faster than the rate limit allows.
+        seconds = math.ceil(self.calls / max(self.concurrency, 1)) * self.rtt
+        if self.rate_limit > 0:
+            seconds = max(seconds, self.calls / self.rate_limit)
+        return seconds
+
+def estimate_plan(reads: int, writes: int, latencies: list[float], concurrency: int = 1, rate_limit: float = 0) -> PlanEstimate:
+    """Estimates the time of an apply from the median round trip time of the requests sent while planning.
+
+    Args:
+        reads (int): Requests sent while planning.
+        writes (int): Requests recorded instead of sent.
+        latencies (list[float]): Seconds each request sent while planning took.
+        concurrency (int): (Optional) Items applied in parallel.
+        rate_limit (float): (Optional) Requests per second allowed, 0 for unlimited.
+
+    Returns:
+        PlanEstimate: Call counts and estimated time.
+    """
+    return PlanEstimate(reads, writes, statistics.median(latencies) if latencies else None, concurrency, rate_limit)
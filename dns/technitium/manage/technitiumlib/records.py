@@ -0,0 +1,165 @@
+from dataclasses import dataclass, field
+import ipaddress
+
+MANAGED_COMMENT: str = "managed by pyTechnitium"
+
+# Property holding the record data for each record type managed by this tool.
+# The values file uses the same property names as the rData of the Technitium API.
+RDATA_FIELDS: dict[str, str] = {
+    "A": "ipAddress",
+    "AAAA": "ipAddress",
+    "CNAME": "cname",
+    "NS": "nameServer",
+    "PTR": "ptrName"
+}
+
+def normalize_name(name: str) -> str:
+    """Normalizes a domain name for comparison: lower case without a trailing dot."""
+    return name.strip().rstrip(".").casefold()
+
+def normalize_rdata(record_type: str, value: str) -> str:
+    """Normalizes record data for comparison. Addresses are compared in their compressed form and names case insensitively."""
+    if record_type in {"A", "AAAA"}:
+        return str(ipaddress.ip_address(value.strip()))
+    return normalize_name(value)
+
+def is_managed(comments: str | None) -> bool:
+    """True when a record or lease comment carries the managed by pyTechnitium marker."""
+    return bool(comments) and comments.startswith(MANAGED_COMMENT)
+
+@dataclass(frozen=True)
+class DnsRecord:
+    """A DNS record identified by its (name, type, rdata) key."""
+    name: str
+    type: str
+    rdata: str
+
+    @property
+    def key(self) -> tuple[str, str, str]:
+        return (self.name, self.type, self.rdata)
+
+    @property
+    def rrset(self) -> tuple[str, str]:
+        return (self.name, self.type)
+
+    @property
+    def rdata_field(self) -> str:
+        return RDATA_FIELDS[self.type]
+
+def record_from_values(zone: str, record: dict) -> DnsRecord:
+    """Creates a DnsRecord from a zones[].records[] entry of the values file.
+
+    Raises:
+        ValueError: When the record type is not supported or its record data is not set.
+    """
+    record_type = record["type"].upper()
+    if record_type not in RDATA_FIELDS:
+        raise ValueError(f"Record type {record_type} is not supported for record {record["name"]}.{zone}")
+    value = record.get(RDATA_FIELDS[record_type], None)
+    if value is None:
+        raise ValueError(f"{RDATA_FIELDS[record_type]} must be set for {record_type} record {record["name"]}.{zone}")
+    return DnsRecord(normalize_name(f"{record["name"]}.{zone}"), record_type, normalize_rdata(record_type, value))
+
+def record_from_api(record: dict) -> DnsRecord | None:
+    """Creates a DnsRecord from a record in a zones/records/get response. Returns None for record types not managed by this tool."""
+    record_type = record["type"].upper()
+    if record_type not in RDATA_FIELDS:
+        return None
+    value = record.get("rData", {}).get(RDATA_FIELDS[record_type], None)
+    if value is None:
+        return None
+    return DnsRecord(normalize_name(record["name"]), record_type, normalize_rdata(record_type, value))
+
+@dataclass
+class RecordDiff:
+    """Changes required to bring a zone's records in line with the values file.
+
+    create and update hold zones[].records[] entries from the values file, delete holds remote records.
+    """
+    zone: str
+    unchanged: list[DnsRecord] = field(default_factory=list)
+    create: list[dict] = field(default_factory=list)
+    update: list[dict] = field(default_factory=list)
+    delete: list[DnsRecord] = field(default_factory=list)
+
+    @property
+    def changes(self) -> int:
+        return len(self.create) + len(self.update) + len(self.delete)
+
+    def by_name(self) -> dict[str, "RecordDiff"]:
+        """Splits the changes of this diff into one diff per record name, so changes to different names can be applied independently."""
+        diffs: dict[str, RecordDiff] = {}
+        def name_diff(name: str) -> RecordDiff:
+            return diffs.setdefault(name, RecordDiff(self.zone))
+        for record in self.delete:
+            name_diff(record.name).delete.append(record)
+        for record in self.create:
+            name_diff(normalize_name(f"{record["name"]}.{self.zone}")).create.append(record)
+        for record in self.update:
+            name_diff(normalize_name(f"{record["name"]}.{self.zone}")).update.append(record)
+        return diffs
+
+def diff_zone_records(zone: str, desired: list[dict], current: list[dict]) -> RecordDiff:
+    """Diffs the desired records of a zone against the records currently on the server by (name, type, rdata).
+
+    A desired record missing from the server is an update when it has overwrite set and its (name, type) record set
+    already exists, since adding it replaces that record set. Otherwise it is created. Remote records are only deleted
+    when they carry the managed by pyTechnitium comment, are no longer in the values file and were not already replaced by an update.
+
+    Args:
+        zone (str): DNS zone name
+        desired (list[dict]): zones[].records[] entries from the values file.
+        current (list[dict]): records from the zones/records/get response.
+
+    Returns:
+        RecordDiff: Records that are unchanged and that need to be created, updated or deleted.
+    """
+    diff = RecordDiff(zone)
+    current_records: dict[tuple[str, str, str], dict] = {}
+    current_rrsets: set[tuple[str, str]] = set()
+    for api_record in current:
+        dns_record = record_from_api(api_record)
+        if dns_record is not None:
+            current_records[dns_record.key] = api_record
+            current_rrsets.add(dns_record.rrset)
+
+    desired_keys: set[tuple[str, str, str]] = set()
+    replaced_rrsets: set[tuple[str, str]] = set()
+    for record in desired:
+        dns_record = record_from_values(zone, record)
+        if dns_record.key in desired_keys:
+            continue
+        desired_keys.add(dns_record.key)
+        if dns_record.key in current_records:
+            diff.unchanged.append(dns_record)
+        elif record.get("overwrite", False) and dns_record.rrset in current_rrsets:
+            diff.update.append(record)
+            replaced_rrsets.add(dns_record.rrset)
+        else:
+            diff.create.append(record)
+
+    for key, api_record in current_records.items():
+        dns_record = DnsRecord(*key)
+        if key in desired_keys or dns_record.rrset in replaced_rrsets:
+            continue
+        if is_managed(api_record.get("comments", None)):
+            diff.delete.append(dns_record)
+
+    return diff
+
+@dataclass
+class ReconcileSummary:
+    """Running totals of record changes made during a reconcile."""
+    unchanged: int = 0
+    created: int = 0
+    updated: int = 0
+    removed: int = 0
+
+    def add(self, diff: RecordDiff):
+        self.unchanged += len(diff.unchanged)
+        self.created += len(diff.create)
+        self.updated += len(diff.update)
+        self.removed += len(diff.delete)
+
+    def __str__(self) -> str:
+        return f"{self.unchanged} unchanged, {self.created} created, {self.updated} updated, {self.removed} removed"
@@ -0,0 +1,77 @@
+from dataclasses import dataclass
+import random
+import threading
+import time
+
+DEFAULT_MAX_RETRIES: int = 4
+DEFAULT_RETRY_BACKOFF: float = 0.5
+DEFAULT_RETRY_MAX_BACKOFF: float = 30.0
+DEFAULT_RATE_BURST: int = 10
+
+# HTTP statuses worth retrying. 429 and 503 mean the server turned the request away before processing it.
+RETRY_STATUSES: set[int] = {429, 500, 502, 503, 504}
+REJECTED_STATUSES: set[int] = {429, 503}
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter for transient API failures.
+
+    Args:
+        max_retries (int): (Optional) Retries after the first attempt. 0 disables retries.
+        backoff (float): (Optional) Upper bound in seconds of the first retry delay. Doubles on every retry.
+        max_backoff (float): (Optional) Upper bound in seconds of any retry delay.
+    """
+    max_retries: int = DEFAULT_MAX_RETRIES
+    backoff: float = DEFAULT_RETRY_BACKOFF
+    max_backoff: float = DEFAULT_RETRY_MAX_BACKOFF
+
+    def delay(self, retry: int, retry_after: float | None = None) -> float:
+        """Seconds to wait before a retry, counting retries from 1. A Retry-After from the server is honoured up to max_backoff."""
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        # Full jitter spreads the retries of parallel tasks out instead of sending them back in lockstep.
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (retry - 1)))
+
+class RateLimiter:
+    """Thread-safe token bucket limiting the request rate to a single API host.
+
+    Args:
+        rate (float): Requests per second. 0 or less disables the limit.
+        burst (int): (Optional) Requests that can be sent at once after the bucket filled up while idle.
+    """
+    def __init__(self, rate: float, burst: int = DEFAULT_RATE_BURST):
+        self.rate: float = rate
+        self.burst: int = max(burst, 1)
+        self._tokens: float = float(self.burst)
+        self._updated: float = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Takes a token, waiting for one when the bucket is empty.
+
+        The token is reserved under the lock and the wait happens outside of it, so waiting threads are released
+        in the order they arrived at the configured rate.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Seconds from a Retry-After header given in seconds. The HTTP date form is ignored."""
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
@@ -0,0 +1,72 @@
+from dataclasses import dataclass, field
+from typing import Iterable
+import ipaddress
+from .records import normalize_name
+
+# Record types that can ask for a reverse PTR record with ptr: true.
+PTR_SOURCE_TYPES: set[str] = {"A", "AAAA"}
+
+def default_reverse_zone(address: ipaddress.IPv4Address | ipaddress.IPv6Address) -> str:
+    """Name of the reverse zone created for an address when none exists: the /24 for IPv4 and the /64 for IPv6, as the server's createPtrZone does."""
+    prefix = 24 if address.version == 4 else 64
+    network = ipaddress.ip_network(f"{address}/{prefix}", strict=False)
+    # reverse_pointer of the network address, minus the labels below the prefix.
+    labels = network.network_address.reverse_pointer.split(".")
+    host_labels = (32 - prefix) // 8 if address.version == 4 else (128 - prefix) // 4
+    return ".".join(labels[host_labels:])
+
+def find_reverse_zone(ptr_name: str, zone_names: set[str]) -> str | None:
+    """Finds the most specific zone in zone_names that contains ptr_name."""
+    labels = ptr_name.split(".")
+    for i in range(len(labels)):
+        candidate = ".".join(labels[i:])
+        if candidate in zone_names:
+            return candidate
+    return None
+
+@dataclass
+class ReverseZonePlan:
+    """PTR records to push to a single reverse zone.
+
+    records are zones[].records[] style PTR entries named relative to the reverse zone.
+    """
+    zone: str
+    exists: bool
+    create: bool = False
+    records: list[dict] = field(default_factory=list)
+
+def plan_reverse_zones(zone_records: Iterable[tuple[str, dict]], zone_names: Iterable[str]) -> dict[str, ReverseZonePlan]:
+    """Groups the PTR records for every A/AAAA record with ptr set by the reverse zone they belong in.
+
+    Args:
+        zone_records (Iterable[tuple[str, dict]]): (zone name, zones[].records[] entry) pairs. Entries without ptr set are skipped.
+        zone_names (Iterable[str]): Names of the zones that exist on the server.
+
+    Returns:
+        dict[str, ReverseZonePlan]: Reverse zones by name, each with its PTR records. A zone that doesn't exist yet is
+        created when any of its records has createPtrZone set.
+    """
+    existing = {normalize_name(name) for name in zone_names}
+    plans: dict[str, ReverseZonePlan] = {}
+    for zone, record in zone_records:
+        if not record.get("ptr", False) or record["type"].upper() not in PTR_SOURCE_TYPES:
+            continue
+        address = ipaddress.ip_address(record["ipAddress"].strip())
+        ptr_name = address.reverse_pointer
+        reverse_zone = find_reverse_zone(ptr_name, existing)
+        exists = reverse_zone is not None
+        if not exists:
+            reverse_zone = default_reverse_zone(address)
+        plan = plans.setdefault(reverse_zone, ReverseZonePlan(reverse_zone, exists))
+        plan.create = plan.create or record.get("createPtrZone", False)
+        plan.records.append({
+            "name": ptr_name.removesuffix(f".{reverse_zone}"),
+            "type": "PTR",
+            "ptrName": f"{record["name"]}.{zone}",
+            "overwrite": True
+        })
+    return plans
+
+def without_ptr(records: list[dict]) -> list[dict]:
+    """Copies of records with ptr and createPtrZone cleared, for records whose PTR was already planned."""
+    return [{**record, "ptr": False, "createPtrZone": False} if record.get("ptr", False) else record for record in records]
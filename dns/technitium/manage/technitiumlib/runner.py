@@ -0,0 +1,197 @@
+from dataclasses import dataclass, field, replace
+from functools import partial
+from pathlib import Path
+from typing import Iterable, Iterator
+import logging
+import time
+from .api import TechnitiumApi
+from .config import ApiHost
+from .conflicts import Conflict, find_conflicts, find_item_conflicts
+from .executor import ItemError, Task, run_tasks
+from .metrics import write_metrics_json, write_metrics_prometheus
+from .plan import estimate_plan
+from .state import HostState, StateFile, full_plan, hash_values, incremental_plan
+from .values import ValuesItem, iter_values, written_rrset
+
+def log_errors(errors: list[ItemError]):
+    logging.error(f"{len(errors)} items failed:")
+    for error in errors:
+        logging.error(f"  {error}")
+
+@dataclass
+class HostRun:
+    """An API host being applied to, with its client and the content hashes of the values last applied to it."""
+    api_host: ApiHost
+    client: TechnitiumApi
+    applied: HostState
+
+@dataclass
+class HostResult:
+    """Outcome and timing of applying a plan to one API host."""
+    hostname: str
+    seconds: float
+    requests: int
+    errors: list[ItemError] = field(default_factory=list)
+    retries: int = 0
+    throttle_seconds: float = 0.0
+
+def apply_to_host(run: HostRun, values: dict, desired: HostState | None, full: bool) -> HostResult:
+    """Plans and applies the values file to a single API host
+
+    Args:
+        run (HostRun): The API host to apply to.
+        values (dict): Loaded values file.
+        desired (HostState | None): hash_values of the values file, shared by every host. None when the applied
+            hashes aren't tracked, which requires a full apply.
+        full (bool): Apply the full values file instead of only the entries that changed since the host was last applied.
+
+    Returns:
+        HostResult: Errors, elapsed time and request count for the host.
+    """
+    started = time.monotonic()
+    stats_before = replace(run.client.stats)
+    if full:
+        plan = full_plan(values)
+    else:
+        plan = incremental_plan(values, run.applied, full_zones=run.client.options.reconcile, full_scopes=run.client.options.scope_update, desired=desired)
+        logging.info(f"{run.api_host.hostname}: applying changes since the last apply: {len(plan.zones)} zones and {len(plan.scopes)} scopes changed, {sum(len(r) for r in plan.removed_records.values())} records and {sum(len(r) for r in plan.removed_reservations.values())} reservations removed.")
+    errors = run.client.apply_plan(plan)
+    run.client.log_stats()
+    if not errors and desired is not None:
+        run.applied = desired
+    stats = run.client.stats
+    return HostResult(run.api_host.hostname, time.monotonic() - started, stats.requests - stats_before.requests, errors,
+                      stats.retries - stats_before.retries, stats.throttle_seconds - stats_before.throttle_seconds)
+
+def apply_to_hosts(runs: list[HostRun], values: dict, state: StateFile | None, full: bool, track: bool = False) -> list[HostResult]:
+    """Applies the values file to every API host in parallel
+
+    When a state file is given, track is set or the apply is incremental, the desired state is hashed once and
+    shared by every host. Each host gets its own result, and the state of each host that applied without errors
+    is saved to the state file.
+
+    Args:
+        runs (list[HostRun]): API hosts to apply to.
+        values (dict): Loaded values file.
+        state (StateFile | None): State file to save the applied hashes to, if any.
+        full (bool): Apply the full values file instead of only the entries that changed since the last apply.
+        track (bool): (Optional) Keep the applied hashes on each HostRun without a state file, for later incremental applies.
+
+    Returns:
+        list[HostResult]: Result for each API host, in the order of runs.
+    """
+    desired = hash_values(values) if state is not None or track or not full else None
+    tasks: list[Task] = [(f"API host {run.api_host.hostname}", partial(apply_to_host, run, values, desired, full)) for run in runs]
+    results, errors = run_tasks(tasks, len(runs))
+    # A host that failed outside of applying an item, for example while planning, still gets a result.
+    results.extend(HostResult(error.item, 0.0, 0, [error]) for error in errors)
+
+    logging.info(f"Applied to {len(runs)} API hosts:")
+    for result in results:
+        status = "ok" if not result.errors else f"{len(result.errors)} items failed"
+        logging.info(f"  {result.hostname}: {status} in {result.seconds:.2f}s with {result.requests} requests, {result.retries} retries, {result.throttle_seconds:.2f}s throttled")
+        if result.errors:
+            log_errors(result.errors)
+
+    if state is not None:
+        for run in runs:
+            state.set(run.api_host.hostname, run.applied)
+        state.save()
+    return results
+
+def apply_batches(runs: list[HostRun], batches: Iterable[dict]) -> list[HostResult]:
+    """Applies values file batches, such as those of batch_values, one after the other to every API host
+
+    Only one batch is held in memory at a time. Every batch is applied in full and no state file is written.
+
+    Returns:
+        list[HostResult]: Result for each API host, totalled over every batch.
+    """
+    totals: dict[str, HostResult] = {}
+    for number, batch in enumerate(batches, 1):
+        logging.info(f"Applying batch {number}.")
+        for result in apply_to_hosts(runs, batch, None, full=True):
+            total = totals.setdefault(result.hostname, HostResult(result.hostname, 0.0, 0))
+            total.seconds += result.seconds
+            total.requests += result.requests
+            total.errors.extend(result.errors)
+            total.retries += result.retries
+            total.throttle_seconds += result.throttle_seconds
+    return list(totals.values())
+
+def plan_report(run: HostRun) -> list[str]:
+    """Lists the changes a dry run client recorded and the estimated cost of sending them, one line each.
+
+    Returns:
+        list[str]: Report lines for the API host.
+    """
+    client = run.client
+    estimate = estimate_plan(client.stats.requests, len(client.planned_calls), client.metrics.latencies(), client.options.concurrency, client.rate_limiter.rate)
+    changes = [line for call in client.planned_calls for line in call.lines(client.lease_indexes)]
+    lines = [f"Plan for {run.api_host.hostname}: {len(changes)} changes"]
+    lines.extend(f"  {line}" for line in changes)
+    summary = f"{estimate.calls} API calls ({estimate.reads} reads, {estimate.writes} writes)"
+    if estimate.seconds is None:
+        lines.append(f"{summary}, no round trip time measured to estimate the time from.")
+    else:
+        lines.append(f"{summary}, estimated {estimate.seconds:.1f}s at a {estimate.rtt * 1000:.1f} ms median round trip time with concurrency {estimate.concurrency}.")
+    return lines
+
+def check_conflicts(values: dict) -> list[Conflict]:
+    """Checks the values file for duplicate and out of range addresses before any request is sent, logging every conflict found."""
+    conflicts = find_conflicts(values)
+    for conflict in conflicts:
+        logging.error(f"Conflict: {conflict}")
+    return conflicts
+
+@dataclass
+class ValuesScan:
+    """What a streaming pass over a values file found: its api mapping, conflicts, entry counts and the
+    written_rrset of the A and AAAA records, needed to apply the file in batches when a DHCP scope is bound to a zone."""
+    api: dict = field(default_factory=dict)
+    conflicts: list[Conflict] = field(default_factory=list)
+    written: set[tuple[str, str, str]] = field(default_factory=set)
+    records: int = 0
+    assignments: int = 0
+
+def scan_values(var_file_path: str) -> ValuesScan:
+    """Checks a values file for conflicts with a single streaming pass, without loading the whole file, logging every conflict found.
+
+    Records derived from DHCP scopes bound to a zone are not part of the stream, so their PTR records are not checked for conflicts.
+    Derived records are only A and AAAA records, so only those are kept in written, and none when no scope is bound to a zone.
+    """
+    scan = ValuesScan()
+    bound = False
+    def items() -> Iterator[ValuesItem]:
+        nonlocal bound
+        for item in iter_values(var_file_path):
+            if item.kind == "api":
+                scan.api = item.entry
+            elif item.kind == "scope":
+                bound = bound or bool(item.entry.get("zone", None))
+            elif item.kind == "record":
+                # Records without a name or type are reported by the conflict check.
+                if isinstance(item.item, dict) and None not in (item.entry.get("zone", None), item.item.get("name", None)) and str(item.item.get("type", "")).upper() in {"A", "AAAA"}:
+                    scan.written.add(written_rrset(item))
+                scan.records += 1
+            elif item.kind == "assignment":
+                scan.assignments += 1
+            yield item
+    scan.conflicts = find_item_conflicts(items())
+    if not bound:
+        scan.written.clear()
+    for conflict in scan.conflicts:
+        logging.error(f"Conflict: {conflict}")
+    logging.info(f"Scanned {scan.records} records and {scan.assignments} assignments in {var_file_path}.")
+    return scan
+
+def write_metrics(runs: list[HostRun], json_path: Path | str | None = None, prometheus_path: Path | str | None = None):
+    """Writes the request metrics of every API host as json and as a Prometheus textfile, for the paths that are set."""
+    host_metrics = {run.api_host.hostname: run.client.metrics for run in runs}
+    try:
+        if json_path:
+            write_metrics_json(json_path, host_metrics)
+        if prometheus_path:
+            write_metrics_prometheus(prometheus_path, host_metrics)
+    except OSError as e:
+        logging.error(f"Unable to write request metrics: {e}")
@@ -0,0 +1,199 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import urlparse
+import gzip
+import json
+import logging
+import os
+import time
+from .leases import DhcpLeaseIndex, merge_reserved_leases, normalize_mac, reserved_leases_equal
+from .records import RecordDiff, diff_zone_records, normalize_name
+from .reverse import plan_reverse_zones
+
+# Record fields kept in a snapshot. Everything else in a zones/records/get entry (dnssecStatus, lastUsedOn, ...) is dropped.
+SNAPSHOT_RECORD_FIELDS: tuple[str, ...] = ("name", "type", "ttl", "disabled", "rData", "comments")
+SNAPSHOT_VERSION: int = 1
+
+@dataclass
+class Snapshot:
+    """Zones, records and DHCP reserved leases of one API host at a point in time.
+
+    zones holds the zones/list entry of every zone and records its records, both keyed by lower case zone name.
+    scopes holds the reservedLeases of every DHCP scope, keyed by scope name.
+    """
+    host: str
+    taken_at: float
+    zones: dict[str, dict] = field(default_factory=dict)
+    records: dict[str, list[dict]] = field(default_factory=dict)
+    scopes: dict[str, list[dict]] = field(default_factory=dict)
+
+    @property
+    def age(self) -> float:
+        """Seconds since the snapshot was taken."""
+        return time.time() - self.taken_at
+
+    def to_dict(self) -> dict:
+        return {"version": SNAPSHOT_VERSION, "host": self.host, "takenAt": self.taken_at, "zones": self.zones, "records": self.records, "scopes": self.scopes}
+
+    def save(self, path: Path | str):
+        """Writes the snapshot as compact json, gzip compressed when path ends in .gz. The file is replaced atomically."""
+        path = Path(path)
+        data = json.dumps(self.to_dict(), separators=(",", ":")).encode("utf-8")
+        if path.suffix == ".gz":
+            data = gzip.compress(data)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        logging.info(f"Saved snapshot of {self.host} to {path} ({len(data)} bytes)")
+
+    @classmethod
+    def load(cls, path: Path | str) -> "Snapshot":
+        """Reads a snapshot written by save.
+
+        Raises:
+            ValueError: When the file is not a snapshot of a supported version.
+        """
+        path = Path(path)
+        data = path.read_bytes()
+        if path.suffix == ".gz":
+            data = gzip.decompress(data)
+        snapshot = json.loads(data)
+        if snapshot.get("version", None) != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} snapshot.")
+        return cls(snapshot["host"], snapshot["takenAt"], snapshot["zones"], snapshot["records"], snapshot["scopes"])
+
+def compact_record(record: dict) -> dict:
+    """Strips a zones/records/get entry down to the fields kept in a snapshot."""
+    return {key: record[key] for key in SNAPSHOT_RECORD_FIELDS if key in record}
+
+def snapshot_path(directory: Path | str, api_host: str) -> Path:
+    """Path of the snapshot of an API host in a snapshot directory, named after the host and port of the API endpoint."""
+    host = urlparse(api_host).netloc or api_host
+    return Path(directory) / f"{host.replace(":", "_").replace("/", "_")}.json.gz"
+
+def load_snapshot(path: Path | str, api_host: str, ttl: float) -> Snapshot | None:
+    """Loads the snapshot of an API host when it is younger than ttl seconds.
+
+    Returns:
+        Snapshot | None: The snapshot, or None when it is missing, unreadable, of another host or too old.
+    """
+    path = Path(path)
+    if ttl <= 0 or not path.exists():
+        return None
+    try:
+        snapshot = Snapshot.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"Ignoring snapshot {path}: {e}")
+        return None
+    if snapshot.host != api_host.rstrip("/"):
+        logging.warning(f"Ignoring snapshot {path}: it was taken from {snapshot.host}, not {api_host}.")
+        return None
+    if snapshot.age >= ttl:
+        logging.info(f"Snapshot {path} is {snapshot.age:.0f}s old, older than the {ttl:.0f}s TTL.")
+        return None
+    logging.info(f"Reusing {snapshot.age:.0f}s old snapshot {path} of {api_host}.")
+    return snapshot
+
+@dataclass
+class ScopeDrift:
+    """Reserved leases of a DHCP scope that differ from the values file. add, update and remove hold reserved leases."""
+    scope: str
+    exists: bool = True
+    add: list[dict] = field(default_factory=list)
+    update: list[dict] = field(default_factory=list)
+    remove: list[dict] = field(default_factory=list)
+
+    @property
+    def changes(self) -> int:
+        return len(self.add) + len(self.update) + len(self.remove)
+
+@dataclass
+class DriftReport:
+    """Differences between a values file and a Snapshot of an API host.
+
+    missing_zones and missing_scopes list the zones and scopes of the values file that don't exist on the host.
+    zones holds the record diff of every zone with changes, including reverse zones that need PTR records.
+    """
+    host: str
+    taken_at: float
+    missing_zones: list[str] = field(default_factory=list)
+    missing_scopes: list[str] = field(default_factory=list)
+    zones: list[RecordDiff] = field(default_factory=list)
+    scopes: list[ScopeDrift] = field(default_factory=list)
+
+    @property
+    def changes(self) -> int:
+        return len(self.missing_zones) + len(self.missing_scopes) + sum(diff.changes for diff in self.zones) + sum(drift.changes for drift in self.scopes)
+
+    def lines(self) -> list[str]:
+        """The report as text, one change per line."""
+        lines = [f"Drift of {self.host} (snapshot taken {time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.taken_at))}): {self.changes} changes"]
+        lines.extend(f"  + zone {zone}" for zone in self.missing_zones)
+        for diff in self.zones:
+            lines.extend(f"  + {diff.zone}: {record["name"]} {record["type"].upper()}" for record in diff.create)
+            lines.extend(f"  ~ {diff.zone}: {record["name"]} {record["type"].upper()}" for record in diff.update)
+            lines.extend(f"  - {diff.zone}: {record.name} {record.type} {record.rdata}" for record in diff.delete)
+        lines.extend(f"  + dhcp scope {scope}" for scope in self.missing_scopes)
+        for drift in self.scopes:
+            lines.extend(f"  + {drift.scope}: {lease["hardwareAddress"]} {lease["address"]}" for lease in drift.add)
+            lines.extend(f"  ~ {drift.scope}: {lease["hardwareAddress"]} {lease["address"]}" for lease in drift.update)
+            lines.extend(f"  - {drift.scope}: {lease["hardwareAddress"]} {lease["address"]}" for lease in drift.remove)
+        return lines
+
+def diff_scope_leases(scope: dict, leases: list[dict] | None) -> ScopeDrift:
+    """Diffs the assignments of a dhcp_scopes[] entry against the reserved leases of the scope, by MAC address.
+
+    The desired leases are built the same way a scope update builds them, so unmanaged leases are only reported
+    as removed when an assignment claims their address.
+    """
+    drift = ScopeDrift(scope["name"], leases is not None)
+    current = {normalize_mac(lease["hardwareAddress"]): lease for lease in leases or []}
+    desired = {normalize_mac(lease["hardwareAddress"]): lease for lease in merge_reserved_leases(DhcpLeaseIndex(scope["name"], leases), scope.get("assignments", None) or [])}
+    for hardware_address, lease in desired.items():
+        if hardware_address not in current:
+            drift.add.append(lease)
+        elif not reserved_leases_equal([current[hardware_address]], [lease]):
+            drift.update.append(lease)
+    drift.remove.extend(lease for hardware_address, lease in current.items() if hardware_address not in desired)
+    return drift
+
+def drift_report(snapshot: Snapshot, values: dict) -> DriftReport:
+    """Computes the differences between a values file and a snapshot without sending any request.
+
+    Records are diffed the way --reconcile diffs them, and the PTR records of records with ptr set are checked
+    in their reverse zones. Stale PTR records are not reported, since applying the values file never removes them.
+
+    Args:
+        snapshot (Snapshot): Snapshot of the API host.
+        values (dict): Loaded values file.
+
+    Returns:
+        DriftReport: Every difference found.
+    """
+    report = DriftReport(snapshot.host, snapshot.taken_at)
+    zone_records: list[tuple[str, dict]] = []
+    for zone in values.get("zones", None) or []:
+        name = normalize_name(zone["zone"])
+        if name not in snapshot.zones:
+            report.missing_zones.append(zone["zone"])
+        records = zone.get("records", None) or []
+        zone_records.extend((zone["zone"], record) for record in records)
+        diff = diff_zone_records(zone["zone"], records, snapshot.records.get(name, []))
+        if diff.changes:
+            report.zones.append(diff)
+
+    for reverse_zone in plan_reverse_zones(zone_records, snapshot.zones.keys()).values():
+        if not reverse_zone.exists:
+            report.missing_zones.append(reverse_zone.zone)
+        diff = diff_zone_records(reverse_zone.zone, reverse_zone.records, snapshot.records.get(reverse_zone.zone, []))
+        diff.delete.clear()
+        if diff.changes:
+            report.zones.append(diff)
+
+    for scope in values.get("dhcp_scopes", None) or []:
+        drift = diff_scope_leases(scope, snapshot.scopes.get(scope["name"], None))
+        if not drift.exists:
+            report.missing_scopes.append(scope["name"])
+        if drift.changes:
+            report.scopes.append(drift)
+    return report
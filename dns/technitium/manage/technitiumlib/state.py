@@ -0,0 +1,119 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+from .leases import normalize_mac
+from .records import DnsRecord, record_from_values
+
+def content_hash(value) -> str:
+    """sha256 of the canonical json form of a values file entry."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")).hexdigest()
+
+def record_state_key(zone: str, record: dict) -> str:
+    """State key of a zones[].records[] entry: zone|name|type|rdata."""
+    return "|".join((zone, *record_from_values(zone, record).key))
+
+def reservation_state_key(scope_name: str, assignment: dict) -> str:
+    """State key of a dhcp_scopes[].assignments[] entry: scope|MAC."""
+    return f"{scope_name}|{normalize_mac(assignment["hardwareAddress"])}"
+
+@dataclass
+class HostState:
+    """Content hashes of the zone records and DHCP reservations last applied to one API host, keyed by their state keys."""
+    records: dict[str, str] = field(default_factory=dict)
+    reservations: dict[str, str] = field(default_factory=dict)
+
+def hash_values(values: dict) -> HostState:
+    """Hashes every zone record and DHCP reservation in the values file."""
+    state = HostState()
+    for zone in values.get("zones", None) or []:
+        for record in zone.get("records", None) or []:
+            state.records[record_state_key(zone["zone"], record)] = content_hash(record)
+    for scope in values.get("dhcp_scopes", None) or []:
+        for assignment in scope.get("assignments", None) or []:
+            state.reservations[reservation_state_key(scope["name"], assignment)] = content_hash(assignment)
+    return state
+
+class StateFile:
+    """Local state file holding the HostState last applied to each API host.
+
+    Args:
+        path (Path | str): Path of the json state file. A missing file is treated as empty state.
+    """
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.hosts: dict[str, HostState] = {}
+        if self.path.exists():
+            with open(self.path, 'r') as state_io:
+                data = json.load(state_io)
+            for host, host_state in data.get("hosts", {}).items():
+                self.hosts[host] = HostState(host_state.get("records", {}), host_state.get("reservations", {}))
+            logging.info(f"Loaded state for {len(self.hosts)} hosts from {self.path}")
+
+    def get(self, api_host: str) -> HostState:
+        return self.hosts.get(api_host, HostState())
+
+    def set(self, api_host: str, host_state: HostState):
+        self.hosts[api_host] = host_state
+
+    def save(self):
+        """Writes the state file. The file is replaced atomically so an interrupted run never leaves a partial file."""
+        data = {"hosts": {host: {"records": s.records, "reservations": s.reservations} for host, s in self.hosts.items()}}
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp_path, 'w') as state_io:
+            json.dump(data, state_io, sort_keys=True, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        logging.info(f"Saved state to {self.path}")
+
+@dataclass
+class ApplyPlan:
+    """The zones and scopes of a values file to apply, plus entries to remove that are no longer in the values file.
+
+    removed_records holds records keyed by zone name, removed_reservations MAC addresses keyed by scope name.
+    """
+    zones: list[dict] = field(default_factory=list)
+    scopes: list[dict] = field(default_factory=list)
+    removed_records: dict[str, list[DnsRecord]] = field(default_factory=dict)
+    removed_reservations: dict[str, list[str]] = field(default_factory=dict)
+
+def full_plan(values: dict) -> ApplyPlan:
+    """Plan that applies every zone and scope of the values file."""
+    return ApplyPlan(values.get("zones", None) or [], values.get("dhcp_scopes", None) or [])
+
+def incremental_plan(values: dict, applied: HostState, full_zones: bool = False, full_scopes: bool = False, desired: HostState | None = None) -> ApplyPlan:
+    """Plan that only applies the zone records and DHCP reservations whose content hash changed since they were last applied.
+
+    Args:
+        values (dict): Loaded values file.
+        applied (HostState): Hashes last applied to the API host.
+        full_zones (bool): (Optional) Keep every record of a zone with changes, for modes that diff or replace a whole zone.
+        full_scopes (bool): (Optional) Keep every assignment of a scope with changes, for modes that replace a whole scope.
+        desired (HostState): (Optional) hash_values of the values file, when already computed.
+
+    Returns:
+        ApplyPlan: Changed zones and scopes, and the records and reservations removed from the values file.
+    """
+    desired = desired if desired is not None else hash_values(values)
+    plan = ApplyPlan()
+
+    for key in applied.records.keys() - desired.records.keys():
+        zone, name, record_type, rdata = key.split("|", 3)
+        plan.removed_records.setdefault(zone, []).append(DnsRecord(name, record_type, rdata))
+    for key in applied.reservations.keys() - desired.reservations.keys():
+        scope_name, hardware_address = key.split("|", 1)
+        plan.removed_reservations.setdefault(scope_name, []).append(hardware_address)
+
+    for zone in values.get("zones", None) or []:
+        records = zone.get("records", None) or []
+        changed = [r for r in records if applied.records.get(record_state_key(zone["zone"], r)) != desired.records[record_state_key(zone["zone"], r)]]
+        if changed or zone["zone"] in plan.removed_records:
+            plan.zones.append({**zone, "records": records if full_zones else changed})
+    for scope in values.get("dhcp_scopes", None) or []:
+        assignments = scope.get("assignments", None) or []
+        changed = [a for a in assignments if applied.reservations.get(reservation_state_key(scope["name"], a)) != desired.reservations[reservation_state_key(scope["name"], a)]]
+        if changed or scope["name"] in plan.removed_reservations:
+            plan.scopes.append({**scope, "assignments": assignments if full_scopes else changed})
+
+    return plan
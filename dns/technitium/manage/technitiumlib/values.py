@@ -0,0 +1,200 @@
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+import yaml
+from .bindings import bind_scope_zones
+from .records import normalize_name
+
+try:
+    # The libyaml based loader is several times faster on large values files.
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# List of each values file section streamed one entry at a time, and the kind of the items in it.
+STREAMED_LISTS: dict[str, tuple[str, str, str]] = {
+    "zones": ("zone", "records", "record"),
+    "dhcp_scopes": ("scope", "assignments", "assignment")
+}
+# Key naming each streamed entry, which has to be read before its records or assignments.
+_ENTRY_NAME_KEYS: dict[str, str] = {"zones": "zone", "dhcp_scopes": "name"}
+
+@dataclass
+class ValuesItem:
+    """One entry of a values file.
+
+    kind is api, zone, record, scope or assignment. entry is the api mapping, or the zones[] or dhcp_scopes[] entry
+    without its records or assignments. item is the record or assignment, for the record and assignment kinds.
+    """
+    kind: str
+    entry: dict
+    item: dict | None = None
+
+def load_values(var_file_path: str) -> dict:
+    """Loads the values file, adding the records derived from DHCP scopes bound to a zone."""
+    with open(var_file_path, 'r') as var_file:
+        return bind_scope_zones(yaml.load(var_file, Loader=SafeLoader) or {})
+
+def iter_values_dict(values: dict) -> Iterator[ValuesItem]:
+    """Yields the entries of a loaded values file in the order iter_values streams them from a file."""
+    if values.get("api", None) is not None:
+        yield ValuesItem("api", values["api"])
+    for section, (kind, child_key, child_kind) in STREAMED_LISTS.items():
+        for entry in values.get(section, None) or []:
+            header = {key: value for key, value in entry.items() if key != child_key}
+            yield ValuesItem(kind, header)
+            for child in entry.get(child_key, None) or []:
+                yield ValuesItem(child_kind, header, child)
+
+def _compose(loader: SafeLoader, anchors: dict[str, yaml.Node]) -> yaml.Node:
+    """Composes the next node from the event stream, the way yaml.composer.Composer does.
+
+    The C loader only composes whole documents, so nodes are built from its events here.
+    """
+    event = loader.get_event()
+    if isinstance(event, yaml.AliasEvent):
+        if event.anchor not in anchors:
+            raise yaml.composer.ComposerError(None, None, f"found undefined alias {event.anchor}", event.start_mark)
+        return anchors[event.anchor]
+    if isinstance(event, yaml.ScalarEvent):
+        tag = event.tag if event.tag not in (None, "!") else loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+        node = yaml.ScalarNode(tag, event.value, event.start_mark, event.end_mark, style=event.style)
+    elif isinstance(event, yaml.SequenceStartEvent):
+        tag = event.tag if event.tag not in (None, "!") else loader.resolve(yaml.SequenceNode, None, event.implicit)
+        node = yaml.SequenceNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        while not loader.check_event(yaml.SequenceEndEvent):
+            node.value.append(_compose(loader, anchors))
+        node.end_mark = loader.get_event().end_mark
+    else:
+        tag = event.tag if event.tag not in (None, "!") else loader.resolve(yaml.MappingNode, None, event.implicit)
+        node = yaml.MappingNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        while not loader.check_event(yaml.MappingEndEvent):
+            node.value.append((_compose(loader, anchors), _compose(loader, anchors)))
+        node.end_mark = loader.get_event().end_mark
+    if event.anchor is not None:
+        anchors[event.anchor] = node
+    return node
+
+def _construct(loader: SafeLoader, anchors: dict[str, yaml.Node]):
+    return loader.construct_document(_compose(loader, anchors))
+
+def _iter_entries(loader: SafeLoader, anchors: dict[str, yaml.Node], section: str) -> Iterator[ValuesItem]:
+    kind, child_key, child_kind = STREAMED_LISTS[section]
+    loader.get_event()
+    while not loader.check_event(yaml.SequenceEndEvent):
+        if not loader.check_event(yaml.MappingStartEvent):
+            raise ValueError(f"Every {section} entry must be a mapping\n{loader.peek_event().start_mark}")
+        loader.get_event()
+        header: dict = {}
+        streamed = False
+        while not loader.check_event(yaml.MappingEndEvent):
+            key = _construct(loader, anchors)
+            if streamed:
+                raise ValueError(f"{key} must come before {child_key} in {section} entries to stream the values file\n{loader.peek_event().start_mark}")
+            if key != child_key or not loader.check_event(yaml.SequenceStartEvent):
+                header[key] = _construct(loader, anchors)
+                continue
+            if _ENTRY_NAME_KEYS[section] not in header:
+                raise ValueError(f"{_ENTRY_NAME_KEYS[section]} must come before {child_key} in {section} entries to stream the values file\n{loader.peek_event().start_mark}")
+            streamed = True
+            yield ValuesItem(kind, header)
+            loader.get_event()
+            while not loader.check_event(yaml.SequenceEndEvent):
+                yield ValuesItem(child_kind, header, _construct(loader, anchors))
+            loader.get_event()
+        loader.get_event()
+        if not streamed:
+            yield ValuesItem(kind, header)
+    loader.get_event()
+
+def iter_values(var_file_path: str) -> Iterator[ValuesItem]:
+    """Streams the entries of a values file one at a time, without loading the whole file.
+
+    Only the entry being read is kept in memory, so a values file with millions of records can be processed in
+    constant memory. The records and assignments lists must be the last key of their zone or scope, as they are in
+    the example values file, since the zone or scope is yielded before its first record or assignment.
+
+    Args:
+        var_file_path (str): Path of the values file.
+
+    Raises:
+        ValueError: When the values file can't be streamed.
+        yaml.YAMLError: When the values file is not valid yaml.
+
+    Returns:
+        Iterator[ValuesItem]: The api mapping, then every zone followed by its records and every scope followed by its assignments, in file order.
+    """
+    with open(var_file_path, 'r') as var_file:
+        loader = SafeLoader(var_file)
+        anchors: dict[str, yaml.Node] = {}
+        try:
+            loader.get_event()
+            if loader.check_event(yaml.StreamEndEvent):
+                return
+            loader.get_event()
+            if not loader.check_event(yaml.MappingStartEvent):
+                raise ValueError(f"The values file must be a mapping\n{loader.peek_event().start_mark}")
+            loader.get_event()
+            while not loader.check_event(yaml.MappingEndEvent):
+                key = _construct(loader, anchors)
+                if key in STREAMED_LISTS and loader.check_event(yaml.SequenceStartEvent):
+                    yield from _iter_entries(loader, anchors, key)
+                    continue
+                value = _construct(loader, anchors)
+                if key == "api" and value is not None:
+                    yield ValuesItem("api", value)
+        finally:
+            loader.dispose()
+
+def written_rrset(item: ValuesItem) -> tuple[str, str, str]:
+    """(zone, name, type) of a record item, as matched against the records derived from DHCP scopes."""
+    return (normalize_name(str(item.entry["zone"])), normalize_name(str(item.item["name"])), str(item.item["type"]).upper())
+
+def batch_values(items: Iterable[ValuesItem], batch_size: int, written: set[tuple[str, str, str]] | None = None) -> Iterator[dict]:
+    """Groups streamed values file entries into values files of at most batch_size records and assignments each.
+
+    Each batch holds the api mapping and the zones and scopes of its records and assignments, and is passed
+    through bind_scope_zones, so it can be applied like a loaded values file.
+
+    Args:
+        items (Iterable[ValuesItem]): Entries from iter_values.
+        batch_size (int): Maximum records and assignments per batch.
+        written (set[tuple[str, str, str]]): (Optional) written_rrset of every record in the whole values file, so
+            records derived from DHCP scopes never replace a record written in another batch.
+
+    Returns:
+        Iterator[dict]: Values files of one batch each.
+    """
+    api: dict | None = None
+    # section -> (streamed entry, batch entry) pairs, in file order
+    batch: dict[str, list[tuple[dict, dict]]] = {section: [] for section in STREAMED_LISTS}
+    size = 0
+
+    def flush() -> dict:
+        values = {section: [entry for _, entry in entries] for section, entries in batch.items()}
+        if api is not None:
+            values["api"] = api
+        for entries in batch.values():
+            entries.clear()
+        return bind_scope_zones(values, written)
+
+    kinds = {kind: (section, child_key) for section, (kind, child_key, _) in STREAMED_LISTS.items()}
+    child_kinds = {child_kind: (section, child_key) for section, (_, child_key, child_kind) in STREAMED_LISTS.items()}
+    for item in items:
+        if item.kind == "api":
+            api = item.entry
+            continue
+        section, child_key = kinds[item.kind] if item.kind in kinds else child_kinds[item.kind]
+        entries = batch[section]
+        # The records or assignments of an entry always follow it, so they belong to the last entry of the batch
+        # or to an entry that started in an earlier batch.
+        if not entries or entries[-1][0] is not item.entry:
+            entries.append((item.entry, {**item.entry, child_key: []}))
+        if item.item is None:
+            continue
+        entries[-1][1][child_key].append(item.item)
+        size += 1
+        if size >= batch_size:
+            yield flush()
+            size = 0
+    if size or any(batch.values()):
+        yield flush()
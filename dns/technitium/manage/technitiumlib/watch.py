@@ -0,0 +1,110 @@
+from pathlib import Path
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import time
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+# Editors commonly save by writing a new file and renaming it over the old one, so the directory is watched for both.
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")
+
+class FileWatcher:
+    """Waits for changes to a single file.
+
+    Uses inotify on the file's directory where available and falls back to polling the file's mtime and size.
+
+    Args:
+        path (Path | str): File to watch.
+        debounce (float): (Optional) Seconds without further changes before a change is reported, so a burst of writes is reported once.
+        poll_interval (float): (Optional) Seconds between checks when inotify is not available.
+    """
+    def __init__(self, path: Path | str, debounce: float = 0.5, poll_interval: float = 1.0):
+        self.path = Path(path).resolve()
+        self.debounce: float = debounce
+        self.poll_interval: float = poll_interval
+        self._signature = self._stat_signature()
+        self._fd: int | None = self._inotify_watch()
+        if self._fd is None:
+            logging.info(f"inotify is not available, polling {self.path} every {self.poll_interval} seconds.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def wait(self):
+        """Blocks until the file changes and no further changes were seen for the debounce window."""
+        while not self._changed(None):
+            pass
+        while self._changed(self.debounce):
+            pass
+
+    def _inotify_watch(self) -> int | None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, str(self.path.parent).encode(), WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _changed(self, timeout: float | None) -> bool:
+        """Waits up to timeout seconds (forever when None) for a change to the file."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if self._fd is not None:
+                ready, _, _ = select.select([self._fd], [], [], remaining)
+                if ready and self._read_events():
+                    return True
+            else:
+                time.sleep(self.poll_interval if remaining is None else min(self.poll_interval, remaining))
+                signature = self._stat_signature()
+                if signature != self._signature:
+                    self._signature = signature
+                    return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def _read_events(self) -> bool:
+        """Drains pending inotify events. True when any of them is for the watched file."""
+        changed = False
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        offset = 0
+        while offset < len(buffer):
+            _, _, _, name_length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = buffer[offset:offset + name_length].rstrip(b"\0").decode(errors="replace")
+            offset += name_length
+            changed = changed or name == self.path.name
+        return changed
+
+    def _stat_signature(self) -> tuple[int, int, int] | None:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
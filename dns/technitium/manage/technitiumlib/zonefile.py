@@ -0,0 +1,42 @@
+from .records import MANAGED_COMMENT, RDATA_FIELDS
+
+# Record types that can be sent through the zones/import API. Everything else is added one record at a time.
+IMPORTABLE_TYPES: set[str] = {"A", "AAAA", "CNAME", "NS", "PTR"}
+
+def is_importable(record: dict) -> bool:
+    """True when a zones[].records[] entry can be sent through the zone import API.
+
+    Records that ask the server to create a reverse PTR record (ptr: true) are not importable, the
+    import API only writes the records in the zone file.
+    """
+    return record["type"].upper() in IMPORTABLE_TYPES and not record.get("ptr", False)
+
+def absolute_name(name: str) -> str:
+    """Returns a domain name as a fully qualified zone file name with a trailing dot."""
+    name = name.strip()
+    return name if name.endswith(".") else f"{name}."
+
+def render_record(record: dict) -> str:
+    """Renders a zones[].records[] entry as an RFC 1035 resource record line, relative to the zone origin."""
+    record_type = record["type"].upper()
+    value = record[RDATA_FIELDS[record_type]]
+    if record_type not in {"A", "AAAA"}:
+        value = absolute_name(value)
+    return f"{record["name"]} IN {record_type} {value} ; {MANAGED_COMMENT}"
+
+def render_zone_file(zone: str, records: list[dict]) -> str:
+    """Renders zones[].records[] entries of a zone as RFC 1035 zone file text.
+
+    Every record carries the managed by pyTechnitium marker as its trailing comment, which the import
+    API stores as the record comments.
+
+    Args:
+        zone (str): DNS zone name, used as the $ORIGIN of the zone file.
+        records (list[dict]): zones[].records[] entries to render. All must be importable.
+
+    Returns:
+        str: Zone file text.
+    """
+    lines = [f"$ORIGIN {absolute_name(zone)}"]
+    lines.extend(render_record(record) for record in records)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,71 @@
+import unittest
+from technitiumlib.conflicts import find_conflicts
+
+def kinds(values: dict) -> list[str]:
+    return sorted(conflict.kind for conflict in find_conflicts(values))
+
+class FindConflictsTest(unittest.TestCase):
+
+    def test_consistent(self):
+        values = {
+            "zones": [{"zone": "example.com", "records": [
+                {"name": "a", "type": "A", "ipAddress": "10.0.0.1", "ptr": True},
+                {"name": "", "type": "NS", "nameServer": "ns1.example.com"},
+                {"name": "www", "type": "CNAME", "cname": "a.example.com"}
+            ]}],
+            "dhcp_scopes": [{"name": "lan", "network": "10.1.0.0/24", "assignments": [
+                {"hardwareAddress": "00:11:22:33:44:55", "ipAddress": "10.1.0.5"},
+                {"hardwareAddress": "00-11-22-33-44-66", "ipAddress": "10.1.0.6"}
+            ]}]
+        }
+        self.assertEqual(find_conflicts(values), [])
+
+    def test_duplicate_mac_across_formats(self):
+        values = {"dhcp_scopes": [{"name": "lan", "assignments": [
+            {"hardwareAddress": "00:11:22:33:44:55", "ipAddress": "10.1.0.5"},
+            {"hardwareAddress": "00-11-22-33-44-55", "ipAddress": "10.1.0.6"}
+        ]}]}
+        self.assertEqual(kinds(values), ["duplicate MAC address"])
+
+    def test_duplicate_reserved_ip_across_scopes(self):
+        values = {"dhcp_scopes": [
+            {"name": "a", "assignments": [{"hardwareAddress": "00:11:22:33:44:55", "ipAddress": "10.1.0.5"}]},
+            {"name": "b", "assignments": [{"hardwareAddress": "00:11:22:33:44:66", "ipAddress": "10.1.0.5"}]}
+        ]}
+        self.assertEqual(kinds(values), ["duplicate reserved IP address"])
+
+    def test_outside_scope_range(self):
+        values = {"dhcp_scopes": [{"name": "lan", "startingAddress": "10.1.0.10", "endingAddress": "10.1.0.20", "assignments": [
+            {"hardwareAddress": "00:11:22:33:44:55", "ipAddress": "10.1.0.5"}
+        ]}]}
+        self.assertEqual(kinds(values), ["outside scope range"])
+
+    def test_conflicting_ptr_records(self):
+        values = {"zones": [{"zone": "example.com", "records": [
+            {"name": "a", "type": "A", "ipAddress": "10.0.0.1", "ptr": True},
+            {"name": "b", "type": "A", "ipAddress": "10.0.0.1", "ptr": True},
+            {"name": "c", "type": "A", "ipAddress": "10.0.0.1"}
+        ]}]}
+        self.assertEqual(kinds(values), ["conflicting PTR records for"])
+
+    def test_invalid_addresses(self):
+        values = {"zones": [{"zone": "example.com", "records": [
+            {"name": "a", "type": "A", "ipAddress": "::1"},
+            {"name": "b", "type": "AAAA", "ipAddress": "10.0.0.1"}
+        ]}], "dhcp_scopes": [{"name": "lan", "assignments": [{"hardwareAddress": "00:11:22", "ipAddress": "10.1.0.5"}]}]}
+        self.assertEqual(kinds(values), ["invalid hardwareAddress", "invalid ipAddress", "invalid ipAddress"])
+
+    def test_incomplete_records(self):
+        values = {"zones": [
+            {"zone": "example.com", "records": [
+                {"type": "A", "ipAddress": "10.0.0.1"},
+                {"name": "b", "ipAddress": "10.0.0.2"},
+                {"name": "c", "type": "CNAME"},
+                {"name": "d", "type": "TXT", "text": "hello"}
+            ]},
+            {"records": []}
+        ], "dhcp_scopes": [{"assignments": []}]}
+        self.assertEqual(kinds(values), ["missing cname", "missing name", "missing name", "missing type", "missing zone", "unsupported record type"])
+
+if __name__ == "__main__":
+    unittest.main()
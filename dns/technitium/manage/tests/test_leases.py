@@ -0,0 +1,37 @@
+import unittest
+from technitiumlib.leases import format_reserved_leases, lease_from_assignment, parse_reserved_leases
+from technitiumlib.records import MANAGED_COMMENT
+
+class FormatReservedLeasesTest(unittest.TestCase):
+    """reservedLeases of dhcp/scopes/set, documented as hostName|hardwareAddress|address|comments per lease."""
+
+    def test_documented_field_order(self):
+        leases = [
+            {"hostName": "host1", "hardwareAddress": "00-11-22-33-44-55", "address": "192.168.1.10", "comments": "first"},
+            {"hostName": "", "hardwareAddress": "66-77-88-99-AA-BB", "address": "192.168.1.11", "comments": ""}
+        ]
+        self.assertEqual(
+            format_reserved_leases(leases),
+            "host1|00-11-22-33-44-55|192.168.1.10|first|"
+            "|66-77-88-99-AA-BB|192.168.1.11|"
+        )
+
+    def test_assignment_fields(self):
+        lease = lease_from_assignment({"hostName": "a|b", "hardwareAddress": "aa:bb:cc:dd:ee:ff", "ipAddress": " 10.0.0.5 "})
+        host_name, hardware_address, address, comments = format_reserved_leases([lease]).split("|")
+        self.assertEqual((host_name, hardware_address, address), ("a b", "AA-BB-CC-DD-EE-FF", "10.0.0.5"))
+        self.assertTrue(comments.startswith(MANAGED_COMMENT))
+
+    def test_empty(self):
+        self.assertEqual(format_reserved_leases([]), "")
+        self.assertEqual(parse_reserved_leases(""), [])
+
+    def test_parse_round_trip(self):
+        leases = [
+            {"hostName": "host1", "hardwareAddress": "00-11-22-33-44-55", "address": "192.168.1.10", "comments": "first"},
+            {"hostName": "", "hardwareAddress": "66-77-88-99-AA-BB", "address": "192.168.1.11", "comments": ""}
+        ]
+        self.assertEqual(parse_reserved_leases(format_reserved_leases(leases)), leases)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import unittest
+import requests
+from technitiumlib.client import TechnitiumClient
+from technitiumlib.metrics import LATENCY_SAMPLES, EndpointMetrics, RequestMetrics, render_prometheus
+
+class EndpointMetricsTest(unittest.TestCase):
+    """Latencies are sampled once LATENCY_SAMPLES requests were recorded, max and sum are kept exactly."""
+
+    def test_reservoir_bound(self):
+        metrics = RequestMetrics()
+        total = LATENCY_SAMPLES * 5
+        for i in range(1, total + 1):
+            metrics.record("zones/list", i / 1000)
+        endpoint = metrics.endpoints["zones/list"]
+        self.assertEqual(len(endpoint.latencies), LATENCY_SAMPLES)
+        self.assertEqual(endpoint.count, total)
+        self.assertEqual(endpoint.latency_max, total / 1000)
+        self.assertAlmostEqual(endpoint.latency_sum, sum(range(1, total + 1)) / 1000)
+        # A uniform sample of 1..total keeps values from the whole range, not only the first requests.
+        self.assertGreater(max(endpoint.latencies), LATENCY_SAMPLES / 1000)
+        self.assertLessEqual(endpoint.quantile(0.5), endpoint.quantile(0.99))
+
+    def test_quantiles_by_nearest_rank(self):
+        metrics = EndpointMetrics()
+        for seconds in (0.4, 0.1, 0.3, 0.2):
+            metrics.count += 1
+            metrics.add_latency(seconds)
+        self.assertEqual((metrics.quantile(0.5), metrics.quantile(0.95), metrics.quantile(0)), (0.2, 0.4, 0.1))
+        self.assertEqual(EndpointMetrics().quantile(0.5), 0.0)
+
+    def test_prometheus_summary(self):
+        metrics = RequestMetrics()
+        metrics.record("zones/list", 0.5, 10, 20)
+        metrics.record("zones/list", 1.5, 10, 0, failed=True)
+        text = render_prometheus({"dns\"1": metrics})
+        labels = 'host="dns\\"1",endpoint="zones/list"'
+        self.assertIn(f"technitium_api_requests_total{{{labels}}} 2\n", text)
+        self.assertIn(f"technitium_api_request_errors_total{{{labels}}} 1\n", text)
+        self.assertIn(f"technitium_api_sent_bytes_total{{{labels}}} 20\n", text)
+        self.assertIn(f"technitium_api_request_duration_seconds{{{labels},quantile=\"0.5\"}} 0.5\n", text)
+        self.assertIn(f"technitium_api_request_duration_seconds_sum{{{labels}}} 2.0\n", text)
+
+class ClientBytesSentTest(unittest.TestCase):
+    """bytes_sent counts the URL with its query string, where most calls send their data, and the body."""
+
+    def test_url_and_body(self):
+        class OkSession(requests.Session):
+            def request(self, method, url, **kwargs):
+                response = requests.Response()
+                response.status_code = 200
+                response._content = json.dumps({"status": "ok"}).encode()
+                return response
+
+        client = TechnitiumClient("http://dns:5380", "token", session=OkSession())
+        client.post("zones/records/add", {"zone": "example.com"}, data="a=b")
+        expected = len("http://dns:5380/api/zones/records/add?token=token&zone=example.com") + len("a=b")
+        self.assertEqual(client.metrics.endpoints["zones/records/add"].bytes_sent, expected)
+
+if __name__ == "__main__":
+    unittest.main()
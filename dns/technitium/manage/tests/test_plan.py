@@ -0,0 +1,38 @@
+import unittest
+from technitiumlib.leases import DhcpLeaseIndex, format_reserved_leases
+from technitiumlib.plan import PlannedCall
+
+def _lease(hardware_address: str, address: str, host_name: str = "") -> dict:
+    return {"hostName": host_name, "hardwareAddress": hardware_address, "address": address, "comments": ""}
+
+class PlannedScopeSetTest(unittest.TestCase):
+    """dhcp/scopes/set replaces the whole reservedLeases list, so the plan diffs it against the current leases."""
+
+    def setUp(self):
+        leases = [_lease("00-11-22-33-44-55", "10.1.0.4", "old"), _lease("AA-AA-AA-AA-AA-AA", "10.1.0.9"), _lease("BB-BB-BB-BB-BB-BB", "10.1.0.10")]
+        self.lease_indexes = {"lan": DhcpLeaseIndex("lan", leases)}
+
+    def _call(self, leases: list[dict], encoded: bool = False) -> PlannedCall:
+        data = {"reservedLeases": format_reserved_leases(leases)}
+        if encoded:
+            data = f"reservedLeases={data["reservedLeases"].replace("|", "%7C")}"
+        return PlannedCall("dhcp/scopes/set", {"name": "lan"}, data)
+
+    def test_one_line_per_lease(self):
+        call = self._call([_lease("00:11:22:33:44:55", "10.1.0.5", "h1"), _lease("BB-BB-BB-BB-BB-BB", "10.1.0.10"), _lease("00-11-22-33-44-66", "10.1.0.6", "h2")])
+        self.assertEqual(call.lines(self.lease_indexes), [
+            "~ lan: 00-11-22-33-44-55 10.1.0.5 h1",
+            "+ lan: 00-11-22-33-44-66 10.1.0.6 h2",
+            "- lan: AA-AA-AA-AA-AA-AA 10.1.0.9"
+        ])
+
+    def test_form_encoded(self):
+        call = self._call([_lease("BB-BB-BB-BB-BB-BB", "10.1.0.10")], encoded=True)
+        self.assertEqual(call.lines(self.lease_indexes), ["- lan: 00-11-22-33-44-55 10.1.0.4", "- lan: AA-AA-AA-AA-AA-AA 10.1.0.9"])
+
+    def test_without_lease_index(self):
+        call = self._call([_lease("00-11-22-33-44-66", "10.1.0.6")])
+        self.assertEqual(call.lines(), ["~ lan: replace with 1 reserved leases"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from technitiumlib.records import MANAGED_COMMENT, DnsRecord, diff_zone_records
+
+def _api_record(name: str, record_type: str, rdata: dict, comments: str | None = MANAGED_COMMENT) -> dict:
+    return {"name": name, "type": record_type, "rData": rdata, "comments": comments}
+
+class DiffZoneRecordsTest(unittest.TestCase):
+    """diff_zone_records compares records by (name, type, rdata), normalized the way the server stores them."""
+
+    def test_case_and_trailing_dots(self):
+        desired = [
+            {"name": "WWW", "type": "cname", "cname": "Host.Example.COM."},
+            {"name": "v6", "type": "AAAA", "ipAddress": "2001:0db8:0000:0000:0000:0000:0000:0001"}
+        ]
+        current = [
+            _api_record("www.example.com", "CNAME", {"cname": "host.example.com"}),
+            _api_record("V6.Example.com.", "AAAA", {"ipAddress": "2001:db8::1"})
+        ]
+        diff = diff_zone_records("Example.com.", desired, current)
+        self.assertEqual(diff.unchanged, [
+            DnsRecord("www.example.com", "CNAME", "host.example.com"),
+            DnsRecord("v6.example.com", "AAAA", "2001:db8::1")
+        ])
+        self.assertEqual(diff.changes, 0)
+
+    def test_comment_only_change(self):
+        # Comments are not part of the key, so a record whose data matches is left alone whatever its comment.
+        desired = [{"name": "a", "type": "A", "ipAddress": "10.0.0.1"}, {"name": "b", "type": "A", "ipAddress": "10.0.0.2"}]
+        current = [
+            _api_record("a.example.com", "A", {"ipAddress": "10.0.0.1"}, f"{MANAGED_COMMENT} (edited)"),
+            _api_record("b.example.com", "A", {"ipAddress": "10.0.0.2"}, "added by hand")
+        ]
+        diff = diff_zone_records("example.com", desired, current)
+        self.assertEqual(len(diff.unchanged), 2)
+        self.assertEqual(diff.changes, 0)
+
+    def test_ptr_records(self):
+        desired = [{"name": "5", "type": "PTR", "ptrName": "Host.Example.com."}, {"name": "6", "type": "PTR", "ptrName": "new.example.com"}]
+        current = [
+            _api_record("5.0.10.in-addr.arpa", "PTR", {"ptrName": "host.example.com"}),
+            _api_record("7.0.10.in-addr.arpa", "PTR", {"ptrName": "gone.example.com"}),
+            _api_record("8.0.10.in-addr.arpa", "PTR", {"ptrName": "manual.example.com"}, None)
+        ]
+        diff = diff_zone_records("0.10.in-addr.arpa", desired, current)
+        self.assertEqual(diff.unchanged, [DnsRecord("5.0.10.in-addr.arpa", "PTR", "host.example.com")])
+        self.assertEqual(diff.create, [desired[1]])
+        self.assertEqual(diff.delete, [DnsRecord("7.0.10.in-addr.arpa", "PTR", "gone.example.com")])
+
+    def test_overwrite_replaces_record_set(self):
+        desired = [{"name": "a", "type": "A", "ipAddress": "10.0.0.2", "overwrite": True}, {"name": "b", "type": "A", "ipAddress": "10.0.0.3"}]
+        current = [_api_record("a.example.com", "A", {"ipAddress": "10.0.0.1"}), _api_record("b.example.com", "A", {"ipAddress": "10.0.0.4"})]
+        diff = diff_zone_records("example.com", desired, current)
+        self.assertEqual(diff.update, [desired[0]])
+        self.assertEqual(diff.create, [desired[1]])
+        # The old a record goes with the replaced record set, the old b record is deleted on its own.
+        self.assertEqual(diff.delete, [DnsRecord("b.example.com", "A", "10.0.0.4")])
+
+    def test_unmanaged_types_and_duplicates(self):
+        desired = [{"name": "a", "type": "A", "ipAddress": "10.0.0.1"}, {"name": "A", "type": "a", "ipAddress": "10.0.0.1"}]
+        current = [_api_record("example.com", "SOA", {"primaryNameServer": "ns.example.com"}), _api_record("txt.example.com", "TXT", {"text": "x"})]
+        diff = diff_zone_records("example.com", desired, current)
+        self.assertEqual(diff.create, [desired[0]])
+        self.assertEqual((diff.update, diff.delete), ([], []))
+
+if __name__ == "__main__":
+    unittest.main()
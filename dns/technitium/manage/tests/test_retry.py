@@ -0,0 +1,92 @@
+import json
+import unittest
+from unittest import mock
+import requests
+from technitiumlib.client import TechnitiumClient
+from technitiumlib.retry import RateLimiter, RetryPolicy, retry_after_seconds
+
+class ScriptedSession(requests.Session):
+    """Session answering each request with the next (status, headers) pair instead of sending it."""
+
+    def __init__(self, responses: list[tuple[int, dict]]):
+        super().__init__()
+        self.responses = list(responses)
+        self.sent: list[str] = []
+
+    def request(self, method, url, **kwargs):
+        self.sent.append(method)
+        status, headers = self.responses.pop(0)
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response._content = json.dumps({"status": "ok", "response": {}}).encode()
+        response.url = url
+        return response
+
+class RetryPolicyTest(unittest.TestCase):
+    """Backoff delays: full jitter up to a doubling bound, or the server's Retry-After, both capped by max_backoff."""
+
+    def test_full_jitter_bounds(self):
+        policy = RetryPolicy(backoff=0.5, max_backoff=3.0)
+        for retry, bound in ((1, 0.5), (2, 1.0), (3, 2.0), (4, 3.0), (10, 3.0)):
+            with mock.patch("technitiumlib.retry.random.uniform", side_effect=lambda low, high: high) as uniform:
+                self.assertEqual(policy.delay(retry), bound)
+                uniform.assert_called_once_with(0, bound)
+
+    def test_retry_after(self):
+        policy = RetryPolicy(max_backoff=5.0)
+        self.assertEqual(policy.delay(1, 2.0), 2.0)
+        self.assertEqual(policy.delay(1, 60.0), 5.0)
+
+    def test_retry_after_seconds(self):
+        self.assertEqual(retry_after_seconds("3"), 3.0)
+        self.assertEqual(retry_after_seconds("-1"), 0.0)
+        self.assertIsNone(retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT"))
+        self.assertIsNone(retry_after_seconds(None))
+
+class RateLimiterTest(unittest.TestCase):
+    """Token bucket: burst requests are sent at once, later ones wait for the rate."""
+
+    def test_disabled(self):
+        limiter = RateLimiter(0)
+        self.assertEqual(sum(limiter.acquire() for _ in range(100)), 0.0)
+
+    def test_burst_then_rate(self):
+        limiter = RateLimiter(1000, burst=2)
+        self.assertEqual((limiter.acquire(), limiter.acquire()), (0.0, 0.0))
+        self.assertGreater(limiter.acquire(), 0.0)
+
+class ClientRetryTest(unittest.TestCase):
+    """Which failed requests TechnitiumClient sends again."""
+
+    def client(self, responses: list[tuple[int, dict]]) -> tuple[TechnitiumClient, ScriptedSession]:
+        session = ScriptedSession(responses)
+        return TechnitiumClient("http://dns:5380", "token", retry_policy=RetryPolicy(max_retries=2), session=session), session
+
+    def test_get_retried_with_retry_after(self):
+        client, session = self.client([(503, {"Retry-After": "1"}), (500, {}), (200, {})])
+        with mock.patch("technitiumlib.client.time.sleep") as sleep, self.assertLogs(level="WARNING"):
+            self.assertEqual(client.get("zones/list"), {"status": "ok", "response": {}})
+        self.assertEqual(len(session.sent), 3)
+        self.assertEqual(sleep.call_args_list[0], mock.call(1.0))
+        self.assertEqual(client.stats.retries, 2)
+
+    def test_gives_up_after_max_retries(self):
+        client, session = self.client([(502, {})] * 3)
+        with mock.patch("technitiumlib.client.time.sleep"), self.assertLogs(level="WARNING"), self.assertRaises(requests.exceptions.HTTPError):
+            client.get("zones/list")
+        self.assertEqual(len(session.sent), 3)
+
+    def test_write_only_retried_when_rejected(self):
+        client, session = self.client([(500, {})])
+        with self.assertRaises(requests.exceptions.HTTPError):
+            client.post("zones/records/delete", {"zone": "example.com"})
+        self.assertEqual(len(session.sent), 1)
+
+        client, session = self.client([(429, {}), (200, {})])
+        with mock.patch("technitiumlib.client.time.sleep"), self.assertLogs(level="WARNING"):
+            client.post("zones/records/delete", {"zone": "example.com"})
+        self.assertEqual(len(session.sent), 2)
+
+if __name__ == "__main__":
+    unittest.main()
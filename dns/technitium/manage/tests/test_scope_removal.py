@@ -0,0 +1,41 @@
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+from technitiumlib import ApiHost, ApplyOptions, HostRun, StateFile, TechnitiumApi, apply_to_hosts, normalize_mac
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmark"))
+from fake_api import FakeTechnitium
+
+VALUES = {
+    "dhcp_scopes": [{"name": "lan", "assignments": [{"hardwareAddress": "00:11:22:33:44:55", "ipAddress": "10.1.0.5", "hostName": "h1"}]}]
+}
+
+class RemovedScopeTest(unittest.TestCase):
+    """Reservations of a dhcp_scopes entry removed from the values file, applied incrementally with a state file."""
+
+    def apply(self, fake: FakeTechnitium, state: StateFile, values: dict, scope_update: bool):
+        client = TechnitiumApi(fake.url, "token", ApplyOptions(scope_update=scope_update))
+        run = HostRun(ApiHost(fake.url), client, state.get(fake.url))
+        with client:
+            return apply_to_hosts([run], values, state, full=False)
+
+    def check_removed(self, scope_update: bool):
+        with tempfile.TemporaryDirectory() as work_dir, FakeTechnitium(scopes=["lan"]) as fake:
+            state = StateFile(Path(work_dir) / "state.json")
+            self.assertFalse(self.apply(fake, state, VALUES, scope_update)[0].errors)
+            self.assertEqual([normalize_mac(mac) for mac in fake.scopes["lan"]], ["00-11-22-33-44-55"])
+
+            results = self.apply(fake, StateFile(state.path), {}, scope_update)
+            self.assertFalse(results[0].errors)
+            self.assertEqual(fake.scopes["lan"], {})
+            self.assertEqual(StateFile(state.path).get(fake.url).reservations, {})
+
+    def test_scope_update(self):
+        self.check_removed(scope_update=True)
+
+    def test_per_reservation(self):
+        self.check_removed(scope_update=False)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import os
+import tempfile
+import textwrap
+import unittest
+from unittest import mock
+import yaml
+from technitiumlib import values
+from technitiumlib.runner import scan_values
+from technitiumlib.values import batch_values, iter_values, iter_values_dict, load_values
+
+ANCHORS = """
+api:
+  url: http://dns:5380
+defaults: &record
+  type: A
+  ptr: true
+zones:
+  - zone: &zone example.com
+    records:
+      - {<<: *record, name: a, ipAddress: 10.0.0.1}
+      - <<: *record
+        name: b
+        ipAddress: 10.0.0.2
+        ptr: false
+      - &cname {name: www, type: CNAME, cname: a.example.com}
+      - *cname
+  - zone: empty.example.com
+dhcp_scopes:
+  - name: lan
+    zone: *zone
+    assignments:
+      - {hardwareAddress: "00:11:22:33:44:55", ipAddress: 10.0.0.5, hostName: h1}
+"""
+
+TAGS = """
+zones:
+  - zone: example.com
+    records:
+      - {name: !!str 123, type: TXT, text: !!str yes}
+      - {name: "", type: A, ipAddress: !!str 10.0.0.1, ttl: !!int "300"}
+dhcp_scopes:
+  - name: lan
+    assignments: []
+"""
+
+class IterValuesTest(unittest.TestCase):
+    """iter_values streams the same entries load_values reads, with both the libyaml and the pure python loader."""
+
+    def write(self, content: str) -> str:
+        fd, path = tempfile.mkstemp(suffix=".yml")
+        with os.fdopen(fd, "w") as values_file:
+            values_file.write(textwrap.dedent(content))
+        self.addCleanup(os.remove, path)
+        return path
+
+    def loaders(self):
+        for loader in {values.SafeLoader, yaml.SafeLoader}:
+            with self.subTest(loader=loader.__name__), mock.patch.object(values, "SafeLoader", loader):
+                yield
+
+    def assert_same_entries(self, content: str):
+        path = self.write(content)
+        for _ in self.loaders():
+            raw = yaml.load(textwrap.dedent(content), Loader=values.SafeLoader)
+            self.assertEqual(list(iter_values(path)), list(iter_values_dict(raw)))
+
+    def test_anchors_and_merge_keys(self):
+        self.assert_same_entries(ANCHORS)
+
+    def test_tags(self):
+        self.assert_same_entries(TAGS)
+        records = [item.item for item in iter_values(self.write(TAGS)) if item.kind == "record"]
+        self.assertEqual((records[0]["name"], records[0]["text"], records[1]["ttl"]), ("123", "yes", 300))
+
+    def test_empty_file(self):
+        self.assertEqual(list(iter_values(self.write(""))), [])
+
+    def test_batches_match_loaded_file(self):
+        path = self.write(ANCHORS)
+        for _ in self.loaders():
+            loaded = load_values(path)
+            batches = list(batch_values(iter_values(path), 100))
+            self.assertEqual(len(batches), 1)
+            self.assertEqual(batches[0]["zones"], loaded["zones"])
+            self.assertEqual(batches[0]["dhcp_scopes"], loaded["dhcp_scopes"])
+
+    def test_invalid_yaml(self):
+        path = self.write("zones:\n  - zone: example.com\n    records: [\n")
+        for _ in self.loaders():
+            with self.assertRaises(yaml.YAMLError):
+                load_values(path)
+            with self.assertRaises(yaml.YAMLError):
+                list(iter_values(path))
+
+    def test_undefined_alias(self):
+        path = self.write("zones:\n  - zone: *missing\n")
+        for _ in self.loaders():
+            with self.assertRaises(yaml.YAMLError):
+                load_values(path)
+            with self.assertRaises(yaml.YAMLError):
+                list(iter_values(path))
+
+    def test_not_streamable(self):
+        cases = {
+            "top level list": "- zone: example.com\n",
+            "entry not a mapping": "zones:\n  - example.com\n",
+            "key after records": "zones:\n  - records:\n      - {name: a, type: A, ipAddress: 10.0.0.1}\n    zone: example.com\n",
+            "name after records": "zones:\n  - records: []\n    zone: example.com\n"
+        }
+        for name, content in cases.items():
+            path = self.write(content)
+            for _ in self.loaders():
+                with self.subTest(name), self.assertRaises(ValueError):
+                    list(iter_values(path))
+
+class ScanValuesTest(unittest.TestCase):
+    """scan_values only keeps the record keys batches need to leave written records alone."""
+
+    def scan(self, content: str):
+        fd, path = tempfile.mkstemp(suffix=".yml")
+        with os.fdopen(fd, "w") as values_file:
+            values_file.write(textwrap.dedent(content))
+        self.addCleanup(os.remove, path)
+        with self.assertLogs(level="INFO"):
+            return scan_values(path)
+
+    def test_bound_scope(self):
+        scan = self.scan(ANCHORS)
+        self.assertEqual(scan.written, {("example.com", "a", "A"), ("example.com", "b", "A")})
+        self.assertEqual((scan.records, scan.assignments), (4, 1))
+
+    def test_no_bound_scope(self):
+        scan = self.scan(TAGS)
+        self.assertEqual(scan.written, set())
+        self.assertEqual(scan.records, 2)
+
+    def test_incomplete_records(self):
+        scan = self.scan("zones:\n  - zone: example.com\n    records:\n      - {name: a}\n      - {type: A}\n      - x\n")
+        self.assertEqual(scan.written, set())
+        self.assertEqual(len(scan.conflicts), 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,15 @@
 # Sourced From: https://pve.proxmox.com/wiki/Automated_Installation#Serving_Answer_Files_via_HTTP
 import argparse
+import asyncio
+import contextlib
+import copy
+from dataclasses import dataclass, field
 import logging
 import json
 import pathlib
+import signal
 import sys
+import threading
 import tomlkit
 from aiohttp import web
 
@@ -15,13 +21,24 @@ parser.add_argument("-p","--port", help="The port the Answer service will listen
 parser.add_argument("-m","--machine-addresses", help="Comma separated list of MAC addresses. If set, this service will only respond to requests with that match machine addresses in this list or answer/{MAC}.toml files.", type=str, required=False)
 parser.add_argument("--ssh-keys-directory", help="Directory containing public SSH keys to include in the root-ssh-keys list of answer responses.", type=str, required=True)
 parser.add_argument("--root-password-hashed", help="The pre-hashed password for the root user. Sets the root-password-hashed in the answer. Can be piped in instead.", required=False)
+parser.add_argument("--watch-interval", help="Seconds between checks of the answer files and SSH keys for changes. Answers are also reloaded on SIGHUP. Defaults to 2.", type=float, required=False, default=2.0)
+parser.add_argument("--request-timeout", help="Seconds an answer request may take before it is answered with a 503. Defaults to 10.", type=float, required=False, default=10.0)
+parser.add_argument("--io-workers", help="Threads reading and rendering answer files and SSH keys. Defaults to 2.", type=int, required=False, default=2)
 parser.add_argument("--default-answer-disabled", help="When set, will return 404s for unmatched MAC addresses instead of the default answer.", action='store_true')
 args = parser.parse_args()
 
+def normalize_mac(machine_address: str) -> str:
+    """Normalizes a MAC address for comparison: lower case and colon separated."""
+    return machine_address.replace("-", ":").strip().casefold()
+
 HTTP_PORT=args.port
+WATCH_INTERVAL=args.watch_interval
+REQUEST_TIMEOUT=args.request_timeout
+# All file reads and TOML parsing after startup run in run_io, never on the event loop, and at most io_workers at a time.
+IO_SLOTS = asyncio.Semaphore(max(args.io_workers, 1))
 MACHINE_ADDRESSES: str | None = None
 if args.machine_addresses:
-    MACHINE_ADDRESSES={x.replace("-", ":").strip().casefold() for x in args.machine_addresses.split(',')}
+    MACHINE_ADDRESSES={normalize_mac(x) for x in args.machine_addresses.split(',')}
 SSH_KEYS_DIR: pathlib.Path | None = pathlib.Path(args.ssh_keys_directory)
 
 DEFAULT_ANSWER_DISABLED=args.default_answer_disabled
@@ -48,11 +65,155 @@ def get_root_password_hashed()-> str:
 
 PASSWORD_HASH=get_root_password_hashed()
 
+class AnswerCache:
+    """Parsed answer files kept in memory, keyed by path.
+
+    A file is parsed again only when its modification time or size changed since it was last parsed, so
+    repeated requests for the same answer cost a stat call instead of a read and a TOML parse.
+    """
+    def __init__(self):
+        self._documents: dict[pathlib.Path, tuple[tuple[int, int], tomlkit.TOMLDocument]] = {}
+
+    def get(self, path: pathlib.Path) -> tomlkit.TOMLDocument:
+        """Returns a copy of the parsed answer file that the caller is free to modify."""
+        stat = path.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self._documents.get(path)
+        if cached is None or cached[0] != version:
+            logging.info(f"Parsing answer file {path}")
+            with open(path) as file:
+                cached = (version, tomlkit.parse(file.read()))
+            self._documents[path] = cached
+        return copy.deepcopy(cached[1])
+
+ANSWER_CACHE = AnswerCache()
+
+class AnswerIndex:
+    """Per-MAC answer files of the answer directory, indexed by the normalized MAC address in their file name.
+
+    The directory is listed again only when its modification time changed, which happens whenever a file is
+    added, removed or renamed in it. Polling the modification time also works on NFS, where inotify events
+    are not delivered for changes made by other hosts.
+    """
+    def __init__(self, directory: pathlib.Path):
+        self.directory = directory
+        self._paths: dict[str, pathlib.Path] = {}
+        self._mtime_ns: int | None = None
+
+    def refresh(self) -> bool:
+        """Rebuilds the index if the directory changed. Returns True when it was rebuilt."""
+        mtime_ns = self.directory.stat().st_mtime_ns
+        if mtime_ns == self._mtime_ns:
+            return False
+        # Built aside and swapped in, so a lookup never sees a partial index.
+        self._paths = {normalize_mac(path.stem): path for path in self.directory.glob("*.toml") if path != DEFAULT_ANSWER_FILE_PATH}
+        self._mtime_ns = mtime_ns
+        logging.info(f"Indexed {len(self._paths)} answer files in {self.directory}")
+        return True
+
+    def get(self, machine_address: str) -> pathlib.Path | None:
+        return self._paths.get(normalize_mac(machine_address))
+
+    def items(self) -> list[tuple[str, pathlib.Path]]:
+        """(normalized MAC address, answer file path) of every indexed answer file."""
+        return list(self._paths.items())
+
+ANSWER_INDEX = AnswerIndex(ANSWER_FILE_DIR)
+
+class SshKeys:
+    """Public SSH keys of the keys directory, deduplicated in file name and line order.
+
+    The .pub files are read again only when the directory or one of them changed, so answers are rendered
+    against the same immutable tuple of keys.
+    """
+    def __init__(self, directory: pathlib.Path):
+        self.directory = directory
+        self.keys: tuple[str, ...] = ()
+        # Modification time of the directory, and name, modification time and size of every .pub file in it.
+        self.version: tuple | None = None
+
+    def refresh(self) -> bool:
+        """Reloads the keys if the directory or a key file changed. Returns True when they were reloaded.
+
+        A missing directory is an empty key set, answers are then served without root SSH keys.
+        """
+        try:
+            version = [self.directory.stat().st_mtime_ns]
+        except FileNotFoundError:
+            if self.version == (None,):
+                return False
+            logging.warning(f"SSH keys directory {self.directory} does not exist, answers will have no root SSH keys.")
+            self.keys = ()
+            self.version = (None,)
+            return True
+        for path in sorted(self.directory.glob("*.pub")):
+            with contextlib.suppress(FileNotFoundError):
+                stat = path.stat()
+                version.append((path.name, stat.st_mtime_ns, stat.st_size))
+        if tuple(version) == self.version:
+            return False
+        keys: dict[str, None] = {}
+        for name, _, _ in version[1:]:
+            with contextlib.suppress(FileNotFoundError):
+                keys.update((line.strip(), None) for line in (self.directory / name).read_text().splitlines() if line.strip())
+        self.keys = tuple(keys)
+        self.version = tuple(version)
+        logging.info(f"Loaded {len(self.keys)} SSH keys from {self.directory}")
+        logging.debug(f"SSH keys: {self.keys}")
+        return True
+
+SSH_KEYS = SshKeys(SSH_KEYS_DIR)
+
+@dataclass(frozen=True)
+class RenderedAnswers:
+    """Final answer responses for the default answer and every per-MAC answer file, with the root SSH keys and
+    password hash already set. A reload builds a new set and swaps it in whole, so a request always sees one
+    consistent set.
+
+    version holds the modification time and size of every file the answers were rendered from. failed holds the
+    MACs whose answer file has never rendered, which must not fall back to the default answer.
+    """
+    version: tuple = ()
+    default: bytes | None = None
+    by_mac: dict[str, bytes] = field(default_factory=dict)
+    failed: frozenset[str] = frozenset()
+
+    def find(self, request_data: dict) -> bytes | None:
+        """Returns the answer for the first network interface with an answer, falling back to the default answer."""
+        macs = [normalize_mac(nic["mac"]) for nic in request_data.get("network_interfaces", []) if "mac" in nic]
+        for mac in macs:
+            if mac in self.failed:
+                raise RuntimeError(f"answer file for MAC {mac} could not be rendered, see the server log")
+            if mac in self.by_mac:
+                logging.info(f"Found custom answer for MAC {mac}.")
+                return self.by_mac[mac]
+            if MACHINE_ADDRESSES and mac in MACHINE_ADDRESSES:
+                return self.default
+        # If no MACHINE_ADDRESSES set then return the default answer
+        if not MACHINE_ADDRESSES and not DEFAULT_ANSWER_DISABLED:
+            logging.info(f"No custom answer found for MACs {", ".join(macs)}. Returning Default answer.")
+            return self.default
+        return None
+
+RENDERED_ANSWERS = RenderedAnswers()
+# Set by SIGHUP to rebuild the rendered answers even when no file changed.
+RELOAD_REQUESTED = asyncio.Event()
+
 routes = web.RouteTableDef()
 
 
 @routes.post("/answer")
 async def answer(request: web.Request):
+    try:
+        async with asyncio.timeout(REQUEST_TIMEOUT):
+            return await answer_response(request)
+    except TimeoutError:
+        logging.error(f"Answer request for peer '{request.remote}' timed out after {REQUEST_TIMEOUT}s.")
+        return web.Response(status=503, text="Service Unavailable: answer request timed out")
+
+
+async def answer_response(request: web.Request) -> web.Response:
+    """Answers from the rendered answers only, so a request never touches the filesystem."""
     try:
         request_data = json.loads(await request.text())
     except json.JSONDecodeError as e:
@@ -67,11 +228,11 @@ async def answer(request: web.Request):
     )
 
     try:
-        answer = create_answer(request_data)
+        answer = RENDERED_ANSWERS.find(request_data)
 
         if answer:
-            logging.debug(f"Answer file for peer '{request.remote}':\n{answer}")
-            return web.Response(text=answer)
+            logging.debug(f"Answer file for peer '{request.remote}':\n{answer.decode("utf-8")}")
+            return web.Response(body=answer, content_type="text/plain", charset="utf-8")
         else:
             return web.Response(status=404, text=f"Answer for peer Not Found")
     except Exception as e:
@@ -79,52 +240,101 @@ async def answer(request: web.Request):
         return web.Response(status=500, text=f"Internal Server Error: {e}")
 
 
-def create_answer(request_data: dict) -> str | None:
-    with open(DEFAULT_ANSWER_FILE_PATH) as file:
-        default_answer = tomlkit.parse(file.read())
-        default_answer = set_answer_root_auth(default_answer)
-    for nic in request_data.get("network_interfaces", []):
-        if "mac" not in nic:
-            continue
-        
-        answer_mac = lookup_answer_for_mac(nic["mac"])
-        if answer_mac is not None:
-            logging.info(f"Found custom answer for MAC {nic["mac"]}.")
-            return tomlkit.dumps(answer_mac)
-    # If no MACHINE_ADDRESSES set then return the default answer
-    if MACHINE_ADDRESSES is None or len(MACHINE_ADDRESSES) == 0:
-        if not DEFAULT_ANSWER_DISABLED:
-            logging.info(f"No custom answer found for MAC {nic["mac"]}. Returning Default answer.")
-            return tomlkit.dumps(default_answer)
-
-    return None
-
-
-def lookup_answer_for_mac(machine_address: str) -> tomlkit.TOMLDocument | None:
-    req_mac: str = machine_address.replace("-", ":").strip().casefold()
-
-    for filename in ANSWER_FILE_DIR.glob("*.toml"):
-        file_mac: str = filename.stem.replace("-", ":").strip().casefold()
-        logging.info(f"Comparing file MAC {file_mac} to request {req_mac}")
-        if req_mac == file_mac:
-            with open(filename) as mac_file:
-                mac_answer = tomlkit.parse(mac_file.read())
-            return set_answer_root_auth(mac_answer)
-    if MACHINE_ADDRESSES:
-        if req_mac in MACHINE_ADDRESSES:
-            with open(DEFAULT_ANSWER_FILE_PATH) as file:
-                default_answer = tomlkit.parse(file.read())
-            return set_answer_root_auth(default_answer)
-        
+def answer_inputs_version() -> tuple:
+    """Modification time and size of every file the answers are rendered from, after refreshing the answer index
+    and SSH keys."""
+    ANSWER_INDEX.refresh()
+    SSH_KEYS.refresh()
+    version = [SSH_KEYS.version]
+    for path in [DEFAULT_ANSWER_FILE_PATH, *(path for _, path in ANSWER_INDEX.items())]:
+        try:
+            stat = path.stat()
+            version.append((str(path), stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append((str(path), None, None))
+    return tuple(version)
+
+
+def render_answer(path: pathlib.Path) -> bytes:
+    return tomlkit.dumps(set_answer_root_auth(ANSWER_CACHE.get(path))).encode("utf-8")
+
+
+def render_answers(previous: RenderedAnswers, version: tuple) -> RenderedAnswers:
+    """Renders the default answer and every per-MAC answer.
+
+    An answer file that can't be read or parsed, for example while it is being written, keeps its previous
+    rendering instead of taking the answer away.
+    """
+    try:
+        default = render_answer(DEFAULT_ANSWER_FILE_PATH)
+    except Exception as e:
+        logging.error(f"Failed rendering default answer file {DEFAULT_ANSWER_FILE_PATH}, keeping its previous answer: {e}")
+        default = previous.default
+    by_mac: dict[str, bytes] = {}
+    failed: set[str] = set()
+    for mac, path in ANSWER_INDEX.items():
+        try:
+            by_mac[mac] = render_answer(path)
+        except Exception as e:
+            if mac in previous.by_mac:
+                logging.error(f"Failed rendering answer file {path}, keeping its previous answer: {e}")
+                by_mac[mac] = previous.by_mac[mac]
+            else:
+                # Serving the default answer to a machine with its own answer file would install the wrong config.
+                logging.error(f"Failed rendering answer file {path}, requests for MAC {mac} will fail until it is fixed: {e}")
+                failed.add(mac)
+    logging.info(f"Rendered the default answer and {len(by_mac)} per-MAC answers.")
+    return RenderedAnswers(version, default, by_mac, frozenset(failed))
+
+
+async def run_io(func, *args):
+    """Runs a blocking file system call on a daemon thread, at most --io-workers at a time.
+
+    concurrent.futures joins its worker threads at interpreter exit, so a call stuck on a hung NFS mount would keep
+    the server from exiting. A daemon thread is abandoned instead. Its slot is only freed when the call returns,
+    so stuck calls still count against the limit.
+    """
+    loop = asyncio.get_running_loop()
+    await IO_SLOTS.acquire()
+    future = loop.create_future()
+
+    def finish(result, error: BaseException | None):
+        IO_SLOTS.release()
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def run():
+        result, error = None, None
+        try:
+            result = func(*args)
+        except BaseException as e:
+            error = e
+        # The loop is closed when the server stopped while the call was stuck.
+        with contextlib.suppress(RuntimeError):
+            loop.call_soon_threadsafe(finish, result, error)
+
+    threading.Thread(target=run, name="answer-io", daemon=True).start()
+    return await future
+
+
+async def reload_answers(force: bool = False):
+    """Renders a new answer set off the event loop and swaps it in when any input changed, or always when forced.
+
+    Requests keep being served from the current set while the new one is built.
+    """
+    global RENDERED_ANSWERS
+    version = await run_io(answer_inputs_version)
+    if not force and version == RENDERED_ANSWERS.version:
+        return
+    RENDERED_ANSWERS = await run_io(render_answers, RENDERED_ANSWERS, version)
+
+
 def set_answer_root_auth(answer: tomlkit.TOMLDocument) -> tomlkit.TOMLDocument:
-    pub_keys: set[str] = set()
-    for filename in SSH_KEYS_DIR.glob("*.pub"):
-        file_keys: set[str] = set(pub_key.strip() for pub_key in open(filename))
-        logging.info(f"file_keys: {file_keys}")
-        logging.info(f"pub_keys: {pub_keys}")
-        pub_keys |= file_keys
-    
-    answer["global"].add("root-ssh-keys", list(pub_keys))
+    answer["global"].add("root-ssh-keys", list(SSH_KEYS.keys))
     answer["global"].add("root-password-hashed", PASSWORD_HASH)
     return answer
 
@@ -136,14 +346,40 @@ def assert_default_answer_file_exists():
 
 
 def assert_default_answer_file_parseable():
-    with open(DEFAULT_ANSWER_FILE_PATH) as file:
+    # Parsing through the cache also warms it for the first request.
+    try:
+        ANSWER_CACHE.get(DEFAULT_ANSWER_FILE_PATH)
+    except Exception as e:
+        raise RuntimeError(
+            "Could not parse default answer file "
+            f"'{DEFAULT_ANSWER_FILE_PATH}':\n{e}"
+        )
+
+
+async def watch_answers():
+    """Reloads the answers whenever an answer file or SSH key changes, checking every WATCH_INTERVAL seconds, and on SIGHUP, until cancelled."""
+    while True:
+        with contextlib.suppress(TimeoutError):
+            await asyncio.wait_for(RELOAD_REQUESTED.wait(), WATCH_INTERVAL)
+        force = RELOAD_REQUESTED.is_set()
+        RELOAD_REQUESTED.clear()
+        if force:
+            logging.info("SIGHUP received, reloading answers.")
         try:
-            tomlkit.parse(file.read())
+            await reload_answers(force)
         except Exception as e:
-            raise RuntimeError(
-                "Could not parse default answer file "
-                f"'{DEFAULT_ANSWER_FILE_PATH}':\n{e}"
-            )
+            logging.error(f"Failed reloading answers: {e}")
+
+
+async def answer_watcher(app: web.Application):
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGHUP, RELOAD_REQUESTED.set)
+    task = asyncio.create_task(watch_answers())
+    yield
+    loop.remove_signal_handler(signal.SIGHUP)
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
 
 
 def assert_answer_dir_exists():
@@ -152,14 +388,17 @@ def assert_answer_dir_exists():
 
 
 if __name__ == "__main__":
+    # Configured first, the checks below already log through the answer cache.
+    logging.basicConfig(level=logging.INFO)
+
     assert_default_answer_file_exists()
     assert_answer_dir_exists()
     assert_default_answer_file_parseable()
 
     app = web.Application()
 
-    logging.basicConfig(level=logging.INFO)
-
+    RENDERED_ANSWERS = render_answers(RENDERED_ANSWERS, answer_inputs_version())
+    app.cleanup_ctx.append(answer_watcher)
     app.add_routes(routes)
     logging.info(f"Starting answer server. Listening on port {HTTP_PORT}.")
     web.run_app(app, host="0.0.0.0", port=HTTP_PORT)
\ No newline at end of file